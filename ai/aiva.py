@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+aiva: one entry point for the ai/ tools
+
+Subcommands import their module only when run (nothing heavy, such as
+numpy, is loaded for `aiva convert`) and no module does I/O at import time,
+so the command is cheap enough for shell loops and cron. Parsed rate
+histories are cached in fx_data/.cache/ keyed on file mtime (ai/data_cache.py).
+
+Usage:
+  python3 ai/aiva.py convert <SRC> <DST> <AMOUNT> [--wallet W] [--as-of T]   (or --batch orders.jsonl ...)
+  python3 ai/aiva.py trend [THRESHOLD_PCT] [--window N] [--data fx_data/fxrates.json]
+  python3 ai/aiva.py suggest
+  python3 ai/aiva.py carbon
+  python3 ai/aiva.py compliance-explain
+  python3 ai/aiva.py advise [--pairs USD_AUD,EUR_AUD] [--backend local|openai] [--concurrency 4]
+  python3 ai/aiva.py rescreen [--dry-run] [--since 90d] [--rules FILE] [--workers N]
+  python3 ai/aiva.py cache-clear
+"""
+
+import sys
+
+# subcommand -> (module, function, summary); modules are imported on dispatch only
+COMMANDS = {
+    "convert": ("fx_conversion_sim", "main", "simulate a conversion (or a --batch of orders)"),
+    "trend": ("fx_trend_engine", "main", "vectorized trend summary for every pair"),
+    "suggest": ("fx_trend_analysis", "main", "rising/falling suggestion per pair"),
+    "carbon": ("carbon_estimator", "main", "carbon estimate for mockdata transactions"),
+    "compliance-explain": ("compliance_explain", "main", "why each example transaction is blocked"),
+    "advise": ("fx_advisor", "main", "Smart FX advice per pair (cached; local or openai backend)"),
+    "rescreen": ("rescreen", "main", "rescreen the tx log against current rules; audit the status changes"),
+    "cache-clear": ("data_cache", "clear", "delete cached parsed data files"),
+}
+
+
+def usage(code: int = 1):
+    print("Usage: python3 ai/aiva.py <command> [args]\n")
+    for name, (_, _, summary) in COMMANDS.items():
+        print(f"  {name:20s} {summary}")
+    sys.exit(code)
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] in ("-h", "--help"):
+        usage(0 if args else 1)
+    name, rest = args[0], args[1:]
+    if name not in COMMANDS:
+        print(f"Unknown command {name!r}.")
+        usage()
+
+    module_name, func, _ = COMMANDS[name]
+    import importlib
+
+    module = importlib.import_module(module_name)
+    sys.argv = [f"aiva {name}", *rest]           # each tool parses its own arguments
+    result = getattr(module, func)()
+    if name == "cache-clear":
+        print(f"Removed {result} cache entries")
+
+if __name__ == "__main__":
+    main()
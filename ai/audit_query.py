@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Streaming audit-log queries (fx_data/audit_log.json / .jsonl)
+
+Events are streamed one at a time and filtered on timestamp, pair, event,
+status, severity and rules_triggered; aggregations (counts, amount_src sums,
+severity histograms, group-by) use memory proportional to the number of
+groups, not the log size. Old flat events ("status"/"rules" at top level)
+are read the same as current ones (a "compliance" object).
+
+For JSONL logs an optional sidecar index (<log>.idx) records contiguous
+byte segments per time bucket and, per pair, the segments it occurs in, so
+repeated queries only read the regions that can match. The index is
+extended incrementally as the log grows and rebuilt if the log is rewritten.
+Raw lines are also pre-filtered on the pair/event/rule bytes before JSON parsing.
+
+Usage:
+  python3 ai/audit_query.py [--since 7d|2025-09-01] [--until ...] [--pair USD_AUD]
+                            [--event conversion_attempt] [--status blocked] [--severity high]
+                            [--rule velocity] [--group-by pair|event|status|severity|rule|day]
+                            [--list N] [--json] [--log PATH] [--no-index]
+  python3 ai/audit_query.py index [--log PATH]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from log_store import iter_json_array, open_log
+from velocity_index import to_epoch
+
+AUDIT_LOG_PATH = Path("fx_data/audit_log.json")
+BUCKET_SECONDS = 3600
+GROUP_KEYS = ("pair", "event", "status", "severity", "rule", "day")
+
+_SEVERITY = {"blocked": "high", "review": "medium"}  # anything else → low (as in fx_conversion_sim)
+
+
+# ---------- Event view ----------
+def normalize_event(ev: dict) -> dict:
+    """Flat view of an event, for both the current schema and old flat events."""
+    comp = ev.get("compliance")
+    if isinstance(comp, dict):
+        status = comp.get("status")
+        rules = comp.get("rules_triggered") or []
+        severity = comp.get("severity")
+    else:
+        status = ev.get("status")
+        rules = ev.get("rules") or []
+        severity = None
+    status = (status or "").lower()
+    return {
+        "ts": to_epoch(ev.get("timestamp")),
+        "timestamp": ev.get("timestamp"),
+        "event": ev.get("event"),
+        "pair": ev.get("pair"),
+        "status": status,
+        "severity": severity or _SEVERITY.get(status, "low"),
+        "rules": list(rules),
+        "amount_src": float(ev.get("amount_src") or 0.0),
+        "tx_id": ev.get("tx_id"),
+        "event_id": ev.get("event_id"),
+    }
+
+
+class AuditQuery:
+    """Conjunction of optional predicates; each set-valued filter matches any of its values."""
+
+    def __init__(self, since: float | None = None, until: float | None = None, pairs=None,
+                 events=None, statuses=None, severities=None, rules=None):
+        self.since, self.until = since, until
+        self.pairs = frozenset(pairs or ())
+        self.events = frozenset(events or ())
+        self.statuses = frozenset(s.lower() for s in statuses or ())
+        self.severities = frozenset(s.lower() for s in severities or ())
+        self.rules = frozenset(rules or ())
+        # byte needles for the raw-line prefilter (every listed value appears verbatim in a match)
+        self._needles = [[f'"{v}"'.encode() for v in vals]
+                         for vals in (self.pairs, self.events, self.rules) if vals]
+
+    def line_may_match(self, line: bytes) -> bool:
+        return all(any(n in line for n in needles) for needles in self._needles)
+
+    def time_overlaps(self, tmin: float | None, tmax: float | None) -> bool:
+        if tmin is None or tmax is None:
+            return True
+        return not ((self.since is not None and tmax < self.since)
+                    or (self.until is not None and tmin >= self.until))
+
+    def matches(self, v: dict) -> bool:
+        ts = v["ts"]
+        if self.since is not None and (ts is None or ts < self.since):
+            return False
+        if self.until is not None and (ts is None or ts >= self.until):
+            return False
+        if self.pairs and v["pair"] not in self.pairs:
+            return False
+        if self.events and v["event"] not in self.events:
+            return False
+        if self.statuses and v["status"] not in self.statuses:
+            return False
+        if self.severities and v["severity"] not in self.severities:
+            return False
+        if self.rules and not self.rules.intersection(v["rules"]):
+            return False
+        return True
+
+
+# ---------- Sidecar index (JSONL only) ----------
+def index_path_for(log_path: Path) -> Path:
+    return log_path.with_name(log_path.name + ".idx")
+
+def _fingerprint(path: Path, n: int) -> str:
+    """Hash of the first n bytes (up to 4 KiB): detects a log rewritten in place."""
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read(min(n, 4096))).hexdigest()
+
+class AuditIndex:
+    """
+    segments: [lo, hi, count, tmin, tmax] byte ranges of consecutive lines in one time bucket
+    postings: pair -> ascending segment ids containing that pair
+    """
+
+    def __init__(self, log_path: Path, bucket_seconds: int = BUCKET_SECONDS):
+        self.log_path = Path(log_path)
+        self.bucket_seconds = bucket_seconds
+        self.indexed_size = 0
+        self.fingerprint = None
+        self.segments: list = []
+        self.postings: dict = {}
+        self._bucket = None
+
+    def _extend(self):
+        """Index complete lines from indexed_size to EOF."""
+        seg_id = len(self.segments) - 1
+        with open(self.log_path, "rb") as f:
+            f.seek(self.indexed_size)
+            pos = self.indexed_size
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn/in-progress last line: index it next time
+                start, pos = pos, pos + len(line)
+                try:
+                    ev = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                ts = to_epoch(ev.get("timestamp"))
+                bucket = self._bucket if ts is None else int(ts // self.bucket_seconds)
+                if seg_id < 0 or bucket != self._bucket or self.segments[seg_id][1] != start:
+                    self.segments.append([start, pos, 0, ts, ts])
+                    seg_id += 1
+                    self._bucket = bucket
+                seg = self.segments[seg_id]
+                seg[1] = pos
+                seg[2] += 1
+                if ts is not None:
+                    seg[3] = ts if seg[3] is None else min(seg[3], ts)
+                    seg[4] = ts if seg[4] is None else max(seg[4], ts)
+                posting = self.postings.setdefault(ev.get("pair"), [])
+                if not posting or posting[-1] != seg_id:
+                    posting.append(seg_id)
+        self.indexed_size = pos
+
+    def save(self, path: Path):
+        doc = {
+            "log_path": str(self.log_path),
+            "bucket_seconds": self.bucket_seconds,
+            "indexed_size": self.indexed_size,
+            "fingerprint": self.fingerprint,
+            "bucket": self._bucket,
+            "segments": self.segments,
+            "postings": self.postings,
+        }
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(doc, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load_or_build(cls, log_path: Path, bucket_seconds: int = BUCKET_SECONDS) -> "AuditIndex":
+        """Load the sidecar, extend it over newly appended lines, or rebuild if the log was rewritten."""
+        log_path = Path(log_path)
+        path = index_path_for(log_path)
+        size = log_path.stat().st_size
+        idx = cls(log_path, bucket_seconds)
+        try:
+            with open(path, "r") as f:
+                doc = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            doc = None
+        if (doc and doc["bucket_seconds"] == bucket_seconds and doc["indexed_size"] <= size
+                and doc["fingerprint"] == _fingerprint(log_path, doc["indexed_size"])):
+            idx.indexed_size = doc["indexed_size"]
+            idx._bucket = doc["bucket"]
+            idx.segments = doc["segments"]
+            idx.postings = {(None if k == "null" else k): v for k, v in doc["postings"].items()}
+            if idx.indexed_size == size:
+                idx.fingerprint = doc["fingerprint"]
+                return idx
+        idx._extend()
+        idx.fingerprint = _fingerprint(log_path, idx.indexed_size)
+        idx.save(path)
+        return idx
+
+    def candidate_ranges(self, q: AuditQuery):
+        """Byte ranges that can hold matches, merged where adjacent."""
+        if q.pairs:
+            ids = sorted({i for p in q.pairs for i in self.postings.get(p, ())})
+        else:
+            ids = range(len(self.segments))
+        out = []
+        for i in ids:
+            lo, hi, _, tmin, tmax = self.segments[i]
+            if not q.time_overlaps(tmin, tmax):
+                continue
+            if out and out[-1][1] == lo:
+                out[-1][1] = hi
+            else:
+                out.append([lo, hi])
+        out.append([self.indexed_size, None])  # anything appended after the index was built
+        return out
+
+
+# ---------- Streaming ----------
+def resolve_log_path(path: Path = AUDIT_LOG_PATH) -> Path:
+    """The file the audit log backend actually reads (JSON array or its .jsonl sibling)."""
+    return open_log(path).path
+
+def _iter_ranges(path: Path, ranges, q: AuditQuery):
+    with open(path, "rb") as f:
+        for lo, hi in ranges:
+            f.seek(lo)
+            pos = lo
+            for line in f:
+                if hi is not None and pos >= hi:
+                    break
+                pos += len(line)
+                if not q.line_may_match(line):
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+def iter_events(q: AuditQuery, log_path: Path = AUDIT_LOG_PATH, use_index: bool = True):
+    """Yield (raw_event, view) for every matching event, streaming."""
+    path = resolve_log_path(log_path)
+    if not path.exists():
+        return
+    if path.suffix == ".jsonl":
+        if use_index:
+            ranges = AuditIndex.load_or_build(path).candidate_ranges(q)
+        else:
+            ranges = [[0, None]]
+        raw = _iter_ranges(path, ranges, q)
+    else:
+        raw = iter_json_array(path)  # legacy array: no byte offsets, plain stream
+    for ev in raw:
+        v = normalize_event(ev)
+        if q.matches(v):
+            yield ev, v
+
+
+# ---------- Aggregation ----------
+def _group_values(v: dict, key: str) -> list:
+    if key == "rule":
+        return v["rules"] or ["(none)"]
+    if key == "day":
+        return [(v["timestamp"] or "")[:10] or "(unknown)"]
+    return [v[key] if v[key] is not None else "(none)"]
+
+def aggregate(q: AuditQuery, log_path: Path = AUDIT_LOG_PATH, group_by: str | None = None,
+              use_index: bool = True, keep: int = 0) -> dict:
+    """
+    One pass: totals, severity/status histograms, optional per-group counts and
+    amount_src sums, and up to `keep` matching events (the first ones).
+    """
+    out = {"count": 0, "amount_src": 0.0,
+           "severity": {"low": 0, "medium": 0, "high": 0}, "status": {}, "groups": {}, "events": []}
+    severity, status, groups = out["severity"], out["status"], out["groups"]
+    for ev, v in iter_events(q, log_path, use_index):
+        out["count"] += 1
+        out["amount_src"] += v["amount_src"]
+        severity[v["severity"]] = severity.get(v["severity"], 0) + 1
+        status[v["status"]] = status.get(v["status"], 0) + 1
+        if group_by:
+            for g in _group_values(v, group_by):
+                acc = groups.get(g)
+                if acc is None:
+                    acc = groups[g] = {"count": 0, "amount_src": 0.0}
+                acc["count"] += 1
+                acc["amount_src"] += v["amount_src"]
+        if len(out["events"]) < keep:
+            out["events"].append(ev)
+    out["amount_src"] = round(out["amount_src"], 2)
+    for acc in groups.values():
+        acc["amount_src"] = round(acc["amount_src"], 2)
+    return out
+
+
+# ---------- CLI ----------
+_RELATIVE = re.compile(r"^(\d+)([smhdw])$")
+_UNITS = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+def parse_when(text: str | None) -> float | None:
+    """'7d' / '12h' (relative to now, UTC) or an ISO date/timestamp → epoch seconds."""
+    if text is None:
+        return None
+    m = _RELATIVE.match(text.strip())
+    if m:
+        return to_epoch(datetime.utcnow() - timedelta(**{_UNITS[m.group(2)]: int(m.group(1))}))
+    ts = to_epoch(text)
+    if ts is None:
+        raise argparse.ArgumentTypeError(f"Unrecognised time {text!r} (use e.g. 7d, 12h or 2025-09-01)")
+    return ts
+
+def _print_report(res: dict, group_by: str | None):
+    print("[Audit Query]")
+    print(f"Matched: {res['count']} events | amount_src total: {res['amount_src']:,.2f}")
+    sev = res["severity"]
+    print(f"Severity: low {sev.get('low', 0)} | medium {sev.get('medium', 0)} | high {sev.get('high', 0)}")
+    print("Status: " + (" | ".join(f"{k} {n}" for k, n in sorted(res["status"].items())) or "-"))
+    if group_by:
+        print(f"\nBy {group_by}:")
+        for g, acc in sorted(res["groups"].items(), key=lambda kv: -kv[1]["count"]):
+            print(f"  {g:20s} {acc['count']:8d}   amount_src {acc['amount_src']:,.2f}")
+    if res["events"]:
+        print()
+        for ev in res["events"]:
+            v = normalize_event(ev)
+            rules = ",".join(v["rules"]) or "-"
+            print(f"  {v['timestamp']} {v['event']:20s} {v['pair'] or '-':8s} "
+                  f"{v['amount_src']:>12,.2f} {v['status']:8s} {v['severity']:6s} {rules}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Stream, filter and aggregate the audit log")
+    ap.add_argument("cmd", nargs="?", choices=("query", "index"), default="query")
+    ap.add_argument("--log", type=Path, default=AUDIT_LOG_PATH)
+    ap.add_argument("--since", type=parse_when, help="e.g. 7d, 12h, 2025-09-01")
+    ap.add_argument("--until", type=parse_when)
+    ap.add_argument("--pair", action="append")
+    ap.add_argument("--event", action="append")
+    ap.add_argument("--status", action="append")
+    ap.add_argument("--severity", action="append")
+    ap.add_argument("--rule", action="append")
+    ap.add_argument("--group-by", choices=GROUP_KEYS)
+    ap.add_argument("--list", type=int, default=0, metavar="N", help="also print the first N matching events")
+    ap.add_argument("--json", action="store_true", help="print the result as JSON")
+    ap.add_argument("--no-index", action="store_true", help="scan the whole log (no sidecar)")
+    args = ap.parse_args()
+
+    if args.cmd == "index":
+        path = resolve_log_path(args.log)
+        if path.suffix != ".jsonl":
+            print(f"{path} is a JSON array; migrate it first: python3 ai/log_store.py migrate {path}")
+            raise SystemExit(1)
+        idx = AuditIndex.load_or_build(path)
+        print(f"Indexed {path}: {len(idx.segments)} segments, {len(idx.postings)} pairs "
+              f"→ {index_path_for(path)}")
+        return
+
+    q = AuditQuery(args.since, args.until, args.pair, args.event, args.status, args.severity, args.rule)
+    res = aggregate(q, args.log, args.group_by, use_index=not args.no_index, keep=args.list)
+    if args.json:
+        print(json.dumps(res, indent=2))
+    else:
+        _print_report(res, args.group_by)
+
+if __name__ == "__main__":
+    main()
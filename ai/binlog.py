@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Fixed-width binary records for the transaction and audit logs (NumPy)
+
+Each record is one packed little-endian struct (see TX_DTYPE / AUDIT_DTYPE):
+- ids as 16 raw bytes (the uuid hex), timestamps as epoch seconds,
+  fx dates as days since 1970-01-01
+- amounts as integer cents, rates as integer micro-units, carbon as grams
+- pair, wallet, reason, badge as interned codes; rules_triggered as a bitmask
+Strings are interned in a small sidecar (<file>.dict.json), written before any
+record that uses a new code. Code 0 means "none" everywhere, including the
+fixed status/event/severity codes: a value outside those tables is stored as
+0 and reads back as None, never as another value.
+For transactions only the src/dst balances before/after are kept (the other
+currencies do not change in a conversion).
+
+BinLog.columns() memory-maps the file and returns a structured array whose
+fields (e.g. cols["amount_src"]) are NumPy views of the file, not copies.
+
+File layout: 16-byte header (8-byte magic, u4 record size, u4 version),
+then records back to back; a torn trailing record is ignored.
+
+Usage:
+  python3 ai/binlog.py convert fx_data/transactions_log.json [out.bin]
+  python3 ai/binlog.py convert fx_data/audit_log.json [out.bin]
+  python3 ai/binlog.py stats fx_data/transactions_log.bin
+Set AIVA_BINLOG=1 to have fx_conversion_sim mirror every flush into the .bin files.
+A mirror's high-water mark is the id of its last record: sync_mirror() appends
+just the new records when the mirror is level with the log, and otherwise
+catches it up from the log (or rebuilds it if the mark is not in the log).
+"""
+
+import json
+import os
+import sys
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+
+from log_store import get_log, iter_json_array, iter_jsonl
+from velocity_index import to_epoch
+
+VERSION = 2                 # v2: code 0 = none in STATUS/SEVERITY/EVENT_CODES
+HEADER_SIZE = 16
+AMOUNT_SCALE = 100          # cents
+RATE_SCALE = 1_000_000      # rates are logged to 6 dp
+CARBON_SCALE = 1000         # grams
+NONE_I8 = np.iinfo(np.int64).min
+NONE_I4 = np.iinfo(np.int32).min
+
+STATUS_CODES = (None, "clear", "review", "blocked")
+SEVERITY_CODES = (None, "low", "medium", "high")
+EVENT_CODES = (None, "conversion_attempt", "conversion_settled", "compliance_rescreen")
+
+TX_DTYPE = np.dtype([
+    ("tx_id", "V16"),
+    ("ts", "<i8"),
+    ("amount_src", "<i8"),
+    ("amount_dst", "<i8"),
+    ("rate", "<i8"),
+    ("src_before", "<i8"),
+    ("src_after", "<i8"),
+    ("dst_before", "<i8"),
+    ("dst_after", "<i8"),
+    ("fx_date", "<i4"),
+    ("carbon_g", "<i4"),
+    ("wallet", "<u4"),
+    ("rules", "<u4"),
+    ("pair", "<u2"),
+    ("reason", "<u2"),
+    ("status", "u1"),
+    ("badge", "u1"),
+])
+
+AUDIT_DTYPE = np.dtype([
+    ("event_id", "V16"),
+    ("tx_id", "V16"),
+    ("ts", "<i8"),
+    ("amount_src", "<i8"),
+    ("amount_dst", "<i8"),
+    ("rate", "<i8"),
+    ("fx_date", "<i4"),
+    ("rules", "<u4"),
+    ("pair", "<u2"),
+    ("reason", "<u2"),
+    ("event", "u1"),
+    ("status", "u1"),
+    ("severity", "u1"),
+])
+
+KINDS = {
+    "tx": (b"AIVATX01", TX_DTYPE),
+    "audit": (b"AIVAAU01", AUDIT_DTYPE),
+}
+ID_FIELDS = {"tx": "tx_id", "audit": "event_id"}
+INTERNED = ("pair", "wallet", "reason", "badge", "rule")
+_EPOCH_DAY = date(1970, 1, 1)
+
+
+# ---------- Scalars ----------
+def _id16(hex_id) -> bytes:
+    try:
+        return bytes.fromhex(hex_id) if hex_id and len(hex_id) == 32 else bytes(16)
+    except ValueError:
+        return bytes(16)
+
+def _scaled(x, scale: int) -> int:
+    return NONE_I8 if x is None else int(round(float(x) * scale))
+
+def _unscaled(v: int, scale: int):
+    return None if v == NONE_I8 else v / scale
+
+def _day(s) -> int:
+    try:
+        return (date.fromisoformat(s) - _EPOCH_DAY).days
+    except (TypeError, ValueError):
+        return NONE_I4
+
+def _code(values: tuple, v) -> int:
+    """Index in a fixed code table; 0 (none) for anything not in it."""
+    return values.index(v) if v in values else 0
+
+
+class Interner:
+    """String ↔ code tables for one binary file (code 0 = none)."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.tables = {k: [None] for k in INTERNED}
+        if self.path.exists():
+            with open(self.path, "r") as f:
+                self.tables.update(json.load(f))
+        self._codes = {k: {s: i for i, s in enumerate(t)} for k, t in self.tables.items()}
+        self._dirty = False
+
+    def code(self, kind: str, s) -> int:
+        if s is None:
+            return 0
+        codes = self._codes[kind]
+        c = codes.get(s)
+        if c is None:
+            if kind == "rule" and len(self.tables["rule"]) > 32:
+                raise ValueError("More than 32 distinct rule codes do not fit the rules bitmask.")
+            c = codes[s] = len(self.tables[kind])
+            self.tables[kind].append(s)
+            self._dirty = True
+        return c
+
+    def rule_mask(self, rules) -> int:
+        mask = 0
+        for r in rules or ():
+            mask |= 1 << (self.code("rule", r) - 1)
+        return mask
+
+    def rules_of(self, mask: int) -> list:
+        return [r for i, r in enumerate(self.tables["rule"][1:]) if mask >> i & 1]
+
+    def name(self, kind: str, c: int):
+        return self.tables[kind][c]
+
+    def save(self):
+        if not self._dirty:
+            return
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.tables, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+
+# ---------- Encode / decode ----------
+def encode_tx(tx: dict, interner: Interner) -> tuple:
+    pair = tx.get("pair") or ""
+    src, _, dst = pair.partition("_")
+    before, after = tx.get("balances_before") or {}, tx.get("balances_after") or {}
+    comp, carbon = tx.get("compliance") or {}, tx.get("carbon") or {}
+    if isinstance(comp, str):  # early entries logged just the status ("Clear")
+        comp = {"status": comp.lower()}
+    if not isinstance(carbon, dict):
+        carbon = {"kg": carbon}
+    return (
+        _id16(tx.get("tx_id")),
+        int(to_epoch(tx.get("timestamp")) or 0),
+        _scaled(tx.get("amount_src"), AMOUNT_SCALE),
+        _scaled(tx.get("amount_dst"), AMOUNT_SCALE),
+        _scaled(tx.get("rate"), RATE_SCALE),
+        _scaled(before.get(src), AMOUNT_SCALE),
+        _scaled(after.get(src), AMOUNT_SCALE),
+        _scaled(before.get(dst), AMOUNT_SCALE),
+        _scaled(after.get(dst), AMOUNT_SCALE),
+        _day(tx.get("fx_date_used")),
+        int(round(float(carbon.get("kg") or 0.0) * CARBON_SCALE)),
+        interner.code("wallet", tx.get("wallet_id")),
+        interner.rule_mask(comp.get("rules_triggered")),
+        interner.code("pair", tx.get("pair")),
+        interner.code("reason", comp.get("reason")),
+        _code(STATUS_CODES, (comp.get("status") or "").lower()),
+        interner.code("badge", carbon.get("badge")),
+    )
+
+def encode_audit(ev: dict, interner: Interner) -> tuple:
+    comp = ev.get("compliance")
+    if not isinstance(comp, dict):  # old flat events
+        comp = {"status": ev.get("status"), "reason": ev.get("reason"), "rules_triggered": ev.get("rules")}
+    status = (comp.get("status") or "").lower()
+    severity = comp.get("severity") or {"blocked": "high", "review": "medium"}.get(status, "low")
+    return (
+        _id16(ev.get("event_id")),
+        _id16(ev.get("tx_id")),
+        int(to_epoch(ev.get("timestamp")) or 0),
+        _scaled(ev.get("amount_src"), AMOUNT_SCALE),
+        _scaled(ev.get("amount_dst"), AMOUNT_SCALE),
+        _scaled(ev.get("rate"), RATE_SCALE),
+        _day(ev.get("fx_date_used")),
+        interner.rule_mask(comp.get("rules_triggered")),
+        interner.code("pair", ev.get("pair")),
+        interner.code("reason", comp.get("reason")),
+        _code(EVENT_CODES, ev.get("event")),
+        _code(STATUS_CODES, status),
+        _code(SEVERITY_CODES, severity),
+    )
+
+def _iso(ts: int) -> str:
+    return np.datetime_as_string(np.datetime64(int(ts), "s")) + "Z"
+
+def _iso_day(d: int):
+    return None if d == NONE_I4 else str(np.datetime64(int(d), "D"))
+
+def decode(rec, kind: str, interner: Interner) -> dict:
+    """One record back to a (compact) dict in the JSON log's field names."""
+    out = {
+        "tx_id": bytes(rec["tx_id"]).hex(),
+        "timestamp": _iso(rec["ts"]),
+        "fx_date_used": _iso_day(rec["fx_date"]),
+        "pair": interner.name("pair", rec["pair"]),
+        "rate": _unscaled(int(rec["rate"]), RATE_SCALE),
+        "amount_src": _unscaled(int(rec["amount_src"]), AMOUNT_SCALE),
+        "amount_dst": _unscaled(int(rec["amount_dst"]), AMOUNT_SCALE),
+    }
+    comp = {
+        "status": STATUS_CODES[rec["status"]],
+        "reason": interner.name("reason", rec["reason"]),
+        "rules_triggered": interner.rules_of(int(rec["rules"])),
+    }
+    if kind == "audit":
+        comp["severity"] = SEVERITY_CODES[rec["severity"]]
+        return {"event_id": bytes(rec["event_id"]).hex(), "event": EVENT_CODES[rec["event"]],
+                **out, "compliance": comp}
+    out["carbon"] = {"kg": int(rec["carbon_g"]) / CARBON_SCALE, "badge": interner.name("badge", rec["badge"])}
+    out["compliance"] = comp
+    wallet = interner.name("wallet", rec["wallet"])
+    if wallet is not None:
+        out["wallet_id"] = wallet
+    return out
+
+
+# ---------- File ----------
+class BinLog:
+    """Append-only fixed-width record file + memory-mapped column reader."""
+
+    def __init__(self, path: Path, kind: str):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown record kind {kind!r}. Use one of {sorted(KINDS)}.")
+        self.path = Path(path)
+        self.kind = kind
+        self.magic, self.dtype = KINDS[kind]
+        self.interner = Interner(self.path.with_name(self.path.name + ".dict.json"))
+        self._check_header()
+
+    def _check_header(self):
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return
+        with open(self.path, "rb") as f:
+            head = f.read(HEADER_SIZE)
+        size = int.from_bytes(head[8:12], "little")
+        version = int.from_bytes(head[12:16], "little")
+        if head[:8] != self.magic or size != self.dtype.itemsize:
+            raise ValueError(f"{self.path} is not a {self.kind} binlog (v{VERSION}).")
+        if version != VERSION:
+            raise ValueError(f"{self.path} is binlog v{version}, expected v{VERSION}; "
+                             f"re-create it with: python3 ai/binlog.py convert <log>")
+
+    def __len__(self) -> int:
+        if not self.path.exists():
+            return 0
+        return max(0, self.path.stat().st_size - HEADER_SIZE) // self.dtype.itemsize
+
+    def append_many(self, records: list):
+        if not records:
+            return
+        encode = encode_tx if self.kind == "tx" else encode_audit
+        arr = np.array([encode(r, self.interner) for r in records], dtype=self.dtype)
+        self.interner.save()  # codes are durable before any record refers to them
+        new = not self.path.exists() or self.path.stat().st_size == 0
+        with open(self.path, "ab") as f:
+            if new:
+                f.write(self.magic + self.dtype.itemsize.to_bytes(4, "little") + VERSION.to_bytes(4, "little"))
+            else:
+                # drop a torn trailing record so appends stay aligned
+                f.truncate(HEADER_SIZE + len(self) * self.dtype.itemsize)
+            f.write(arr.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append(self, record: dict):
+        self.append_many([record])
+
+    def last_id(self) -> str | None:
+        """The id (tx_id / event_id) of the last record: the mirror's high-water mark."""
+        cols = self.columns()
+        return bytes(cols[-1][ID_FIELDS[self.kind]]).hex() if len(cols) else None
+
+    def columns(self) -> np.ndarray:
+        """Structured memmap of all complete records (read-only, zero-copy views per field)."""
+        n = len(self)
+        if n == 0:
+            return np.zeros(0, dtype=self.dtype)
+        return np.memmap(self.path, dtype=self.dtype, mode="r", offset=HEADER_SIZE, shape=(n,))
+
+    def iter_records(self):
+        for rec in self.columns():
+            yield decode(rec, self.kind, self.interner)
+
+    def tail(self, n: int) -> list:
+        cols = self.columns()
+        return [decode(rec, self.kind, self.interner) for rec in cols[max(0, len(cols) - n):]]
+
+
+def binlog_path_for(path: Path) -> Path:
+    return Path(path).with_suffix(".bin")
+
+def kind_for(path: Path) -> str:
+    return "audit" if "audit" in Path(path).name else "tx"
+
+_BINLOGS: dict = {}
+
+def get_binlog(log_path: Path) -> BinLog:
+    """The .bin mirror for a JSON/JSONL log path (one instance per path)."""
+    key = str(log_path)
+    log = _BINLOGS.get(key)
+    if log is None:
+        log = _BINLOGS[key] = BinLog(binlog_path_for(log_path), kind_for(log_path))
+    return log
+
+
+def sync_mirror(log_path: Path, new: list | None = None, batch: int = 10_000) -> int:
+    """
+    Bring the .bin mirror of a log up to date; `new` are the records just
+    appended to the log, if known. Returns the number of records mirrored.
+    """
+    log, binlog = get_log(log_path), get_binlog(log_path)
+    key, mark = ID_FIELDS[binlog.kind], binlog.last_id()
+    if new:
+        head = log.tail(len(new) + 1)
+        prev = head[0].get(key) if len(head) > len(new) else None
+        if prev == mark:                    # level with the log before this batch
+            binlog.append_many(new)
+            return len(new)
+    elif [r.get(key) for r in log.tail(1)] == [mark] or (mark is None and not log.tail(1)):
+        return 0
+
+    behind, found = [], mark is None
+    for rec in log.iter_records():
+        if found:
+            behind.append(rec)
+        elif rec.get(key) == mark:
+            found = True
+    if not found:                           # the mark is not in the log: rebuild
+        for p in (binlog.path, binlog.interner.path):
+            p.unlink(missing_ok=True)
+        _BINLOGS.pop(str(log_path), None)
+        binlog, behind = get_binlog(log_path), list(log.iter_records())
+    for i in range(0, len(behind), batch):
+        binlog.append_many(behind[i:i + batch])
+    return len(behind)
+
+
+def convert(src: Path, dst: Path | None = None, batch: int = 10_000) -> int:
+    """Stream a JSON array / JSONL log into a fresh binary file; returns the record count."""
+    src = Path(src)
+    dst = Path(dst) if dst else binlog_path_for(src)
+    for p in (dst, dst.with_name(dst.name + ".dict.json")):
+        p.unlink(missing_ok=True)
+    out = BinLog(dst, kind_for(src))
+    records = iter_jsonl(src) if src.suffix == ".jsonl" else iter_json_array(src)
+    n, buf = 0, []
+    for rec in records:
+        buf.append(rec)
+        if len(buf) >= batch:
+            out.append_many(buf)
+            n, buf = n + len(buf), []
+    out.append_many(buf)
+    return n + len(buf)
+
+
+# ---------- CLI ----------
+def _stats(path: Path):
+    with open(path, "rb") as f:
+        magic = f.read(8)
+    log = BinLog(path, "audit" if magic == KINDS["audit"][0] else "tx")
+    cols = log.columns()
+    print(f"[Binlog] {path} | {log.kind} | {len(cols)} records × {log.dtype.itemsize} bytes")
+    if not len(cols):
+        return
+    amounts = cols["amount_src"] / AMOUNT_SCALE
+    status = np.bincount(cols["status"], minlength=len(STATUS_CODES))
+    print(f"amount_src total {amounts.sum():,.2f} | mean {amounts.mean():,.2f} | max {amounts.max():,.2f}")
+    print("Status: " + " | ".join(f"{s or 'none'} {int(n)}" for s, n in zip(STATUS_CODES, status) if s or n))
+    pairs = np.bincount(cols["pair"], minlength=len(log.interner.tables["pair"]))
+    for code in np.flatnonzero(pairs):
+        print(f"  {log.interner.name('pair', code) or '-':8s} {int(pairs[code]):8d}")
+    print(f"Span: {_iso(cols['ts'].min())} → {_iso(cols['ts'].max())}")
+
+def main():
+    args = sys.argv[1:]
+    if len(args) >= 2 and args[0] == "convert":
+        src = Path(args[1])
+        dst = Path(args[2]) if len(args) > 2 else binlog_path_for(src)
+        n = convert(src, dst)
+        print(f"Converted {n} records: {src} ({src.stat().st_size:,} bytes) → {dst} ({dst.stat().st_size:,} bytes)")
+    elif len(args) == 2 and args[0] == "stats":
+        _stats(Path(args[1]))
+    else:
+        print(__doc__.split("Usage:")[1].rstrip())
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
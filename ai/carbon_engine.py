@@ -0,0 +1,174 @@
+"""
+Carbon estimation shared by fx_conversion_sim and carbon_estimator.
+
+fx_data/carbon_factors.json may hold either (or both) models:
+  per-pair:         {"USD_AUD": 0.42, ...}          kg CO2 per 1000 source units
+  method + FX bonus {"method_factor_kg_per_tx": {"card": 0.12, ...},
+                     "fx_bonus_factor_kg_per_100_base": 0.03}
+Factors are parsed once and reloaded only when the file's mtime/size changes.
+estimate_many() prices whole arrays of amounts/pairs/methods with NumPy,
+looking each distinct pair/method up once (NumPy is only imported by
+these batch paths, so single conversions don't need it).
+"""
+
+import json
+import os
+from pathlib import Path
+
+CARBON_FACTORS_PATH = Path("fx_data/carbon_factors.json")
+
+DEFAULT_PAIR_FACTOR = 0.5      # kg per 1000 source units, when a pair has no factor
+DEFAULT_METHOD_FACTOR = 0.05   # kg per tx, when a method has no factor
+
+# Badge bands (upper bounds for Low, Medium; anything above is High)
+PAIR_BANDS = (0.5, 2.0)        # per-conversion badges (fx_conversion_sim)
+TX_BANDS = (0.05, 0.15)        # per-transaction badges (carbon_estimator)
+BADGES = ("Low", "Medium", "High")
+
+
+class CarbonFactors:
+    """Compiled factors from one version of the file."""
+
+    def __init__(self, doc: dict):
+        self.pair_factors = {k: float(v) for k, v in doc.items()
+                             if "_" in k and isinstance(v, (int, float))}
+        self.method_factors = {k: float(v) for k, v in doc.get("method_factor_kg_per_tx", {}).items()}
+        self.fx_bonus_per_100 = float(doc.get("fx_bonus_factor_kg_per_100_base", 0.0))
+
+    def pair_factor(self, pair_key: str) -> float:
+        return self.pair_factors.get(pair_key, DEFAULT_PAIR_FACTOR)
+
+    def method_factor(self, method) -> float:
+        return self.method_factors.get(method, DEFAULT_METHOD_FACTOR)
+
+    # ---------- Scalar ----------
+    def pair_kg(self, amount_src: float, pair_key: str) -> float:
+        """Per-pair model: linear factor per 1000 source units converted."""
+        return (amount_src / 1000.0) * self.pair_factor(pair_key)
+
+    def tx_kg(self, tx: dict) -> float:
+        """Method + FX bonus model for one transaction record, rounded to grams."""
+        fx_bonus = 0.0
+        if tx.get("type") == "fx_convert":
+            fx_bonus = (float(tx.get("amount_base", 0)) / 100.0) * self.fx_bonus_per_100
+        return round(self.method_factor(tx.get("method")) + fx_bonus, 3)
+
+    # ---------- Vectorized ----------
+    def estimate_many(self, amounts, pairs=None, methods=None, fx=None):
+        """
+        kg CO2 for arrays of transactions in one pass (float64 ndarray).
+        - methods given: method + FX bonus model; `fx` (bool array) marks
+          fx_convert rows whose amount earns the bonus (default: all rows)
+        - otherwise: per-pair model over `pairs`
+        """
+        import numpy as np
+
+        amounts = np.asarray(amounts, dtype=np.float64)
+        if methods is not None:
+            kg = _lookup(methods, self.method_factor)
+            bonus = amounts / 100.0 * self.fx_bonus_per_100
+            kg = kg + (bonus if fx is None else np.where(np.asarray(fx, dtype=bool), bonus, 0.0))
+            return kg
+        if pairs is None:
+            return amounts / 1000.0 * DEFAULT_PAIR_FACTOR
+        return amounts / 1000.0 * _lookup(pairs, self.pair_factor)
+
+    def transactions_kg(self, txs) -> "np.ndarray":
+        """
+        kg for transaction dicts, rounded to grams: method + FX bonus for
+        carbon_estimator records, per-pair for conversion log records (those
+        with "amount_src" and no "method"). One pass over the dicts collects
+        the columns; the arithmetic and rounding run on whole arrays.
+        """
+        import numpy as np
+
+        methods, pairs, amounts, is_fx, by_pair = [], [], [], [], []
+        for tx in txs:
+            get = tx.get
+            log_row = "method" not in tx and "amount_src" in tx
+            fx_row = get("type") == "fx_convert"
+            methods.append(get("method"))
+            pairs.append(get("pair"))
+            amounts.append(float(get("amount_src", 0)) if log_row
+                           else float(get("amount_base", 0)) if fx_row else 0.0)
+            is_fx.append(fx_row)
+            by_pair.append(log_row)
+        kg = np.where(np.array(by_pair, dtype=bool),
+                      self.estimate_many(amounts, pairs=pairs),
+                      self.estimate_many(amounts, methods=methods, fx=is_fx))
+        return round_grams(kg)
+
+
+def round_grams(kg):
+    """
+    np.round(kg, 3), but with the same results as Python's round(x, 3):
+    values within float noise of a half-gram tie are re-rounded exactly.
+    """
+    import numpy as np
+
+    out = np.round(kg, 3)
+    scaled = np.asarray(kg) * 1000.0
+    tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(tie):
+        out.flat[i] = round(float(kg.flat[i]), 3)
+    return out
+
+
+def _lookup(keys, factor_of):
+    """Map a sequence of keys to factors, calling factor_of once per distinct key."""
+    import numpy as np
+
+    if isinstance(keys, np.ndarray) and keys.dtype.kind in "US":
+        uniq, inverse = np.unique(keys, return_inverse=True)  # columnar input: stay in C
+        table = np.fromiter((factor_of(str(k)) for k in uniq), dtype=np.float64, count=len(uniq))
+        return table[inverse.reshape(keys.shape)]
+    index: dict = {}
+    codes = np.fromiter((index.setdefault(k, len(index)) for k in keys), dtype=np.intp)
+    table = np.fromiter((factor_of(k) for k in index), dtype=np.float64, count=len(index))
+    return table[codes]
+
+
+def badges_many(kg, bands=PAIR_BANDS):
+    """Vectorized badge labels for an array of kg values."""
+    import numpy as np
+
+    return np.array(BADGES, dtype=object)[np.searchsorted(np.asarray(bands), kg, side="right")]
+
+
+class CarbonEngine:
+    """Hot-reloading holder: factors() re-parses only when the file's mtime/size changes."""
+
+    def __init__(self, path: Path = CARBON_FACTORS_PATH):
+        self.path = Path(path)
+        self._stamp = None
+        self._factors = None
+
+    def factors(self) -> CarbonFactors:
+        try:
+            st = os.stat(self.path)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stamp = None
+        if self._factors is None or stamp != self._stamp:
+            doc = {}
+            if stamp is not None:
+                try:
+                    with open(self.path, "r") as f:
+                        doc = json.load(f)
+                except json.JSONDecodeError:
+                    if self._factors is not None:
+                        return self._factors  # mid-edit: keep the last good factors
+            self._factors = CarbonFactors(doc)
+            self._stamp = stamp
+        return self._factors
+
+
+_ENGINES: dict = {}
+
+def get_engine(path: Path = CARBON_FACTORS_PATH) -> CarbonEngine:
+    """One shared engine per factors file."""
+    key = str(path)
+    engine = _ENGINES.get(key)
+    if engine is None:
+        engine = _ENGINES[key] = CarbonEngine(path)
+    return engine
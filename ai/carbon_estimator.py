@@ -1,5 +1,7 @@
 import json, math, os
 
+from carbon_engine import TX_BANDS, badges_many, get_engine
+
 TX_PATH = "fx_data/transactions_sample.json"
 CF_PATH = "fx_data/carbon_factors.json"
 
@@ -7,7 +9,10 @@ def load_json(p):
     with open(p, "r") as f:
         return json.load(f)
 
-def estimate_tx_kg(tx, factors):
+def estimate_tx_kg(tx, factors=None):
+    """Single transaction (factors: parsed carbon_factors.json, or None for the shared engine)."""
+    if factors is None:
+        return get_engine(CF_PATH).factors().tx_kg(tx)
     method_factor = factors["method_factor_kg_per_tx"].get(tx.get("method"), 0.05)
     fx_bonus = 0.0
     if tx.get("type") == "fx_convert":
@@ -22,13 +27,14 @@ def label_band(kg):
 
 def main():
     txs = load_json(TX_PATH)
-    factors = load_json(CF_PATH)
+    # One vectorized pass for all transactions (factors parsed once by the shared engine)
+    kgs = get_engine(CF_PATH).factors().transactions_kg(txs)
+    bands = badges_many(kgs, TX_BANDS)
     print("[Green FX] Estimated carbon per transaction\n")
-    for tx in txs:
-        kg = estimate_tx_kg(tx, factors)
-        band = label_band(kg)
+    for tx, kg, band in zip(txs, kgs.tolist(), bands):
         label = f"{kg} kg CO₂ ({band})"
-        title = f"#{tx['id']} {tx['type']} • {tx.get('pair', tx.get('currency',''))}"
+        title = (f"#{tx.get('id', tx.get('tx_id', '?'))} {tx.get('type', 'fx_convert')} • "
+                 f"{tx.get('pair', tx.get('currency',''))}")
         print(f"- {title:30s} → {label}  |  [Offset]")
     print("\nTip: Show this badge next to each transaction in the UI, with an 'Offset' button (future).")
 
@@ -0,0 +1,290 @@
+"""
+Compiled compliance rules shared by fx_conversion_sim.compliance_check and
+compliance_explain.evaluate.
+
+The rule file (fx_data/compliance_rules.json) is declarative:
+  {
+    "kyc_required_above": 1000,
+    "blocked_countries": ["XK", "IR", "KP"],
+    "explanations": {...}, "next_steps": {...},
+    "conversion": {
+      "amount_thresholds": {"review": 10000.0, "blocked": 50000.0},
+      "velocity": {"window_seconds": 60, "min_count": 3, "scope": "by_src"},
+      "velocity_rules": [
+        {"name": "pair_burst", "scope": "by_pair", "window_seconds": 60, "min_count": 3},
+        {"name": "src_sum_24h", "scope": "by_src", "window_seconds": 86400, "sum_above": 9500},
+        {"name": "wallet_hourly", "scope": "by_wallet", "window_seconds": 3600, "min_count": 20,
+         "action": "blocked"}
+      ],
+      "sanctions": {"blocked_pairs": ["USD_RUB", "ANY_IRR", "KPW_ANY"]}
+    }
+  }
+It is compiled once into frozensets + constants, and evaluated in a fixed
+short-circuit order. RuleBook re-compiles only when the file changes; an edit
+that does not compile keeps the previous rules (reported on stderr).
+Batches: prescreen_many() runs the stateless conversion rules (sanctions,
+thresholds) for many orders at once, evaluate_many() the explain-style ones.
+The live rule file (fx_data/compliance_rules.json) has no velocity_rules: the
+tiered ones are only in fx_data/compliance_rules.example.json. Preview their
+effect on past transactions with
+  python3 ai/rescreen.py --dry-run --rules fx_data/compliance_rules.example.json
+before copying them into the live file.
+
+Velocity rules look at the transactions before the one being screened, in
+one scope (any | by_src | by_pair | by_wallet) and window: min_count fires on
+count >= N, sum_above when those amounts plus this one exceed X (either or
+both). Sums are in the source currency, so sum_above is only allowed on the
+single-currency scopes (by_src, by_pair): a by_wallet or any rule (such as
+wallet_hourly above) can only count, and one with sum_above does not compile.
+"velocity" is the original single rule (reported as "velocity"); each
+velocity_rules entry is reported as "velocity:<name>". A hit escalates clear → review and
+review → blocked, or blocks outright with "action": "blocked".
+"""
+
+import copy
+import json
+import os
+import sys
+from pathlib import Path
+
+RULES_PATH = Path("fx_data/compliance_rules.json")
+
+# Used for anything the rule file leaves out
+DEFAULT_CONVERSION_RULES = {
+    "amount_thresholds": {"review": 10_000.0, "blocked": 50_000.0},
+    "velocity": {"window_seconds": 60, "min_count": 3, "scope": "by_src"},
+    "velocity_rules": [],
+    "sanctions": {"blocked_pairs": []},
+}
+VELOCITY_SCOPES = ("any", "by_src", "by_pair", "by_wallet")
+VELOCITY_ACTIONS = ("review", "blocked")
+SUM_SCOPES = ("by_src", "by_pair")     # every amount in the window is in the same (source) currency
+
+
+def _merged(defaults: dict, overrides: dict) -> dict:
+    out = copy.deepcopy(defaults)
+    for key, val in (overrides or {}).items():
+        if isinstance(val, dict) and isinstance(out.get(key), dict):
+            out[key] = _merged(out[key], val)
+        else:
+            out[key] = val
+    return out
+
+
+class CompiledRules:
+    def __init__(self, doc: dict, conversion_defaults: dict | None = None):
+        # --- explain-style rules (destination country + KYC) ---
+        self.blocked_countries = frozenset(doc.get("blocked_countries", []))
+        self.kyc_required_above = doc.get("kyc_required_above", float("inf"))
+        explanations = doc.get("explanations", {})
+        next_steps = doc.get("next_steps", {})
+        self._outcomes = {
+            code: (explanations.get(code, ""), next_steps.get(code, ""))
+            for code in ("COUNTRY_BLOCKED", "KYC_REQUIRED", "OK")
+        }
+
+        # --- conversion rules (sanctions > thresholds > velocity) ---
+        conv = _merged(conversion_defaults or DEFAULT_CONVERSION_RULES, doc.get("conversion", {}))
+        self.conversion = conv
+        pairs = conv["sanctions"]["blocked_pairs"]
+        self.blocked_pairs = frozenset(pairs)
+        self.blocked_dst = frozenset(p[4:] for p in pairs if p.startswith("ANY_"))
+        self.blocked_src = frozenset(p[:-4] for p in pairs if p.endswith("_ANY"))
+
+        amt = conv["amount_thresholds"]
+        self.review_above = float(amt["review"])
+        self.blocked_above = float(amt["blocked"])
+        self._review_reason = f"amount>{int(self.review_above):,}"
+        self._blocked_reason = f"amount>{int(self.blocked_above):,}"
+
+        vel = conv["velocity"]
+        self.velocity = vel
+        self._velocity_reason = f"velocity >= {vel['min_count']} in {vel['window_seconds']}s"
+        # (code, scope, window, min_count, sum_above, blocks, reason), legacy rule first
+        self.velocity_rules = [("velocity", vel["scope"], int(vel["window_seconds"]), vel["min_count"],
+                                None, False, self._velocity_reason)]
+        self.velocity_rules += [_compile_velocity_rule(r) for r in conv.get("velocity_rules") or []]
+        windows: dict = {}
+        for _, scope, window, *_ in self.velocity_rules:
+            windows.setdefault(scope, set()).add(window)
+        self.velocity_windows = {scope: sorted(ws) for scope, ws in windows.items()}
+
+    # ---------- Conversions ----------
+    def sanctions_hit(self, src: str, dst: str) -> bool:
+        return f"{src}_{dst}" in self.blocked_pairs or dst in self.blocked_dst or src in self.blocked_src
+
+    def prescreen(self, amount_src: float, src: str, dst: str) -> str:
+        """
+        The stateless rules (sanctions > amount thresholds):
+        "sanctions_block" | "threshold_blocked" | "threshold_review" | "clear".
+        """
+        if self.sanctions_hit(src, dst):
+            return "sanctions_block"
+        if amount_src > self.blocked_above:
+            return "threshold_blocked"
+        return "threshold_review" if amount_src > self.review_above else "clear"
+
+    def prescreen_many(self, orders) -> list:
+        """
+        prescreen() for a batch of (amount_src, src, dst): the sanctions lookup
+        runs once per distinct pair, thresholds are two comparisons per order.
+        """
+        sanctioned = {}
+        blocked_above, review_above = self.blocked_above, self.review_above
+        out = []
+        append = out.append
+        for amount, src, dst in orders:
+            hit = sanctioned.get((src, dst))
+            if hit is None:
+                hit = sanctioned[src, dst] = self.sanctions_hit(src, dst)
+            if hit:
+                append("sanctions_block")
+            elif amount > blocked_above:
+                append("threshold_blocked")
+            else:
+                append("threshold_review" if amount > review_above else "clear")
+        return out
+
+    def screen_conversion(self, amount_src: float, src: str, dst: str, velocity_stats,
+                          stage: str | None = None) -> dict:
+        """
+        Same result shape/strings as the original compliance_check.
+        velocity_stats(window_seconds, scope) -> (count, amount sum) is only
+        called if no earlier rule already blocked the conversion.
+        `stage` is this order's prescreen() result when a batch computed it already.
+        """
+        if stage is None:
+            stage = self.prescreen(amount_src, src, dst)
+        # 1) Sanctions (highest severity)
+        if stage == "sanctions_block":
+            return {"status": "blocked", "reason": "sanctions pair blacklist", "rules_triggered": ["sanctions_block"]}
+
+        # 2) Amount thresholds
+        if stage == "threshold_blocked":
+            return {"status": "blocked", "reason": self._blocked_reason, "rules_triggered": ["threshold_blocked"]}
+        rules = []
+        status, reason = "clear", "within limits"
+        if stage == "threshold_review":
+            status, reason = "review", self._review_reason
+            rules.append("threshold_review")
+
+        # 3) Velocity (structuring): every rule over its (scope, window) count + sum
+        hits, blocks = [], False
+        for code, scope, window, min_count, sum_above, blocking, why in self.velocity_rules:
+            n, total = velocity_stats(window, scope)
+            if ((min_count is not None and n >= min_count)
+                    or (sum_above is not None and total + amount_src > sum_above)):   # this one included
+                hits.append(why)
+                rules.append(code)
+                blocks = blocks or blocking
+        if hits:
+            why = " + ".join(hits)
+            if status == "review":
+                status, reason = "blocked", f"{reason} + {why}"
+            else:
+                status, reason = ("blocked" if blocks else "review"), why
+
+        return {"status": status, "reason": reason, "rules_triggered": rules}
+
+    # ---------- Explain-style (destination country / KYC) ----------
+    def _code(self, tx: dict) -> str:
+        if tx.get("dest_country") in self.blocked_countries:
+            return "COUNTRY_BLOCKED"
+        if tx.get("amount", 0) >= self.kyc_required_above and not tx.get("kyc_verified", False):
+            return "KYC_REQUIRED"
+        return "OK"
+
+    def evaluate(self, tx: dict) -> dict:
+        code = self._code(tx)
+        explanation, next_step = self._outcomes[code]
+        return {"id": tx["id"], "status": code, "explanation": explanation, "next_step": next_step}
+
+    def evaluate_many(self, txs) -> list:
+        """Batch path: one pass with all lookups bound locally; outcome strings are shared, not rebuilt."""
+        blocked = self.blocked_countries
+        kyc_above = self.kyc_required_above
+        outcomes = self._outcomes
+        out = []
+        append = out.append
+        for tx in txs:
+            get = tx.get
+            if get("dest_country") in blocked:
+                code = "COUNTRY_BLOCKED"
+            elif get("amount", 0) >= kyc_above and not get("kyc_verified", False):
+                code = "KYC_REQUIRED"
+            else:
+                code = "OK"
+            explanation, next_step = outcomes[code]
+            append({"id": tx["id"], "status": code, "explanation": explanation, "next_step": next_step})
+        return out
+
+
+def _compile_velocity_rule(rule: dict) -> tuple:
+    name = rule.get("name") or f"{rule.get('scope')}_{rule.get('window_seconds')}s"
+    scope = rule.get("scope", "any")
+    window = int(rule.get("window_seconds", 0))
+    min_count, sum_above = rule.get("min_count"), rule.get("sum_above")
+    action = rule.get("action", "review")
+    if scope not in VELOCITY_SCOPES:
+        raise ValueError(f"Velocity rule {name!r}: unknown scope {scope!r}. Use one of {list(VELOCITY_SCOPES)}.")
+    if window <= 0 or (min_count is None and sum_above is None):
+        raise ValueError(f"Velocity rule {name!r} needs window_seconds > 0 and min_count and/or sum_above.")
+    if sum_above is not None and scope not in SUM_SCOPES:
+        raise ValueError(f"Velocity rule {name!r}: sum_above mixes currencies on scope {scope!r}. "
+                         f"Use one of {list(SUM_SCOPES)}.")
+    if action not in VELOCITY_ACTIONS:
+        raise ValueError(f"Velocity rule {name!r}: unknown action {action!r}. Use one of {list(VELOCITY_ACTIONS)}.")
+    tests = []
+    if min_count is not None:
+        tests.append(f"count >= {min_count}")
+    if sum_above is not None:
+        tests.append(f"sum > {sum_above:,.0f}")
+    reason = f"{scope} {' or '.join(tests)} in {window}s"
+    return (f"velocity:{name}", scope, window, min_count,
+            None if sum_above is None else float(sum_above), action == "blocked", reason)
+
+
+def compile_rules(doc: dict, conversion_defaults: dict | None = None) -> CompiledRules:
+    return CompiledRules(doc, conversion_defaults)
+
+
+class RuleBook:
+    """Hot-reloading holder: get() recompiles only when the rule file's mtime/size changes."""
+
+    def __init__(self, path: Path = RULES_PATH, conversion_defaults: dict | None = None):
+        self.path = Path(path)
+        self.conversion_defaults = conversion_defaults
+        self._stamp = None
+        self._rules = None
+
+    def get(self) -> CompiledRules:
+        try:
+            st = os.stat(self.path)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stamp = None
+        if self._rules is None or stamp != self._stamp:
+            doc = {}
+            if stamp is not None:
+                try:
+                    with open(self.path, "r") as f:
+                        doc = json.load(f)
+                except json.JSONDecodeError as e:
+                    if self._rules is None:
+                        raise ValueError(f"Invalid compliance rules in {self.path}: {e}") from None
+                    # mid-edit: keep serving the last good rules until the file changes again
+                    print(f"[compliance] {self.path}: {e} (keeping the previous rules)", file=sys.stderr)
+                    self._stamp = stamp
+                    return self._rules
+            try:
+                rules = CompiledRules(doc, self.conversion_defaults)
+            except (KeyError, TypeError, ValueError) as e:
+                if self._rules is None:
+                    raise ValueError(f"Invalid compliance rules in {self.path}: {e}") from None
+                # bad edit: keep serving the last good rules, and say so once per file version
+                print(f"[compliance] {self.path}: {e} (keeping the previous rules)", file=sys.stderr)
+                self._stamp = stamp
+                return self._rules
+            self._rules = rules
+            self._stamp = stamp
+        return self._rules
@@ -1,5 +1,7 @@
 import json
 
+from compliance_engine import CompiledRules, RuleBook, compile_rules
+
 RULES_PATH = "fx_data/compliance_rules.json"
 CASES_PATH = "fx_data/compliance_examples.json"
 
@@ -8,25 +10,21 @@ def load_json(p):
         return json.load(f)
 
 def evaluate(tx, rules):
-    if tx.get("dest_country") in rules["blocked_countries"]:
-        code = "COUNTRY_BLOCKED"
-    elif tx.get("amount", 0) >= rules["kyc_required_above"] and not tx.get("kyc_verified", False):
-        code = "KYC_REQUIRED"
-    else:
-        code = "OK"
-    return {
-        "id": tx["id"],
-        "status": code,
-        "explanation": rules["explanations"][code],
-        "next_step": rules["next_steps"][code]
-    }
+    """rules: raw rules dict or CompiledRules (compile once when evaluating many)."""
+    if not isinstance(rules, CompiledRules):
+        rules = compile_rules(rules)
+    return rules.evaluate(tx)
+
+def evaluate_many(txs, rules):
+    if not isinstance(rules, CompiledRules):
+        rules = compile_rules(rules)
+    return rules.evaluate_many(txs)
 
 def main():
-    rules = load_json(RULES_PATH)
+    rules = RuleBook(RULES_PATH).get()
     cases = load_json(CASES_PATH)
     print("[Compliance] Why is this blocked? (human readable)\n")
-    for tx in cases:
-        res = evaluate(tx, rules)
+    for res in rules.evaluate_many(cases):
         print(f"- #{res['id']} → {res['status']}")
         print(f"  Why: {res['explanation']}")
         print(f"  Next: {res['next_step']}\n")
@@ -0,0 +1,66 @@
+"""
+Binary cache for parsed data files.
+
+cached(path, parse, tag) returns parse(path), but keeps the parsed object
+pickled under fx_data/.cache/ keyed on the source file's path, mtime and
+size: a later process (e.g. the next cron run) unpickles it instead of
+re-parsing JSON and rebuilding arrays, and any edit to the source
+invalidates it. A missing, stale or unreadable cache entry falls back to
+parsing; cache write failures are ignored.
+
+Config: AIVA_CACHE=0 turns it off; AIVA_CACHE_DIR moves it.
+The cache is local derived data: only point AIVA_CACHE_DIR at a directory
+you trust (pickles are executable).
+"""
+
+import os
+import pickle
+import zlib
+from pathlib import Path
+
+ENABLED = os.environ.get("AIVA_CACHE", "1") != "0"
+CACHE_DIR = Path(os.environ.get("AIVA_CACHE_DIR", "fx_data/.cache"))
+CACHE_VERSION = 1
+
+
+def _entry(path: Path, tag: str) -> Path:
+    digest = zlib.crc32(str(path.resolve()).encode())
+    return CACHE_DIR / f"{path.stem}.{tag}.{digest:08x}.pickle"
+
+
+def cached(path, parse, tag: str):
+    """parse(path), served from the pickle cache while the file's (mtime, size) is unchanged."""
+    path = Path(path)
+    if not ENABLED:
+        return parse(path)
+    st = os.stat(path)                        # missing source: FileNotFoundError, as parse() would
+    key = (CACHE_VERSION, str(path.resolve()), tag, st.st_mtime_ns, st.st_size)
+    entry = _entry(path, tag)
+    try:
+        with open(entry, "rb") as f:
+            stored_key, value = pickle.load(f)
+        if stored_key == key:
+            return value
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError, AttributeError):
+        pass
+
+    value = parse(path)
+    try:
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = entry.with_name(f"{entry.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, entry)
+    except OSError:
+        pass
+    return value
+
+
+def clear() -> int:
+    """Delete every cache entry; returns how many were removed."""
+    n = 0
+    if CACHE_DIR.is_dir():
+        for entry in CACHE_DIR.glob("*.pickle"):
+            entry.unlink(missing_ok=True)
+            n += 1
+    return n
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Smart FX advisor: rate windows → prompt → backend → advice, cached and batched
+
+- The prompt template (ai/smart_fx_prompt.txt) is compiled once into literal
+  parts + placeholders and re-compiled only when the file changes
+- Each pair's recent rate window is rendered into the prompt; responses are
+  cached under a hash of (backend, model, prompt), so identical windows are
+  asked once (also within a batch) and unchanged data costs nothing.
+  Entries expire after a TTL; the least recently used are evicted past
+  max_entries. The cache can persist to fx_data/advice_cache.json between runs.
+- Many pairs are asked concurrently through a bounded thread pool
+- Backends: "local" (deterministic stand-in built on the threshold rules,
+  offline) and "openai" (ChatCompletion; openai is imported on first use)
+
+Config: AIVA_ADVISOR_BACKEND (default local), OPENAI_API_KEY, AIVA_ADVISOR_MODEL.
+
+Usage:
+  python3 ai/fx_advisor.py [--pairs USD_AUD,EUR_AUD,AUD_USD] [--days 7] [--backend local|openai]
+                           [--concurrency 4] [--ttl 3600] [--threshold 1.0] [--data fx_data/fxrates.json]
+                           [--no-cache]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from log_store import atomic_write_json
+
+TEMPLATE_PATH = Path(__file__).with_name("smart_fx_prompt.txt")
+ADVICE_CACHE_PATH = Path("fx_data/advice_cache.json")
+DATA_PATH = "fx_data/fxrates.json"
+DEFAULT_PAIRS = ["USD_AUD", "EUR_AUD", "AUD_USD"]
+DEFAULT_BACKEND = os.environ.get("AIVA_ADVISOR_BACKEND", "local")
+DEFAULT_MODEL = os.environ.get("AIVA_ADVISOR_MODEL", "gpt-4")
+DEFAULT_TTL = 3600.0
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_CONCURRENCY = 4
+
+CURRENCY_NAMES = {"AUD": "Australian Dollar", "USD": "US Dollar", "EUR": "Euro"}
+
+
+# ---------- Prompt template ----------
+class PromptTemplate:
+    """{{NAME}} placeholders, split once into literal parts; render() is a join."""
+
+    _PLACEHOLDER = re.compile(r"\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}\}")
+
+    def __init__(self, text: str):
+        self.parts = self._PLACEHOLDER.split(text)   # literal, name, literal, name, ..., literal
+        self.fields = set(self.parts[1::2])
+
+    def render(self, **values) -> str:
+        missing = self.fields - values.keys()
+        if missing:
+            raise KeyError(f"Missing template field(s): {sorted(missing)}")
+        out = list(self.parts)
+        for i in range(1, len(out), 2):
+            out[i] = str(values[out[i]])
+        return "".join(out)
+
+
+_TEMPLATES: dict = {}
+
+def get_template(path: Path = TEMPLATE_PATH) -> PromptTemplate:
+    """Compiled template per file, re-compiled only when its mtime/size changes."""
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _TEMPLATES.get(str(path))
+    if cached is None or cached[0] != stamp:
+        with open(path, "r") as f:
+            cached = _TEMPLATES[str(path)] = (stamp, PromptTemplate(f.read()))
+    return cached[1]
+
+
+# ---------- Rate windows ----------
+def rate_windows(pairs: list, days: int, path: str = DATA_PATH) -> dict:
+    """
+    {pair: {"pair": "USD/AUD", "rates": [...], "dates": [...]}} with the last `days`
+    observations per pair; a pair missing from the data uses its inverse if present,
+    else maps to None.
+    """
+    from fx_trend_engine import load_rate_history
+
+    hist = load_rate_history(path)
+    dates = [str(d).replace("T00:00:00", "") for d in hist.dates]
+    out = {}
+    for pair in pairs:
+        base, quote = pair.split("_")
+        invert = pair not in hist.pairs
+        col = f"{quote}_{base}" if invert else pair
+        if col not in hist.pairs:
+            out[pair] = None
+            continue
+        j = hist.column(col)
+        rows = hist.mask[:, j].nonzero()[0][-days:]
+        if not len(rows):
+            out[pair] = None
+            continue
+        rates = [float(hist.values[i, j]) for i in rows]
+        out[pair] = {
+            "pair": f"{base}/{quote}",
+            "rates": [round(1.0 / r, 6) for r in rates] if invert else rates,
+            "dates": [dates[i] for i in rows],
+        }
+    return out
+
+
+# ---------- Backends ----------
+class LocalBackend:
+    """
+    Deterministic offline stand-in: reads the window it is given and answers
+    with the threshold rules of fx_trend_with_threshold (same input → same text).
+    """
+
+    name = "local"
+
+    def __init__(self, model: str | None = None, threshold_pct: float = 1.0):
+        self.model = model or f"threshold-{threshold_pct:g}%"    # part of the cache key
+        self.threshold_pct = threshold_pct
+
+    def complete(self, prompt: str, window: dict) -> str:
+        from fx_trend_with_threshold import action_from_move, pct_change
+
+        base, quote = window["pair"].split("/")
+        rates = window["rates"]
+        change = pct_change(rates[0], rates[-1])
+        urgency, _, tip = action_from_move(change, quote_ccy=quote, base_ccy=base,
+                                           threshold_pct=self.threshold_pct)
+        base_name = CURRENCY_NAMES.get(base, base)
+        quote_name = CURRENCY_NAMES.get(quote, quote)
+        if change == 0:
+            trend = f"The {base_name} is flat against the {quote_name}"
+        else:
+            trend = (f"The {base_name} is {'strengthening' if change > 0 else 'weakening'} "
+                     f"against the {quote_name} ({change:+.2f}% over {len(rates)} days)")
+        advice = "It may be better to convert now." if urgency == "Convert Now" else \
+            "The move is small, so waiting is reasonable."
+        return f"{trend}. {advice} {tip}."
+
+
+class OpenAIBackend:
+    name = "openai"
+
+    def __init__(self, model: str = DEFAULT_MODEL, api_key: str | None = None):
+        self.model = model
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+
+    def complete(self, prompt: str, window: dict | None = None) -> str:
+        import openai   # only needed when actually calling the API
+
+        if not self.api_key:
+            raise RuntimeError("OPENAI_API_KEY is not set.")
+        openai.api_key = self.api_key
+        response = openai.ChatCompletion.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return response.choices[0].message["content"]
+
+
+BACKENDS = {"local": LocalBackend, "openai": OpenAIBackend}
+
+def make_backend(name: str = DEFAULT_BACKEND, **kwargs):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown advisor backend {name!r}. Use one of {sorted(BACKENDS)}.")
+    return BACKENDS[name](**kwargs)
+
+
+# ---------- Response cache ----------
+class ResponseCache:
+    """Content-hash → response, with TTL expiry and LRU eviction (thread-safe)."""
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 path: Path | None = None):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.path = Path(path) if path else None
+        self._entries: OrderedDict = OrderedDict()   # key -> (expires_at, text)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+        if self.path:
+            self._load()
+
+    @staticmethod
+    def key(backend_name: str, model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{backend_name}\0{model}\0{prompt}".encode()).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, text: str):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                doc = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        now = time.time()
+        for key, expires_at, text in doc.get("entries", []):
+            if expires_at > now:
+                self._entries[key] = (expires_at, text)
+
+    def save(self):
+        """Persist unexpired entries (LRU order) atomically."""
+        if not self.path:
+            return
+        now = time.time()
+        with self._lock:
+            entries = [[k, exp, text] for k, (exp, text) in self._entries.items() if exp > now]
+        atomic_write_json(self.path, {"entries": entries}, indent=None, fsync=False)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions}
+
+
+# ---------- Advisor ----------
+@dataclass
+class Advice:
+    pair: str
+    text: str
+    cached: bool = False
+    error: str | None = None
+
+
+class Advisor:
+    def __init__(self, backend=None, cache: ResponseCache | None = None,
+                 concurrency: int = DEFAULT_CONCURRENCY, template: PromptTemplate | None = None):
+        self.backend = backend or make_backend()
+        self.cache = cache if cache is not None else ResponseCache()
+        self.concurrency = max(1, concurrency)
+        self.template = template
+
+    def prompt_for(self, window: dict) -> str:
+        template = self.template or get_template()
+        return template.render(INSERT_JSON_HERE=json.dumps(window))
+
+    def _key(self, prompt: str) -> str:
+        return ResponseCache.key(self.backend.name, getattr(self.backend, "model", ""), prompt)
+
+    def advise(self, pair: str, window: dict | None) -> Advice:
+        return self.advise_many({pair: window})[0]
+
+    def advise_many(self, windows: dict) -> list:
+        """
+        Advice per pair (input order). Cached answers are served directly; the
+        remaining distinct prompts are sent once each, at most `concurrency` at a time.
+        """
+        results: dict = {}
+        pending: dict = {}      # cache key -> (prompt, window, [pairs])
+        for pair, window in windows.items():
+            if window is None:
+                results[pair] = Advice(pair, "N/A (data missing) → Hold position")
+                continue
+            prompt = self.prompt_for(window)
+            key = self._key(prompt)
+            text = self.cache.get(key)
+            if text is not None:
+                results[pair] = Advice(pair, text, cached=True)
+            elif key in pending:
+                pending[key][2].append(pair)
+            else:
+                pending[key] = (prompt, window, [pair])
+
+        if pending:
+            def ask(item):
+                key, (prompt, window, pairs) = item
+                try:
+                    text = self.backend.complete(prompt, window)
+                except Exception as e:        # one failed pair should not sink the batch
+                    return key, pairs, None, f"{type(e).__name__}: {e}"
+                self.cache.put(key, text)
+                return key, pairs, text, None
+
+            workers = min(self.concurrency, len(pending))
+            if workers == 1:
+                answers = [ask(item) for item in pending.items()]
+            else:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="advisor") as pool:
+                    answers = list(pool.map(ask, pending.items()))
+            for _, pairs, text, error in answers:
+                for i, pair in enumerate(pairs):
+                    results[pair] = Advice(pair, text or "", cached=i > 0 and text is not None, error=error)
+        return [results[pair] for pair in windows]
+
+
+# ---------- CLI ----------
+def main():
+    ap = argparse.ArgumentParser(description="Smart FX advice per pair (cached, batched)")
+    ap.add_argument("--pairs", default=",".join(DEFAULT_PAIRS))
+    ap.add_argument("--days", type=int, default=7, help="observations per rate window (default 7)")
+    ap.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND)
+    ap.add_argument("--model", default=None)
+    ap.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    ap.add_argument("--ttl", type=float, default=DEFAULT_TTL, help="cache TTL in seconds (default 3600)")
+    ap.add_argument("--threshold", type=float, default=1.0, help="local backend: decision threshold in %%")
+    ap.add_argument("--data", default=DATA_PATH)
+    ap.add_argument("--no-cache", action="store_true", help="do not read or write fx_data/advice_cache.json")
+    args = ap.parse_args()
+
+    if args.backend == "local":
+        backend = LocalBackend(threshold_pct=args.threshold, **({"model": args.model} if args.model else {}))
+    else:
+        backend = OpenAIBackend(model=args.model or DEFAULT_MODEL)
+    cache = ResponseCache(ttl=args.ttl, path=None if args.no_cache else ADVICE_CACHE_PATH)
+    advisor = Advisor(backend, cache, concurrency=args.concurrency)
+
+    pairs = [p.strip().upper() for p in args.pairs.split(",") if p.strip()]
+    t0 = time.perf_counter()
+    advice = advisor.advise_many(rate_windows(pairs, args.days, args.data))
+    elapsed = time.perf_counter() - t0
+
+    print(f"[Smart FX Advisor] backend={backend.name} model={backend.model} | last {args.days} observations")
+    for a in advice:
+        if a.error:
+            print(f"- {a.pair}: error ({a.error})")
+        else:
+            print(f"- {a.pair}: {a.text}" + ("  (cached)" if a.cached else ""))
+    s = cache.stats()
+    print(f"Cache: {s['hits']} hits | {s['misses']} misses | {s['entries']} entries | {elapsed * 1e3:.1f} ms")
+    cache.save()
+
+if __name__ == "__main__":
+    main()
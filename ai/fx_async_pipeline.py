@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Async conversion front end (asyncio) with one ordered writer.
+
+Per conversion, in one step on the event-loop thread (no awaits in between):
+  1. validate + price from in-memory state
+  2. carbon estimate (one multiply, inline) and compliance screen
+  3. apply to balances and queue the tx/audit records
+Because a conversion never yields mid-way, conversions are atomic with
+respect to each other and settle in the order they were submitted; no
+locks are needed. The CPU work is serial on the loop (this is not a
+parallel engine): what overlaps with it is disk I/O.
+
+A single writer task owns all disk writes: it drains queued tx/audit
+records in settlement order and flushes them (plus balances) in batches
+on a worker thread while conversions continue. Orders are streamed from
+the input, and the feeder yields to the loop after each one so the writer
+keeps up.
+
+Usage:
+  python3 ai/fx_async_pipeline.py <orders.jsonl>
+"""
+
+import argparse
+import asyncio
+import time
+from pathlib import Path
+
+import fx_conversion_sim as sim
+
+
+class AsyncConversionPipeline:
+    def __init__(self, state: dict | None = None, flush_interval: float = 0.05):
+        self.state = state if state is not None else sim.load_state()
+        self.flush_interval = flush_interval
+        self._dirty = None
+        self._writer = None
+        self._closing = False
+
+    async def start(self):
+        self._dirty = asyncio.Event()
+        self._writer = asyncio.create_task(self._write_loop(), name="ordered-writer")
+
+    async def convert(self, src: str, dst: str, amount: float, wallet_id: str | None = None) -> dict:
+        # no await until the conversion is recorded: it runs atomically on the loop
+        state = self.state
+        src, dst = sim.validate_order(state, src, dst, amount, wallet_id)
+        rate = sim.get_rate(state["day_rates"], src, dst, fx_date=state["fx_date"])
+
+        co2_kg = sim.estimate_carbon_kg(amount, f"{src}_{dst}", state["carbon_factors"])
+        comp = sim.compliance_check(amount, src, dst, velocity=sim.velocity_for(state), wallet_id=wallet_id)
+        res = sim.record_settlement(state, src, dst, amount, rate, co2_kg, comp, wallet_id)
+        self._dirty.set()
+        return res
+
+    def _take_batch(self) -> dict | None:
+        """Swap out queued records (on the loop thread, so the order is the settlement order)."""
+        state = self.state
+        if not state["pending_tx"] and not state["balances_dirty"]:
+            return None
+        batch = {
+            "balances": dict(state["balances"]),
+            "balances_dirty": state["balances_dirty"],
+            "pending_tx": state["pending_tx"],
+            "pending_audit": state["pending_audit"],
+        }
+        if state["wallets"] is not None:
+            # snapshot changed wallets here; flush_state commits them and only then writes sqlite
+            batch["wallet_store"] = state["wallets"]
+            batch["wallet_snapshots"] = state["wallets"].take_dirty()
+        state["pending_tx"], state["pending_audit"] = [], []
+        state["balances_dirty"] = False
+        return batch
+
+    async def _write_loop(self):
+        while True:
+            await self._dirty.wait()
+            self._dirty.clear()
+            await asyncio.sleep(self.flush_interval)  # let a batch accumulate
+            batch = self._take_batch()
+            if batch:
+                await asyncio.to_thread(sim.flush_state, batch)
+            if self.state.pop("velocity_dirty", False):
+                # the index is mutated by conversions, so save it on the loop thread
+                sim.save_velocity_index(self.state["velocity"])
+            if self._closing and not self._dirty.is_set():
+                return
+
+    async def close(self):
+        self._closing = True
+        self._dirty.set()
+        await self._writer
+
+
+async def run_orders(orders) -> dict:
+    pipeline = AsyncConversionPipeline()
+    await pipeline.start()
+    summary = {"orders": 0, "settled": 0, "blocked": 0, "rejected": 0}
+    try:
+        for order in orders:
+            summary["orders"] += 1
+            try:
+                res = await pipeline.convert(str(order["src"]), str(order["dst"]), float(order["amount"]),
+                                             order.get("wallet_id"))
+            except (KeyError, TypeError, ValueError, OverflowError):
+                summary["rejected"] += 1
+            else:
+                summary["blocked" if res["compliance"]["status"] == "blocked" else "settled"] += 1
+            await asyncio.sleep(0)   # let the writer take its batch
+    finally:
+        await pipeline.close()
+    summary["balances"] = dict(pipeline.state["balances"])
+    return summary
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run orders through the asyncio conversion pipeline")
+    ap.add_argument("orders", type=Path, help="JSONL file, one {\"src\", \"dst\", \"amount\"} per line")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    summary = asyncio.run(run_orders(sim.load_orders(args.orders)))
+    elapsed = time.perf_counter() - t0
+
+    print("[FX Conversion Pipeline – async]")
+    print(f"Orders: {summary['orders']} | Settled: {summary['settled']} | "
+          f"Blocked: {summary['blocked']} | Rejected: {summary['rejected']}")
+    print(f"Elapsed: {elapsed:.2f}s ({summary['orders'] / max(elapsed, 1e-9):,.0f} orders/s)")
+    b = summary["balances"]
+    print(f"Balances: USD {sim.fmt_money(b.get('USD',0))} | "
+          f"EUR {sim.fmt_money(b.get('EUR',0))} | "
+          f"AUD {sim.fmt_money(b.get('AUD',0))}")
+
+if __name__ == "__main__":
+    main()
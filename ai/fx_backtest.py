@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Parallel backtester for the Smart FX threshold strategy
+
+Replays the action_from_move() policy over the whole rate history for every
+(threshold, window) in a grid and simulates the conversions it would trigger:
+- for each pair BASE_QUOTE, the move is the % change over the last `window` rows
+- "Convert Now" fires when |move| ≥ threshold; a conversion is made when the
+  signal turns on (or flips direction), not on every day it stays on
+    rising  → "converting out of QUOTE": sell NOTIONAL QUOTE for BASE
+    falling → "holding QUOTE":           sell NOTIONAL QUOTE's worth of BASE for QUOTE
+- conversions are priced with get_rate() on that day's rates (crosses and
+  inverses through the rate engine, exactly like fx_conversion_sim)
+- P&L is in QUOTE units per pair: what the converted amounts are worth at
+  the last rate of the history versus having done nothing. Pairs quote in
+  different currencies, so a configuration's total (which ranks the grid) is
+  each pair's P&L converted to one reporting currency (--report, default AUD)
+  at the last rate; per-quote-currency subtotals are reported alongside
+
+The per-day rates are resolved once per worker; each worker then takes a
+chunk of the grid, computes the rolling move once per window and evaluates
+all of its thresholds on whole dates × pairs arrays.
+
+Usage:
+  python3 ai/fx_backtest.py [--thresholds 0.1:5:0.1] [--windows 1:30] [--notional 1000]
+                            [--data fx_data/fxrates.json] [--workers N] [--top 10]
+                            [--report AUD] [--out results.json] [--check THRESHOLD WINDOW]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from fx_conversion_sim import get_rate
+from fx_trend_engine import DATA_PATH, forward_fill, load_rate_history, rolling_pct_change, threshold_signals
+from fx_trend_with_threshold import action_from_move
+
+DEFAULT_THRESHOLDS = "0.1:5:0.1"
+DEFAULT_WINDOWS = "1:30"
+NOTIONAL = 1000.0   # QUOTE units per conversion
+REPORT_CCY = "AUD"  # currency the grid is ranked in
+
+
+# ---------- Market data ----------
+def _day_label(d) -> str:
+    return str(d).replace("T00:00:00", "")
+
+def day_rates_at(hist, t: int) -> dict:
+    """The rates quoted on row t, in the shape get_rate() expects."""
+    return {p: float(hist.values[t, j]) for j, p in enumerate(hist.pairs) if hist.mask[t, j]}
+
+def conversion_rates(hist) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (to_base, to_quote), each dates × pairs: get_rate(QUOTE→BASE) and
+    get_rate(BASE→QUOTE) on every row, NaN where the day can't price the pair.
+    """
+    shape = hist.values.shape
+    to_base, to_quote = np.full(shape, np.nan), np.full(shape, np.nan)
+    legs = [p.split("_", 1) for p in hist.pairs]
+    for t, d in enumerate(hist.dates):
+        day, fx_date = day_rates_at(hist, t), _day_label(d)
+        if not day:
+            continue
+        for j, (base, quote) in enumerate(legs):
+            try:
+                to_base[t, j] = get_rate(day, quote, base, fx_date)
+                to_quote[t, j] = get_rate(day, base, quote, fx_date)
+            except ValueError:
+                pass
+    return to_base, to_quote
+
+
+def report_factors(hist, ccy: str) -> np.ndarray:
+    """Per pair: get_rate(QUOTE→ccy) on the last row that can price it (1.0 when QUOTE is ccy)."""
+    out = np.full(len(hist.pairs), np.nan)
+    for j, pair in enumerate(hist.pairs):
+        quote = pair.split("_", 1)[1]
+        if quote == ccy:
+            out[j] = 1.0
+            continue
+        for t in range(len(hist.dates) - 1, -1, -1):
+            day = day_rates_at(hist, t)
+            try:
+                out[j] = get_rate(day, quote, ccy, _day_label(hist.dates[t]))
+                break
+            except ValueError:
+                continue
+        else:
+            raise ValueError(f"No rate converts {quote} to the reporting currency {ccy}.")
+    return out
+
+
+# ---------- Strategy ----------
+def entry_signals(change: np.ndarray, threshold_pct: float) -> np.ndarray:
+    """Signal (+1/-1) on rows where it turns on or flips direction, 0 elsewhere."""
+    sig = threshold_signals(change, threshold_pct)
+    prev = np.zeros_like(sig)
+    prev[1:] = sig[:-1]
+    return np.where(sig != prev, sig, 0).astype(np.int8)
+
+
+def evaluate(entries: np.ndarray, to_base: np.ndarray, to_quote: np.ndarray,
+             notional: float = NOTIONAL) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Per pair: (P&L in QUOTE units marked at the last rate, conversion count).
+    Entries on rows the day's rates can't price are skipped.
+    """
+    priced = ~np.isnan(to_base) & ~np.isnan(to_quote)
+    up = (entries > 0) & priced
+    down = (entries < 0) & priced
+    mark = _last_valid(to_quote)                       # BASE→QUOTE at the end
+    base_bought = notional * to_base                   # BASE received for NOTIONAL QUOTE
+    with np.errstate(invalid="ignore"):
+        pnl_up = base_bought * mark - notional
+        pnl_down = base_bought * (to_quote - mark)
+    pnl = np.where(up, pnl_up, 0.0).sum(axis=0) + np.where(down, pnl_down, 0.0).sum(axis=0)
+    return pnl, (up | down).sum(axis=0)
+
+
+def _last_valid(x: np.ndarray) -> np.ndarray:
+    """Last non-NaN value per column (NaN if none)."""
+    ok = ~np.isnan(x)
+    last = len(x) - 1 - np.argmax(ok[::-1], axis=0)
+    return np.where(ok.any(axis=0), x[last, np.arange(x.shape[1])], np.nan)
+
+
+# ---------- Workers ----------
+_W: dict = {}
+
+def _init_worker(data_path: str, notional: float, report_ccy: str = REPORT_CCY):
+    """Load the history and resolve the day rates once per process."""
+    hist = load_rate_history(data_path)
+    to_base, to_quote = conversion_rates(hist)
+    _W.update(hist=hist, filled=forward_fill(hist.values, hist.mask),
+              to_base=to_base, to_quote=to_quote, notional=notional,
+              report_fx=report_factors(hist, report_ccy),
+              quotes=[p.split("_", 1)[1] for p in hist.pairs])
+
+
+def _run_chunk(task: tuple[int, list]) -> list[dict]:
+    window, thresholds = task
+    hist = _W["hist"]
+    change = rolling_pct_change(hist.values, hist.mask, window, _W["filled"])
+    rows = []
+    for threshold in thresholds:
+        pnl, count = evaluate(entry_signals(change, threshold), _W["to_base"], _W["to_quote"], _W["notional"])
+        by_quote = {}
+        for q, v in zip(_W["quotes"], np.nan_to_num(pnl)):
+            by_quote[q] = by_quote.get(q, 0.0) + float(v)
+        rows.append({
+            "threshold_pct": threshold,
+            "window": window,
+            "conversions": int(count.sum()),
+            "pnl_report": float(np.nansum(pnl * _W["report_fx"])),
+            "pnl_by_quote": {q: round(v, 2) for q, v in by_quote.items()},
+            "pairs": {p: {"conversions": int(count[j]), "pnl_quote": round(float(pnl[j]), 2)}
+                      for j, p in enumerate(hist.pairs)},
+        })
+    return rows
+
+
+def make_tasks(thresholds: list, windows: list, workers: int) -> list[tuple[int, list]]:
+    """One task per window, split further so every worker gets several tasks."""
+    per_window = max(1, -(-4 * workers // max(len(windows), 1)))
+    size = max(1, -(-len(thresholds) // per_window))
+    return [(w, thresholds[i:i + size]) for w in windows for i in range(0, len(thresholds), size)]
+
+
+def run_grid(thresholds: list, windows: list, data_path: str = DATA_PATH,
+             notional: float = NOTIONAL, workers: int | None = None,
+             report_ccy: str = REPORT_CCY) -> list[dict]:
+    """Evaluate every (threshold, window) across a process pool; results sorted by total P&L in report_ccy."""
+    workers = workers or os.cpu_count() or 1
+    tasks = make_tasks(thresholds, windows, workers)
+    if workers == 1:
+        _init_worker(data_path, notional, report_ccy)
+        results = [r for task in tasks for r in _run_chunk(task)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(data_path, notional, report_ccy)) as pool:
+            results = [r for chunk in pool.map(_run_chunk, tasks) for r in chunk]
+    results.sort(key=lambda r: (-r["pnl_report"], r["conversions"], r["threshold_pct"], r["window"]))
+    return results
+
+
+# ---------- Reference replay (one config, one day at a time) ----------
+def replay_policy(hist, threshold_pct: float, window: int, notional: float = NOTIONAL) -> dict:
+    """
+    Day-by-day replay calling action_from_move() and get_rate() directly;
+    used by --check to confirm the vectorized grid agrees with the policy.
+    """
+    filled = forward_fill(hist.values, hist.mask)
+    last_quote = {}
+    trades = {p: [] for p in hist.pairs}
+    prev_signal = {p: 0 for p in hist.pairs}
+    for t in range(len(hist.dates)):
+        day, fx_date = day_rates_at(hist, t), _day_label(hist.dates[t])
+        for j, pair in enumerate(hist.pairs):
+            base, quote = pair.split("_", 1)
+            try:
+                rates = (get_rate(day, quote, base, fx_date), get_rate(day, base, quote, fx_date))
+            except ValueError:
+                rates = None
+            if rates:
+                last_quote[pair] = rates[1]
+            signal = 0
+            if t >= window:
+                prev = filled[t - window, j]
+                if not np.isnan(prev) and not np.isnan(filled[t, j]):
+                    pct = (filled[t, j] - prev) / prev * 100.0 if prev != 0 else 0.0
+                    urgency, _, _ = action_from_move(pct, quote, base, threshold_pct=threshold_pct)
+                    if urgency == "Convert Now":
+                        signal = 1 if pct > 0 else -1 if pct < 0 else 0
+            if signal and signal != prev_signal[pair] and rates:
+                trades[pair].append((signal, rates))
+            prev_signal[pair] = signal
+    out = {}
+    for pair, pair_trades in trades.items():
+        mark = last_quote.get(pair)
+        pnl = 0.0
+        for signal, (to_base, to_quote) in pair_trades:
+            base_bought = notional * to_base
+            pnl += base_bought * mark - notional if signal > 0 else base_bought * (to_quote - mark)
+        out[pair] = {"conversions": len(pair_trades), "pnl_quote": round(pnl, 2)}
+    return out
+
+
+# ---------- CLI ----------
+def parse_grid(spec: str, cast=float) -> list:
+    """'a,b,c' or 'start:stop:step' (inclusive; step defaults to 1)."""
+    if ":" in spec:
+        parts = [float(x) for x in spec.split(":")]
+        start, stop = parts[0], parts[1]
+        step = parts[2] if len(parts) > 2 else 1.0
+        if step <= 0:
+            raise ValueError(f"Grid step must be > 0: {spec!r}")
+        n = int(round((stop - start) / step)) + 1
+        values = [round(start + i * step, 10) for i in range(max(n, 0))]
+    else:
+        values = [float(x) for x in spec.split(",") if x.strip()]
+    return sorted({cast(v) for v in values})
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Backtest the Smart FX threshold strategy over a parameter grid")
+    ap.add_argument("--thresholds", default=DEFAULT_THRESHOLDS, help="%% thresholds: a,b,c or start:stop:step")
+    ap.add_argument("--windows", default=DEFAULT_WINDOWS, help="window lengths in rows: a,b,c or start:stop[:step]")
+    ap.add_argument("--notional", type=float, default=NOTIONAL, help="QUOTE units per conversion")
+    ap.add_argument("--data", default=DATA_PATH)
+    ap.add_argument("--workers", type=int, default=0, help="processes (default: all cores)")
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--report", default=REPORT_CCY, help="currency totals are converted to and ranked in")
+    ap.add_argument("--out", help="write every configuration's result as JSON")
+    ap.add_argument("--check", nargs=2, type=float, metavar=("THRESHOLD", "WINDOW"),
+                    help="compare one grid config against the day-by-day action_from_move replay")
+    args = ap.parse_args()
+
+    thresholds = parse_grid(args.thresholds)
+    windows = [w for w in parse_grid(args.windows, int) if w >= 1]
+    if not thresholds or not windows:
+        sys.exit("Empty grid.")
+
+    if args.check:
+        threshold, window = args.check[0], int(args.check[1])
+        hist = load_rate_history(args.data)
+        expected = replay_policy(hist, threshold, window, args.notional)
+        got = run_grid([threshold], [window], args.data, args.notional, workers=1)[0]["pairs"]
+        ok = all(abs(expected[p]["pnl_quote"] - got[p]["pnl_quote"]) < 0.01
+                 and expected[p]["conversions"] == got[p]["conversions"] for p in expected)
+        print(json.dumps({"ok": ok, "replay": expected, "grid": got}, indent=2))
+        sys.exit(0 if ok else 1)
+
+    workers = args.workers or os.cpu_count() or 1
+    t0 = time.perf_counter()
+    report = args.report.upper()
+    try:
+        results = run_grid(thresholds, windows, args.data, args.notional, workers, report)
+    except ValueError as e:
+        sys.exit(str(e))
+    elapsed = time.perf_counter() - t0
+
+    hist = load_rate_history(args.data)
+    print(f"[Smart FX Backtest] {len(results):,} configurations "
+          f"({len(thresholds)} thresholds × {len(windows)} windows) × {len(hist.pairs)} pairs "
+          f"over {len(hist.dates)} observations ({_day_label(hist.dates[0])} → {_day_label(hist.dates[-1])})")
+    print(f"Notional {args.notional:,.2f} QUOTE per conversion | {workers} workers | {elapsed:.2f}s\n")
+
+    print(f"Top {min(args.top, len(results))} by total P&L in {report} "
+          f"(each pair's QUOTE P&L converted at the last rate):")
+    for r in results[:args.top]:
+        per_quote = ", ".join(f"{q} {v:+,.2f}" for q, v in r["pnl_by_quote"].items())
+        per_pair = ", ".join(f"{p} {v['pnl_quote']:+,.2f}/{v['conversions']}" for p, v in r["pairs"].items())
+        print(f"- threshold {r['threshold_pct']:.2f}% window {r['window']:>3}: "
+              f"P&L {r['pnl_report']:+,.2f} {report} ({per_quote}) | {r['conversions']} conversions | {per_pair}")
+
+    print("\nBest per pair:")
+    for pair in hist.pairs:
+        best = max(results, key=lambda r: (r["pairs"][pair]["pnl_quote"], -r["pairs"][pair]["conversions"]))
+        v = best["pairs"][pair]
+        print(f"- {pair}: threshold {best['threshold_pct']:.2f}% window {best['window']} → "
+              f"P&L {v['pnl_quote']:+,.2f} over {v['conversions']} conversions")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"notional": args.notional, "data": args.data, "report_ccy": report,
+                       "results": results}, f, indent=2)
+        print(f"\nWrote {len(results):,} results → {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Reproducible benchmark suite for the conversion pipeline
+
+Each case runs in its own process, in a scratch directory seeded with
+synthetic data (ai/synthetic_data.py, fixed seed) plus the repo's
+compliance rules and carbon factors, so runs never touch fx_data/ and no
+cache leaks from one case into the next.
+
+Cases (SIZE is the scaled dimension):
+  simulate    simulate_many() throughput               SIZE = orders
+  get_rate    rate lookups (latest day / as-of)        SIZE = days of fxrates history
+  compliance  velocity rebuild + compliance_check()    SIZE = tx log records
+  trend       load_rate_history() + analyze()          SIZE = history rows
+  carbon      CarbonFactors.transactions_kg()          SIZE = tx records
+
+Results go to JSON (bench_results/latest.json by default). When a baseline
+exists (bench_results/baseline.json, or --baseline PATH), every metric is
+compared with it and the run exits 1 if one got worse by more than
+--tolerance (default 15%).
+
+Usage:
+  python3 ai/fx_bench.py [--scale small|medium|large] [--only simulate,trend] [--sizes 1000,100000]
+                         [--repeat 3] [--seed 7] [--out PATH] [--baseline PATH] [--save-baseline]
+                         [--tolerance 0.15]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import synthetic_data as synth
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "bench_results"
+BASELINE_PATH = RESULTS_DIR / "baseline.json"
+LATEST_PATH = RESULTS_DIR / "latest.json"
+SHARED_DATA = ("fx_data/compliance_rules.json", "fx_data/carbon_factors.json")
+
+SCALES = {
+    "small":  {"simulate": [1_000], "get_rate": [1_000], "compliance": [1_000, 10_000],
+               "trend": [1_000, 10_000], "carbon": [1_000, 10_000]},
+    "medium": {"simulate": [1_000, 10_000], "get_rate": [1_000, 10_000],
+               "compliance": [10_000, 100_000, 1_000_000], "trend": [10_000, 100_000],
+               "carbon": [10_000, 100_000]},
+    "large":  {"simulate": [10_000, 100_000], "get_rate": [10_000, 100_000],
+               "compliance": [100_000, 1_000_000, 10_000_000], "trend": [100_000, 1_000_000],
+               "carbon": [100_000, 1_000_000]},
+}
+LOOKUPS = 20_000
+
+
+def _clock(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - t0, out
+
+
+# ---------- Cases (run inside the scratch directory) ----------
+def case_simulate(size: int, seed: int, repeat: int) -> list:
+    synth.write_json(Path("fx_data/fxrates.json"), synth.fxrates_history(30, seed=seed))
+    synth.write_json(Path("fx_data/balances.json"), {c: 1e12 for c in synth.CURRENCIES})
+    orders = list(synth.orders(size, seed))
+    import fx_conversion_sim as sim
+
+    secs, summary = _clock(sim.simulate_many, orders)
+    if summary["rejected"]:
+        raise RuntimeError(f"{summary['rejected']} synthetic orders rejected: {summary['errors'][:1]}")
+    return [("orders_per_s", size / secs, True), ("batch_s", secs, False)]
+
+
+def case_get_rate(size: int, seed: int, repeat: int) -> list:
+    synth.write_json(Path("fx_data/fxrates.json"), synth.fxrates_history(size, seed=seed))
+    import fx_conversion_sim as sim
+    from rate_store import RateFeed
+
+    rng = random.Random(seed)
+    pairs = [tuple(rng.sample(synth.CURRENCIES, 2)) for _ in range(LOOKUPS)]
+    store = sim.RATES.store()
+    t_first, t_last = store.span()
+    times = [rng.uniform(t_first, t_last) for _ in range(LOOKUPS)]
+    fx_date, day_rates = store.day_rates(None)
+
+    def latest():
+        for src, dst in pairs:
+            sim.get_rate(day_rates, src, dst, fx_date)
+
+    def as_of():
+        for t, (src, dst) in zip(times, pairs):
+            label, rates = store.day_rates(t)
+            sim.get_rate(rates, src, dst, label)
+
+    out = []
+    for _ in range(repeat):
+        t_load, _ = _clock(lambda: RateFeed(sim.FX_RATES_PATH, sim.RATE_TICKS_PATH).store())
+        t_latest, _ = _clock(latest)
+        t_as_of, _ = _clock(as_of)
+        out += [("store_load_ms", t_load * 1e3, False),
+                ("latest_us", t_latest / LOOKUPS * 1e6, False),
+                ("as_of_us", t_as_of / LOOKUPS * 1e6, False)]
+    return out
+
+
+def case_compliance(size: int, seed: int, repeat: int) -> list:
+    # velocity windows are measured back from now, so the log has to end now
+    log = synth.tx_records(size, seed, end=datetime.utcnow())
+    synth.write_records(Path("fx_data/transactions_log.jsonl"), log)
+    import fx_conversion_sim as sim
+
+    rng = random.Random(seed)
+    checks = [(round(rng.lognormvariate(5.0, 1.5), 2), *rng.sample(synth.CURRENCIES, 2))
+              for _ in range(LOOKUPS)]
+    out = []
+    for _ in range(repeat):
+        t_load, index = _clock(sim.load_velocity_index)
+
+        def screen():
+            for amount, src, dst in checks:
+                sim.compliance_check(amount, src, dst, velocity=index)
+        t_check, _ = _clock(screen)
+        out += [("velocity_rebuild_ms", t_load * 1e3, False),
+                ("log_records_per_s", size / t_load, True),
+                ("check_us", t_check / LOOKUPS * 1e6, False)]
+    return out
+
+
+def case_trend(size: int, seed: int, repeat: int) -> list:
+    per_day = -(-size // 10_000)            # keep the date range inside the calendar
+    history = synth.fxrates_history(-(-size // per_day), per_day=per_day, seed=seed)
+    synth.write_json(Path("fx_data/fxrates.json"), dict(list(history.items())[:size]))
+    del history
+    from fx_trend_engine import analyze, load_rate_history
+
+    out = []
+    for _ in range(repeat):
+        t_load, hist = _clock(load_rate_history, "fx_data/fxrates.json")
+        t_analyze, _ = _clock(analyze, hist, 7, 1.0)
+        out += [("load_ms", t_load * 1e3, False), ("analyze_ms", t_analyze * 1e3, False)]
+    return out
+
+
+def case_carbon(size: int, seed: int, repeat: int) -> list:
+    txs = list(synth.tx_records(size, seed))
+    from carbon_engine import get_engine
+
+    factors = get_engine(Path("fx_data/carbon_factors.json")).factors()
+    factors.transactions_kg(txs[:10])       # warm-up (numpy import)
+    out = []
+    for _ in range(repeat):
+        secs, _ = _clock(factors.transactions_kg, txs)
+        out.append(("tx_per_s", size / secs, True))
+    return out
+
+
+CASES = {
+    "simulate": (case_simulate, True),    # (fn, mutates state → one process per repeat)
+    "get_rate": (case_get_rate, False),
+    "compliance": (case_compliance, False),
+    "trend": (case_trend, False),
+    "carbon": (case_carbon, False),
+}
+
+
+def run_case_here(name: str, size: int, seed: int, repeat: int):
+    """Child side: run one case in the current (scratch) directory; print its metrics as JSON."""
+    random.seed(seed)
+    samples = CASES[name][0](size, seed, repeat)
+    print(json.dumps([{"metric": m, "value": v, "higher_is_better": h} for m, v, h in samples]))
+
+
+# ---------- Runner ----------
+def run_case(name: str, size: int, seed: int, repeat: int) -> list:
+    """Run a case in fresh scratch directories; best value per metric across repeats."""
+    env = dict(os.environ, PYTHONHASHSEED="0", AIVA_METRICS="0")
+    env.pop("AIVA_METRICS_OUT", None)
+    mutates = CASES[name][1]
+    samples = []
+    for _ in range(repeat if mutates else 1):
+        with tempfile.TemporaryDirectory(prefix=f"aiva-bench-{name}-") as tmp:
+            for rel in SHARED_DATA:
+                (Path(tmp) / rel).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy(ROOT / rel, Path(tmp) / rel)
+            proc = subprocess.run(
+                [sys.executable, str(Path(__file__).resolve()), "_case", name, str(size),
+                 str(seed), str(1 if mutates else repeat)],
+                cwd=tmp, env=env, capture_output=True, text=True,
+            )
+        if proc.returncode != 0:
+            raise RuntimeError(f"{name}[{size}] failed:\n{proc.stderr.strip()}")
+        samples += json.loads(proc.stdout.strip().splitlines()[-1])
+
+    best: dict = {}
+    for s in samples:
+        cur = best.get(s["metric"])
+        if cur is None or (s["value"] > cur["value"]) == s["higher_is_better"]:
+            best[s["metric"]] = s
+    return [{"bench": name, "size": size, **s} for s in best.values()]
+
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict:
+    import numpy as np
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "git_rev": _git_rev(),
+    }
+
+
+# ---------- Baseline comparison ----------
+def _key(r: dict) -> tuple:
+    return r["bench"], r["size"], r["metric"]
+
+def compare(results: list, baseline: list, tolerance: float) -> tuple[list, list]:
+    """(rows, regressions): rows are (result, baseline value, relative change, regressed)."""
+    base = {_key(r): r["value"] for r in baseline}
+    rows, regressions = [], []
+    for r in results:
+        old = base.get(_key(r))
+        if not old:
+            rows.append((r, None, None, False))
+            continue
+        change = (r["value"] - old) / old
+        worse = -change if r["higher_is_better"] else change
+        regressed = worse > tolerance
+        rows.append((r, old, change, regressed))
+        if regressed:
+            regressions.append(r)
+    return rows, regressions
+
+
+def _fmt(v: float) -> str:
+    return f"{v:,.1f}" if abs(v) >= 100 else f"{v:,.3f}"
+
+def print_rows(rows: list):
+    print(f"{'bench':11s} {'size':>11s} {'metric':22s} {'value':>14s} {'baseline':>14s} {'change':>8s}")
+    for r, old, change, regressed in rows:
+        line = f"{r['bench']:11s} {r['size']:>11,} {r['metric']:22s} {_fmt(r['value']):>14s}"
+        if old is not None:
+            line += f" {_fmt(old):>14s} {change:+8.1%}" + ("  REGRESSION" if regressed else "")
+        print(line)
+
+
+# ---------- CLI ----------
+def _int_list(text: str) -> list:
+    return [int(float(x)) for x in text.split(",") if x]
+
+def main():
+    if len(sys.argv) == 6 and sys.argv[1] == "_case":
+        _, _, name, size, seed, repeat = sys.argv
+        run_case_here(name, int(size), int(seed), int(repeat))
+        return
+
+    ap = argparse.ArgumentParser(description="Conversion pipeline benchmarks on synthetic data")
+    ap.add_argument("--scale", choices=sorted(SCALES), default="small")
+    ap.add_argument("--only", default="", help="comma-separated cases (default: all)")
+    ap.add_argument("--sizes", type=_int_list, default=None, help="override sizes for every case, e.g. 1e3,1e5")
+    ap.add_argument("--repeat", type=int, default=3, help="best of N (default 3)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", type=Path, default=LATEST_PATH)
+    ap.add_argument("--baseline", type=Path, default=None,
+                    help=f"compare against this results file (default: {BASELINE_PATH.relative_to(ROOT)} if present)")
+    ap.add_argument("--save-baseline", action="store_true", help="also store this run as the baseline")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="allowed slowdown before failing (default 0.15)")
+    args = ap.parse_args()
+
+    names = [n for n in args.only.split(",") if n] or list(CASES)
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        ap.error(f"unknown case(s) {unknown}. Use any of {list(CASES)}.")
+
+    results = []
+    print(f"[Bench] scale={args.scale} seed={args.seed} repeat={args.repeat}")
+    for name in names:
+        for size in args.sizes or SCALES[args.scale][name]:
+            t0 = time.perf_counter()
+            rows = run_case(name, size, args.seed, max(1, args.repeat))
+            results += rows
+            print(f"  {name:11s} {size:>11,}  " + "  ".join(f"{r['metric']}={_fmt(r['value'])}" for r in rows)
+                  + f"  ({time.perf_counter() - t0:.1f}s)")
+
+    doc = {
+        "meta": {**environment(), "timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+                 "scale": args.scale, "seed": args.seed, "repeat": args.repeat},
+        "results": results,
+    }
+    synth.write_json(args.out, doc)
+    print(f"\nResults → {args.out}")
+
+    baseline_path = args.baseline or (BASELINE_PATH if BASELINE_PATH.exists() else None)
+    regressions = []
+    if baseline_path and not (args.save_baseline and args.baseline is None):
+        with open(baseline_path, "r") as f:
+            base = json.load(f)
+        meta = base.get("meta", {})
+        if (meta.get("machine"), meta.get("cpus"), meta.get("python")) != \
+                (doc["meta"]["machine"], doc["meta"]["cpus"], doc["meta"]["python"]):
+            print(f"Note: baseline was recorded on a different machine/python ({meta.get('platform')}, "
+                  f"python {meta.get('python')})")
+        rows, regressions = compare(results, base.get("results", []), args.tolerance)
+        print(f"\n[Compared with {baseline_path} @ {meta.get('git_rev')}, tolerance {args.tolerance:.0%}]")
+        print_rows(rows)
+    if args.save_baseline:
+        synth.write_json(args.baseline or BASELINE_PATH, doc)
+        print(f"Baseline → {args.baseline or BASELINE_PATH}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
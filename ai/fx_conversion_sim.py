@@ -1,25 +1,55 @@
 #!/usr/bin/env python3
 """
 FX Conversion Simulator (Sprint 3 – Compliance & Risk)
-- Loads latest FX rates (fx_data/fxrates.json)
-- Derives inverses and crosses via AUD when needed
-- Updates/saves balances (fx_data/balances.json)
+- Loads FX rates (fx_data/fxrates.json + intraday ticks, ai/rate_store.py): latest, or as of a time
+- Derives inverses and crosses (via AUD or any pivot) from a per-date rate matrix
+- Updates/saves balances (fx_data/balances.json, or a wallet in fx_data/wallets.sqlite3)
 - Estimates CO2 (fx_data/carbon_factors.json)
-- Runs compliance checks (thresholds, velocity, sanctions mock)
+- Runs compliance checks (thresholds, velocity, sanctions mock) from fx_data/compliance_rules.json
 - Appends a transaction record (fx_data/transactions_log.json)
 - Writes audit events (fx_data/audit_log.json)
+  (logs go through ai/log_store.py: JSON array or append-only JSONL)
+- Balances + tx + audit effects are committed as one record to a group-commit
+  log (fx_data/commit_log.jsonl, ai/group_commit.py) before they are applied,
+  so a crash in between is replayed on the next run (AIVA_DURABILITY sets fsync/write/none)
+- Optional per-stage timings + counters (ai/metrics.py): AIVA_METRICS=1 or --metrics
 
 Usage:
   python3 ai/fx_conversion_sim.py <SRC> <DST> <AMOUNT>
   e.g. python3 ai/fx_conversion_sim.py USD AUD 200
+  python3 ai/fx_conversion_sim.py USD AUD 200 --wallet w_123   (fx_data/wallets.sqlite3)
+  python3 ai/fx_conversion_sim.py USD AUD 200 --as-of 2025-08-03T12:00   (price at a past time)
+
+Batch mode (state loaded once, flushed at the end or every N orders):
+  python3 ai/fx_conversion_sim.py --batch orders.jsonl [--flush-every N] [--as-of T]
+  each line: {"src": "USD", "dst": "AUD", "amount": 200} (+ optional "wallet_id")
+
+Instrumentation (either mode):
+  --metrics out.json | out.prom   per-stage latency histograms + counters, printed and exported
+  --profile out.prof              cProfile the run (top functions printed)
 """
 
 import json
+import math
+import os
 import sys
 import uuid
 from collections import OrderedDict
+from itertools import islice
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime
+
+from carbon_engine import DEFAULT_PAIR_FACTOR, CarbonFactors, get_engine as get_carbon_engine
+from compliance_engine import CompiledRules, RuleBook
+from ledger import get_ledger
+import metrics
+from group_commit import get_commit_log
+from log_store import atomic_write_json, get_log, iter_jsonl
+from money import convert_minor, from_minor, quantize, to_minor
+from rate_engine import matrix_for
+from rate_store import RATE_TICKS_PATH, get_feed as get_rate_feed, parse_as_of
+from velocity_index import VelocityIndex, to_epoch
+from wallet_store import WALLETS_DB_PATH, WalletStore
 
 # ---------- Paths ----------
 FX_RATES_PATH         = Path("fx_data/fxrates.json")
@@ -27,15 +57,30 @@ BALANCES_PATH         = Path("fx_data/balances.json")
 CARBON_FACTORS_PATH   = Path("fx_data/carbon_factors.json")
 TX_LOG_PATH           = Path("fx_data/transactions_log.json")
 AUDIT_LOG_PATH        = Path("fx_data/audit_log.json")
+VELOCITY_INDEX_PATH   = Path("fx_data/velocity_index.json")
+COMPLIANCE_RULES_PATH = Path("fx_data/compliance_rules.json")
+COMMIT_LOG_PATH       = Path("fx_data/commit_log.jsonl")
 
 SUPPORTED = {"USD", "EUR", "AUD"}
 
-# ---------- Compliance Config (simple, JSON-free for now) ----------
+# Journal settled conversions in the double-entry ledger (ai/ledger.py); AIVA_LEDGER=0 turns it off
+LEDGER_ENABLED = os.environ.get("AIVA_LEDGER", "1") != "0"
+# Also append every flushed tx/audit record to fixed-width .bin files (ai/binlog.py)
+BINLOG_MIRROR = os.environ.get("AIVA_BINLOG") == "1"
+
+# ---------- Compliance Config (defaults; fx_data/compliance_rules.json "conversion" overrides) ----------
 COMPLIANCE_CONFIG = {
     "amount_thresholds": {"review": 10_000.0, "blocked": 50_000.0},
     "velocity": {"window_seconds": 60, "min_count": 3, "scope": "by_src"},
+    # more rules over any|by_src|by_pair|by_wallet windows, e.g.
+    # {"name": "src_sum_24h", "scope": "by_src", "window_seconds": 86400, "sum_above": 9500}
+    # min_count works on every scope; sum_above only on by_src/by_pair (the sums are in the
+    # source currency), so a per-wallet or "any" rule can only count
+    "velocity_rules": [],
     "sanctions": {"blocked_pairs": []}  # e.g. ["USD_RUS", "ANY_IRR"]
 }
+RULES = RuleBook(COMPLIANCE_RULES_PATH, conversion_defaults=COMPLIANCE_CONFIG)
+RATES = get_rate_feed(FX_RATES_PATH, RATE_TICKS_PATH)
 
 # ---------- Small JSON helpers ----------
 def load_json_ordered(path: Path):
@@ -43,10 +88,12 @@ def load_json_ordered(path: Path):
     with open(path, "r") as f:
         return json.load(f, object_pairs_hook=OrderedDict)
 
+@metrics.timed("load_json")
 def load_json(path: Path, default):
     """Load JSON (or return default if file missing/empty/invalid)."""
     if not path.exists():
         return default
+    metrics.count_file("bytes_read", path)
     try:
         with open(path, "r") as f:
             return json.load(f)
@@ -54,21 +101,16 @@ def load_json(path: Path, default):
         return default
 
 def save_json(path: Path, data):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w") as f:
-        json.dump(data, f, indent=2)
+    """Atomic replace (temp file + fsync + rename): never a half-written file."""
+    atomic_write_json(path, data)
 
 def append_tx_log(entry: dict):
-    """Append one transaction dict to fx_data/transactions_log.json safely."""
-    log = load_json(TX_LOG_PATH, default=[])
-    log.append(entry)
-    save_json(TX_LOG_PATH, log)
+    """Append one transaction dict to the transactions log (JSON array or JSONL backend)."""
+    get_log(TX_LOG_PATH).append(entry)
 
 def append_audit(event: dict):
-    """Append a structured audit event to fx_data/audit_log.json."""
-    audit = load_json(AUDIT_LOG_PATH, default=[])
-    audit.append(event)
-    save_json(AUDIT_LOG_PATH, audit)
+    """Append a structured audit event to the audit log (JSON array or JSONL backend)."""
+    get_log(AUDIT_LOG_PATH).append(event)
 
 # ---------- Audit schema helpers (NEW) ----------
 AUDIT_SCHEMA_VERSION = "1.0"
@@ -90,7 +132,7 @@ def _actor_info() -> dict:
     """
     return {"user_id": "local_dev", "session_id": "cli"}
 
-def write_audit(
+def build_audit_event(
     *,
     event: str,            # "conversion_attempt" | "conversion_settled"
     tx_id: str,
@@ -102,8 +144,10 @@ def write_audit(
     status: str,
     reason: str,
     rules: list[str],
-) -> None:
-    event_doc = {
+    fx_time_used: str | None = None,   # intraday rate set: the newest tick's timestamp
+) -> dict:
+    src_ccy, _, dst_ccy = pair.partition("_")
+    event = {
         "event_id": uuid.uuid4().hex,
         "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
         "schema": {"name": "aiva.audit", "version": AUDIT_SCHEMA_VERSION},
@@ -112,8 +156,8 @@ def write_audit(
         "pair": pair,
         "fx_date_used": fx_date_used,
         "rate": round(rate, 6) if isinstance(rate, (float, int)) else None,
-        "amount_src": round(amount_src, 2),
-        "amount_dst": round(amount_dst, 2) if isinstance(amount_dst, (float, int)) else None,
+        "amount_src": quantize(amount_src, src_ccy),
+        "amount_dst": quantize(amount_dst, dst_ccy) if isinstance(amount_dst, (float, int)) else None,
         "compliance": {
             "status": status,
             "reason": reason,
@@ -122,7 +166,13 @@ def write_audit(
         },
         "actor": _actor_info(),
     }
-    append_audit(event_doc)
+    if fx_time_used is not None:
+        event["fx_time_used"] = fx_time_used
+    return event
+
+def write_audit(**fields) -> None:
+    """Build a standardized audit event (see build_audit_event) and append it."""
+    append_audit(build_audit_event(**fields))
 
 # ---------- FX rate helpers ----------
 def latest_day_rates(fx):
@@ -136,49 +186,20 @@ def latest_day_rates(fx):
     latest_date = max(fx.keys())
     return latest_date, fx[latest_date]
 
-def _inv(x: float) -> float:
-    return 1.0 / float(x)
-
-def get_rate(day_rates: dict, src: str, dst: str) -> float:
+@metrics.timed("get_rate")
+def get_rate(day_rates: dict, src: str, dst: str, fx_date: str | None = None) -> float:
     """
-    Expect base pairs quoted vs AUD:
-      - USD_AUD
-      - EUR_AUD
-    Derive:
+    Any quoted pair works (today: USD_AUD, EUR_AUD). Derived via ai/rate_engine.py:
       - inverses: AUD_USD, AUD_EUR
-      - crosses via AUD: USD_EUR, EUR_USD
-    Also return direct pairs if present.
+      - crosses via the shortest pivot path: USD_EUR, EUR_USD (via AUD)
+    Direct quotes always win. The cross-rate matrix is built once per fx_date.
     """
     if src == dst:
         return 1.0
 
-    # 1) direct
-    direct_key = f"{src}_{dst}"
-    if direct_key in day_rates:
-        return float(day_rates[direct_key])
-
-    # 2) build derived table from *_AUD
-    usd_aud = day_rates.get("USD_AUD")
-    eur_aud = day_rates.get("EUR_AUD")
-
-    derived = {}
-    if usd_aud is not None:
-        usd_aud = float(usd_aud)
-        derived["USD_AUD"] = usd_aud
-        derived["AUD_USD"] = _inv(usd_aud)
-
-    if eur_aud is not None:
-        eur_aud = float(eur_aud)
-        derived["EUR_AUD"] = eur_aud
-        derived["AUD_EUR"] = _inv(eur_aud)
-
-    # crosses if both known
-    if ("USD_AUD" in derived) and ("EUR_AUD" in derived):
-        derived["USD_EUR"] = derived["USD_AUD"] / derived["EUR_AUD"]
-        derived["EUR_USD"] = _inv(derived["USD_EUR"])
-
-    if direct_key in derived:
-        return derived[direct_key]
+    rate = matrix_for(day_rates, fx_date).rate(src, dst)
+    if rate is not None:
+        return rate
 
     raise ValueError(
         f"No rate available for {src}->{dst}. "
@@ -186,20 +207,27 @@ def get_rate(day_rates: dict, src: str, dst: str) -> float:
     )
 
 # ---------- Carbon ----------
-def load_carbon_factor(pair_key: str) -> float:
+CARBON = get_carbon_engine(CARBON_FACTORS_PATH)
+
+def load_carbon_factor(pair_key: str, factors: CarbonFactors | dict | None = None) -> float:
     """
-    Reads fx_data/carbon_factors.json expecting keys like "USD_AUD": 0.42
-    Returns a default if missing.
+    Factor for a pair from fx_data/carbon_factors.json (keys like "USD_AUD": 0.42),
+    via the shared carbon engine (parsed once, reloaded when the file changes),
+    or from already-loaded `factors`. Returns a default if missing.
     """
-    factors = load_json(CARBON_FACTORS_PATH, default={})
-    return float(factors.get(pair_key, 0.5))  # fallback default
-
-def estimate_carbon_kg(amount_src: float, pair_key: str) -> float:
+    if factors is None:
+        factors = CARBON.factors()
+    if isinstance(factors, CarbonFactors):
+        return factors.pair_factor(pair_key)
+    return float(factors.get(pair_key, DEFAULT_PAIR_FACTOR))  # fallback default
+
+@metrics.timed("estimate_carbon_kg")
+def estimate_carbon_kg(amount_src: float, pair_key: str, factors: CarbonFactors | dict | None = None) -> float:
     """
     Very simple model: linear factor per 1000 units converted.
     E.g., factor=0.42 means 0.42 kg CO2 per 1000 source currency units.
     """
-    factor = load_carbon_factor(pair_key)
+    factor = load_carbon_factor(pair_key, factors)
     return (amount_src / 1000.0) * factor
 
 def carbon_badge(kg: float) -> str:
@@ -213,102 +241,87 @@ def carbon_badge(kg: float) -> str:
 def _now_utc() -> datetime:
     return datetime.utcnow()
 
-def _parse_iso(ts: str) -> datetime:
-    if ts.endswith("Z"):
-        ts = ts[:-1]
-    return datetime.fromisoformat(ts)
+@metrics.timed("velocity_load")
+def load_velocity_index() -> VelocityIndex:
+    """Velocity index for every configured (scope, window) (sidecar if fresh, else rebuilt from the tx log)."""
+    return VelocityIndex.load_or_rebuild(
+        VELOCITY_INDEX_PATH, get_log(TX_LOG_PATH).path, RULES.get().velocity_windows
+    )
+
+def save_velocity_index(index: VelocityIndex):
+    index.save(VELOCITY_INDEX_PATH, get_log(TX_LOG_PATH).path)
 
-def recent_tx_count(window_seconds: int, scope: str, src: str, dst: str) -> int:
+def velocity_for(state: dict) -> VelocityIndex:
     """
-    Count transactions in the recent window to detect velocity/structuring.
+    The state's velocity index; rebuilt (log + queued tx) if the rule file
+    now configures windows it does not maintain.
+    """
+    index = state["velocity"]
+    windows = RULES.get().velocity_windows
+    if not index.covers(windows):
+        index = state["velocity"] = load_velocity_index()
+        for tx in state["pending_tx"]:
+            index.record_tx(tx)
+    return index
+
+@metrics.timed("recent_tx_stats")
+def recent_tx_stats(window_seconds: int, scope: str, src: str, dst: str,
+                    index: VelocityIndex | None = None, wallet_id: str | None = None) -> tuple[int, float]:
+    """
+    (count, amount_src sum) of transactions in the recent window, to detect velocity/structuring.
     scope:
-      - "any": count all tx
+      - "any": all tx
       - "by_src": only same source currency
       - "by_pair": only same src->dst pair
+      - "by_wallet": only the same wallet (0 without a wallet)
+    Answered from the velocity index (ai/velocity_index.py) – exact at any volume.
     """
-    log = load_json(TX_LOG_PATH, default=[])
-    if not log:
-        return 0
+    if index is None or not index.covers({scope: [window_seconds]}):
+        index = VelocityIndex.load_or_rebuild(VELOCITY_INDEX_PATH, get_log(TX_LOG_PATH).path,
+                                              {scope: [window_seconds]})
+    return index.stats(scope, src, dst, window_seconds, to_epoch(_now_utc()), wallet_id)
 
-    cutoff = _now_utc() - timedelta(seconds=window_seconds)
-    n = 0
-    for t in reversed(log[-200:]):  # look at last 200 to keep it quick
-        ts = t.get("timestamp")
-        try:
-            t_dt = _parse_iso(ts) if isinstance(ts, str) else None
-        except Exception:
-            t_dt = None
-
-        if not t_dt or t_dt < cutoff:
-            continue
-
-        if scope == "any":
-            n += 1
-        elif scope == "by_src":
-            if t.get("pair", "").startswith(f"{src}_"):
-                n += 1
-        elif scope == "by_pair":
-            if t.get("pair") == f"{src}_{dst}":
-                n += 1
-    return n
+def recent_tx_count(window_seconds: int, scope: str, src: str, dst: str,
+                    index: VelocityIndex | None = None, wallet_id: str | None = None) -> int:
+    return recent_tx_stats(window_seconds, scope, src, dst, index, wallet_id)[0]
 
 def sanctions_hit(src: str, dst: str) -> bool:
-    """Very simple pair blacklist check."""
-    pair = f"{src}_{dst}"
-    blocked = set(COMPLIANCE_CONFIG["sanctions"]["blocked_pairs"])
-    return pair in blocked or f"ANY_{dst}" in blocked or f"{src}_ANY" in blocked
+    """Pair blacklist check against the compiled rule sets (pair, ANY_<dst>, <src>_ANY)."""
+    return RULES.get().sanctions_hit(src, dst)
 
-def compliance_check(amount_src: float, src: str, dst: str) -> dict:
+@metrics.timed("compliance_check")
+def compliance_check(amount_src: float, src: str, dst: str, velocity: VelocityIndex | None = None,
+                     wallet_id: str | None = None, stage: str | None = None) -> dict:
     """
     Returns a full compliance object:
     {
       "status": "clear" | "review" | "blocked",
       "reason": "...",
-      "rules_triggered": ["threshold_review", "velocity", ...]
+      "rules_triggered": ["threshold_review", "velocity", "velocity:src_sum_24h", ...]
     }
-    Rule order: sanctions > amount thresholds > velocity
-    """
-    rules = []
-    status = "clear"
-    reason = "within limits"
-
-    # 1) Sanctions (highest severity)
-    if sanctions_hit(src, dst):
-        status = "blocked"
-        reason = "sanctions pair blacklist"
-        rules.append("sanctions_block")
-        return {"status": status, "reason": reason, "rules_triggered": rules}
-
-    # 2) Amount thresholds
-    amt_cfg = COMPLIANCE_CONFIG["amount_thresholds"]
-    if amount_src > amt_cfg["blocked"]:
-        status = "blocked"
-        reason = f"amount>{int(amt_cfg['blocked']):,}"
-        rules.append("threshold_blocked")
-        return {"status": status, "reason": reason, "rules_triggered": rules}
-    if amount_src > amt_cfg["review"]:
-        status = "review"
-        reason = f"amount>{int(amt_cfg['review']):,}"
-        rules.append("threshold_review")
-
-    # 3) Velocity (structuring)
-    vel_cfg = COMPLIANCE_CONFIG["velocity"]
-    count = recent_tx_count(
-        window_seconds=vel_cfg["window_seconds"],
-        scope=vel_cfg["scope"],
-        src=src,
-        dst=dst
-    )
-    if count >= vel_cfg["min_count"]:
-        if status == "review":
-            status = "blocked"
-            reason = f"{reason} + velocity >= {vel_cfg['min_count']} in {vel_cfg['window_seconds']}s"
-        else:
-            status = "review"
-            reason = f"velocity >= {vel_cfg['min_count']} in {vel_cfg['window_seconds']}s"
-        rules.append("velocity")
+    Rule order: sanctions > amount thresholds > velocity rules
+    Rules: "conversion" section of fx_data/compliance_rules.json over COMPLIANCE_CONFIG,
+    compiled once and hot-reloaded on change (ai/compliance_engine.py).
+    stage: the order's sanctions/threshold outcome, if a batch prescreen computed it.
+    """
+    rules = RULES.get()
+    if velocity is None:
+        velocity = load_velocity_index()
+    if not velocity.covers(rules.velocity_windows):
+        return rules.screen_conversion(
+            amount_src, src, dst,
+            lambda window_seconds, scope: recent_tx_stats(window_seconds, scope, src, dst, velocity, wallet_id),
+            stage,
+        )
+    snapshot = None
 
-    return {"status": status, "reason": reason, "rules_triggered": rules}
+    def velocity_stats(window_seconds: int, scope: str) -> tuple[int, float]:
+        nonlocal snapshot
+        if snapshot is None:     # every (scope, window) at once, on the first rule that asks
+            snapshot = velocity.window_stats(src, dst, to_epoch(_now_utc()), wallet_id)
+        return snapshot[scope, window_seconds]
+
+    return rules.screen_conversion(amount_src, src, dst, velocity_stats, stage)
 
 # ---------- Formatting ----------
 def fmt_money(x: float) -> str:
@@ -317,128 +330,377 @@ def fmt_money(x: float) -> str:
 def fmt_kg(x: float) -> str:
     return f"{x:.2f} kg CO₂"
 
-# ---------- Core simulation ----------
-def simulate(src: str, dst: str, amount: float):
-    # Load FX + latest date
-    fx_all = load_json_ordered(FX_RATES_PATH)
-    latest_date, day_rates = latest_day_rates(fx_all)
+# ---------- State (loaded once, flushed once) ----------
+DEFAULT_BALANCES = {"USD": 1000.0, "EUR": 1000.0, "AUD": 1000.0}
 
-    # Load balances
-    balances = load_json(BALANCES_PATH, default={"USD": 1000.0, "EUR": 1000.0, "AUD": 1000.0})
+@metrics.timed("load_state")
+def load_state(as_of=None) -> dict:
+    """
+    Load everything a conversion needs into memory:
+    FX rates (latest, or as of `as_of`: ISO time / epoch seconds), balances,
+    carbon factors and the velocity index.
+    New tx/audit records are queued and written by flush_state().
+    """
+    recover_commits()
+    if isinstance(as_of, str):
+        as_of = parse_as_of(as_of)
+    with metrics.stage("load_rates"):
+        fx_date, day_rates = RATES.store().day_rates(as_of)
+    return {
+        "fx_date": fx_date,
+        "day_rates": day_rates,
+        "as_of": as_of,
+        "rates_version": RATES.version,
+        "balances": load_json(BALANCES_PATH, default=dict(DEFAULT_BALANCES)),
+        "carbon_factors": CARBON.factors(),
+        "velocity": load_velocity_index(),
+        "wallets": None,             # WalletStore, opened on first wallet_id use
+        "pending_tx": [],
+        "pending_audit": [],
+        "balances_dirty": False,
+    }
 
-    # Basic checks
+def refresh_rates(state: dict) -> bool:
+    """
+    Re-read the latest rates into a long-lived state if fxrates.json or the
+    tick log changed since they were loaded (states priced as of a fixed time
+    keep theirs). Returns True if the rates were replaced.
+    """
+    if state.get("as_of") is not None:
+        return False
+    store = RATES.store()
+    if RATES.version == state.get("rates_version"):
+        return False
+    state["fx_date"], state["day_rates"] = store.day_rates(None)
+    state["rates_version"] = RATES.version
+    return True
+
+@metrics.timed("flush_state")
+def flush_state(state: dict):
+    """
+    Persist queued effects as one atomic unit: balances snapshot(s), tx entries
+    and audit events are committed as a single commit-log record, then applied
+    (balances, tx log + ledger journal, audit log – same order as a single run),
+    then the commit log is checkpointed. Finally the velocity sidecar, stamped
+    with the new log size.
+    """
+    take_wallet_snapshots(state)
+    record = commit_record(state)
+    if record is not None:
+        log = get_commit_log(COMMIT_LOG_PATH)
+        with metrics.stage("flush.commit_log"):
+            log.commit(record)
+        apply_effects(state)
+        with metrics.stage("flush.checkpoint"):
+            checkpoint_logs()
+            log.checkpoint()
+    if state.pop("velocity_dirty", False):
+        with metrics.stage("flush.velocity_index"):
+            save_velocity_index(state["velocity"])
+
+def apply_effects(state: dict):
+    """Write queued effects to balances.json / the wallet store and the logs."""
+    if state["balances_dirty"]:
+        with metrics.stage("flush.balances"):
+            save_json(BALANCES_PATH, state["balances"])
+        metrics.count_file("bytes_written", BALANCES_PATH)
+        state["balances_dirty"] = False
+    snapshots = state.pop("wallet_snapshots", None)
+    if snapshots:
+        with metrics.stage("flush.wallets"):
+            (state.get("wallet_store") or state["wallets"]).write_snapshots(snapshots)
+    txs, events = state["pending_tx"], state["pending_audit"]
+    if txs:
+        _append_log(TX_LOG_PATH, txs, "flush.tx_log")
+        if LEDGER_ENABLED:
+            with metrics.stage("flush.ledger"):
+                get_ledger().record_transactions(txs)
+        state["pending_tx"] = []
+    if events:
+        _append_log(AUDIT_LOG_PATH, events, "flush.audit_log")
+        state["pending_audit"] = []
+    if BINLOG_MIRROR and (txs or events):
+        mirror_binlog(txs, events)
+
+def mirror_binlog(txs: list | None = None, events: list | None = None):
+    """
+    Bring the .bin mirrors (ai/binlog.py) up to the logs, after the records
+    reached them. Each mirror's high-water mark is its last record id, so one
+    that missed flushes (an error, a run without AIVA_BINLOG=1, a replay) is
+    caught up from the log next time. The mirror is derived data: an error is
+    reported and retried on the next flush instead of failing this one.
+    """
+    from binlog import sync_mirror  # NumPy is only needed when the mirror is on
+    try:
+        with metrics.stage("flush.binlog"):
+            sync_mirror(TX_LOG_PATH, txs)
+            sync_mirror(AUDIT_LOG_PATH, events)
+    except (OSError, ValueError, OverflowError) as e:
+        print(f"[binlog] mirror is behind the logs (retried on the next flush): {e}", file=sys.stderr)
+
+def _append_log(path: Path, records: list, stage: str):
+    log = get_log(path)
+    if not metrics.ENABLED:
+        log.append_many(records)
+        return
+    before = log.path.stat().st_size if log.path.exists() else 0
+    with metrics.stage(stage):
+        log.append_many(records)
+    after = log.path.stat().st_size
+    # a JSON array log is rewritten whole; a JSONL log only grows by the new lines
+    metrics.count("bytes_written", after - before if log.backend == "jsonl" else after)
+    metrics.count(f"records_written.{path.stem}", len(records))
+
+def checkpoint_logs():
+    """fsync the applied log writes so the commit records covering them can be dropped."""
+    get_log(TX_LOG_PATH).flush()
+    get_log(AUDIT_LOG_PATH).flush()
+    if LEDGER_ENABLED:
+        get_ledger().checkpoint()   # also snapshots the ledger once enough entries piled up
+
+# ---------- Commit records ----------
+def take_wallet_snapshots(state: dict):
+    """
+    Move the wallet store's changed wallets into state["wallet_snapshots"]: they
+    go into the commit record and are written to sqlite only by apply_effects(),
+    after the record is durable (the store keeps them cached until then).
+    """
+    if state.get("wallets") is not None:
+        state["wallet_snapshots"] = state.get("wallet_snapshots", []) + state["wallets"].take_dirty()
+
+def commit_record(state: dict) -> dict | None:
+    """
+    One record with every queued effect (None if nothing is queued):
+    {"balances": [[wallet_id | null, {...}], ...], "tx": [...], "audit": [...]}
+    Balances are absolute snapshots, so replaying a record is idempotent.
+    """
+    balances = [[None, dict(state["balances"])]] if state["balances_dirty"] else []
+    balances += [[w, b] for w, b in state.get("wallet_snapshots", [])]
+    if not (balances or state["pending_tx"] or state["pending_audit"]):
+        return None
+    return {"balances": balances, "tx": state["pending_tx"], "audit": state["pending_audit"]}
+
+def _normalize_commit(rec: dict) -> dict:
+    """Accept the older one-conversion service journal lines ({wallet_id, tx, audit, balances})."""
+    if isinstance(rec.get("tx"), dict):
+        return {"balances": [[rec.get("wallet_id"), rec["balances"]]], "tx": [rec["tx"]], "audit": [rec["audit"]]}
+    return rec
+
+def replay_commits(records: list) -> int:
+    """
+    Apply commit records that may not have reached balances/logs. Idempotent:
+    tx_ids / event_ids already at the tail of the logs are skipped, and each
+    wallet's balances are restored from its last snapshot in the records.
+    """
+    records = [_normalize_commit(r) for r in records]
+    latest, txs, events = {}, [], []
+    for rec in records:
+        for wallet_id, balances in rec.get("balances", []):
+            latest[wallet_id] = balances
+        txs.extend(rec.get("tx", []))
+        events.extend(rec.get("audit", []))
+
+    tx_log, audit_log = get_log(TX_LOG_PATH), get_log(AUDIT_LOG_PATH)
+    have_tx = {t.get("tx_id") for t in tx_log.tail(len(txs))}
+    have_ev = {e.get("event_id") for e in audit_log.tail(len(events))}
+    if None in latest:
+        save_json(BALANCES_PATH, latest.pop(None))
+    if latest:
+        store = WalletStore(WALLETS_DB_PATH)
+        for wallet_id, balances in latest.items():
+            store.put(wallet_id, balances)
+        store.close()
+    tx_log.append_many([t for t in txs if t["tx_id"] not in have_tx])
+    audit_log.append_many([e for e in events if e["event_id"] not in have_ev])
+    if LEDGER_ENABLED:
+        get_ledger().record_transactions(txs)  # skips tx_ids already journaled
+    checkpoint_logs()
+    if BINLOG_MIRROR:
+        mirror_binlog()
+    return len(records)
+
+def recover_commits(path: Path = COMMIT_LOG_PATH) -> int:
+    """Replay whatever a crashed run left in the commit log, then clear it."""
+    records = list(iter_jsonl(path))
+    if records:
+        replay_commits(records)
+    if records or (path.exists() and path.stat().st_size):
+        get_commit_log(path).checkpoint()
+    return len(records)
+
+# ---------- Wallets ----------
+def wallet_balances(state: dict, wallet_id: str | None = None) -> dict:
+    """
+    Mutable balances for a wallet: the single fx_data/balances.json wallet when
+    wallet_id is None, else the wallet store (fx_data/wallets.sqlite3).
+    """
+    if wallet_id is None:
+        return state["balances"]
+    if state.get("wallets") is None:
+        state["wallets"] = WalletStore(WALLETS_DB_PATH)
+    try:
+        return state["wallets"].get(wallet_id)
+    except KeyError:
+        raise ValueError(f"Unknown wallet {wallet_id!r}. Create it with ai/wallet_store.py.") from None
+
+def mark_balances_dirty(state: dict, wallet_id: str | None = None):
+    if wallet_id is None:
+        state["balances_dirty"] = True
+    else:
+        state["wallets"].mark_dirty(wallet_id)
+
+def balances_view(balances: dict) -> dict:
+    """USD/EUR/AUD first (as always logged), then any other currencies held."""
+    view = {c: balances.get(c, 0.0) for c in ("USD", "EUR", "AUD")}
+    for c in sorted(balances):
+        view.setdefault(c, balances[c])
+    return view
+
+# ---------- Core simulation ----------
+def validate_order(state: dict, src: str, dst: str, amount: float,
+                   wallet_id: str | None = None) -> tuple[str, str]:
+    """Normalize currencies and check support, amount and balance; raises ValueError."""
+    balances = wallet_balances(state, wallet_id)
     src = src.upper().strip()
     dst = dst.upper().strip()
 
     if src not in SUPPORTED or dst not in SUPPORTED:
         raise ValueError(f"Only {sorted(SUPPORTED)} supported right now.")
+    if not math.isfinite(amount):
+        raise ValueError(f"Amount must be a finite number, got {amount}.")
     if amount <= 0:
         raise ValueError("Amount must be positive.")
-    if balances.get(src, 0.0) < amount:
+    if to_minor(amount, src) <= 0:
+        raise ValueError(f"Amount rounds to zero {src}.")
+    if to_minor(balances.get(src, 0.0), src) < to_minor(amount, src):
         raise ValueError(f"Insufficient {src} balance. Have {balances.get(src,0.0)}, need {amount}.")
+    return src, dst
+
+@metrics.timed("settle")
+def settle(state: dict, src: str, dst: str, amount: float, wallet_id: str | None = None,
+           stage: str | None = None) -> dict:
+    """
+    Price, screen and (unless blocked) apply one conversion against in-memory state.
+    Queues the tx entry + audit event on `state`; raises ValueError for invalid orders.
+    stage: precomputed sanctions/threshold outcome (see prescreen_orders).
+    """
+    # Basic checks
+    metrics.count("orders")
+    src, dst = validate_order(state, src, dst, amount, wallet_id)
 
     # Rate lookup
-    rate = get_rate(day_rates, src, dst)
-    received = round(amount * rate, 2)
+    rate = get_rate(state["day_rates"], src, dst, fx_date=state["fx_date"])
+
+    # Carbon + Compliance (pre-apply so we can also audit)
+    co2_kg = estimate_carbon_kg(amount, f"{src}_{dst}", state["carbon_factors"])
+    comp = compliance_check(amount, src, dst, velocity=velocity_for(state), wallet_id=wallet_id, stage=stage)
+
+    return record_settlement(state, src, dst, amount, rate, co2_kg, comp, wallet_id)
+
+@metrics.timed("record_settlement")
+def record_settlement(state: dict, src: str, dst: str, amount: float,
+                      rate: float, co2_kg: float, comp: dict, wallet_id: str | None = None) -> dict:
+    """
+    Apply a priced + screened conversion: mutate balances unless blocked,
+    queue the tx entry and audit event, and record it in the velocity index.
+    """
+    fx_label = state["fx_date"]
+    latest_date = fx_label[:10]      # fx_date_used is YYYY-MM-DD; an intraday label goes in fx_time_used
+    balances = wallet_balances(state, wallet_id)
+    # Exact integer minor units (ai/money.py); floats only at the JSON edges
+    amount_minor = to_minor(amount, src)
+    received_minor = convert_minor(amount_minor, rate, src, dst)
+    received = from_minor(received_minor, dst)
 
     # Snapshot before
     before = balances.copy()
 
-    # Carbon + Compliance (pre-apply so we can also audit)
     pair_key = f"{src}_{dst}"
-    co2_kg = estimate_carbon_kg(amount, pair_key)
     badge = carbon_badge(co2_kg)
-    comp = compliance_check(amount, src, dst)
+    blocked = comp["status"] == "blocked"
 
-    # If blocked, don't mutate balances – still log attempt + audit
-    if comp["status"] == "blocked":
+    if blocked:
+        # Don't mutate balances – still log attempt + audit
         tx_entry = {
             "tx_id": uuid.uuid4().hex,
             "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
             "fx_date_used": latest_date,
             "pair": pair_key,
             "rate": round(rate, 6),
-            "amount_src": round(amount, 2),
+            "amount_src": from_minor(amount_minor, src),
             "amount_dst": 0.0,
             "balances_before": before,
             "balances_after": before,   # unchanged
             "carbon": {"kg": round(co2_kg, 2), "badge": badge},
             "compliance": comp
         }
-        append_tx_log(tx_entry)
-
-        # NEW standardized audit writer
-        write_audit(
-            event="conversion_attempt",
-            tx_id=tx_entry["tx_id"],
-            pair=pair_key,
-            fx_date_used=latest_date,
-            rate=rate,
-            amount_src=amount,
-            amount_dst=0.0,
-            status=comp["status"],
-            reason=comp["reason"],
-            rules=comp["rules_triggered"],
-        )
-
-        # Output summary
-        print("[FX Conversion Simulation]")
-        print(f"Date used: {latest_date}")
-        print(f"Rate {src}->{dst}: {rate:.6f}")
-        print(f"Amount: {fmt_money(amount)} {src}  →  {fmt_money(0)} {dst} (BLOCKED)\n")
-        print("Impact & Controls:")
-        print(f"  Carbon: {fmt_kg(co2_kg)} ({badge}) | Compliance: BLOCKED ({', '.join(comp['rules_triggered'])})")
-        return
+    else:
+        # Apply conversion (clear or review both settle; review is a soft control here)
+        balances[src] = from_minor(to_minor(balances[src], src) - amount_minor, src)
+        balances[dst] = from_minor(to_minor(balances.get(dst, 0.0), dst) + received_minor, dst)
+        mark_balances_dirty(state, wallet_id)
 
-    # Apply conversion (clear or review both settle; review is a soft control here)
-    balances[src] = round(balances[src] - amount, 2)
-    balances[dst] = round(balances.get(dst, 0.0) + received, 2)
-
-    # Build transaction entry
-    tx_entry = {
-        "tx_id": uuid.uuid4().hex,
-        "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
-        "fx_date_used": latest_date,
-        "pair": pair_key,
-        "rate": round(rate, 6),
-        "amount_src": round(amount, 2),
-        "amount_dst": received,
-        "balances_before": {
-            "USD": before.get("USD", 0.0),
-            "EUR": before.get("EUR", 0.0),
-            "AUD": before.get("AUD", 0.0),
-        },
-        "balances_after": {
-            "USD": balances.get("USD", 0.0),
-            "EUR": balances.get("EUR", 0.0),
-            "AUD": balances.get("AUD", 0.0),
-        },
-        "carbon": {"kg": round(co2_kg, 2), "badge": badge},
-        "compliance": comp
-    }
+        tx_entry = {
+            "tx_id": uuid.uuid4().hex,
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "fx_date_used": latest_date,
+            "pair": pair_key,
+            "rate": round(rate, 6),
+            "amount_src": from_minor(amount_minor, src),
+            "amount_dst": received,
+            "balances_before": balances_view(before),
+            "balances_after": balances_view(balances),
+            "carbon": {"kg": round(co2_kg, 2), "badge": badge},
+            "compliance": comp
+        }
 
-    # Persist changes
-    save_json(BALANCES_PATH, balances)
-    append_tx_log(tx_entry)
+    if fx_label != latest_date:
+        tx_entry["fx_time_used"] = fx_label
+    if wallet_id is not None:
+        tx_entry["wallet_id"] = wallet_id
+    state["pending_tx"].append(tx_entry)
+    state["velocity"].record_tx(tx_entry)
+    state["velocity_dirty"] = True
 
     # NEW standardized audit writer
-    write_audit(
-        event="conversion_settled",
+    state["pending_audit"].append(build_audit_event(
+        event="conversion_attempt" if blocked else "conversion_settled",
         tx_id=tx_entry["tx_id"],
         pair=pair_key,
         fx_date_used=latest_date,
+        fx_time_used=tx_entry.get("fx_time_used"),
         rate=rate,
-        amount_src=amount,
-        amount_dst=received,
+        amount_src=from_minor(amount_minor, src),
+        amount_dst=0.0 if blocked else received,
         status=comp["status"],
         reason=comp["reason"],
         rules=comp["rules_triggered"],
-    )
+    ))
+
+    return {
+        "wallet_id": wallet_id, "src": src, "dst": dst, "amount": from_minor(amount_minor, src), "rate": rate,
+        "received": 0.0 if blocked else received,
+        "fx_date": fx_label, "before": before, "after": balances.copy(),
+        "co2_kg": co2_kg, "badge": badge, "compliance": comp, "tx_entry": tx_entry,
+    }
+
+def print_result(res: dict):
+    src, dst, amount, rate = res["src"], res["dst"], res["amount"], res["rate"]
+    received, before, balances = res["received"], res["before"], res["after"]
+    co2_kg, badge, comp = res["co2_kg"], res["badge"], res["compliance"]
 
-    # ---- Output ----
     print("[FX Conversion Simulation]")
-    print(f"Date used: {latest_date}")
+    if res["wallet_id"] is not None:
+        print(f"Wallet: {res['wallet_id']}")
+    print(f"Date used: {res['fx_date']}")
     print(f"Rate {src}->{dst}: {rate:.6f}")
+
+    if comp["status"] == "blocked":
+        print(f"Amount: {fmt_money(amount)} {src}  →  {fmt_money(0)} {dst} (BLOCKED)\n")
+        print("Impact & Controls:")
+        print(f"  Carbon: {fmt_kg(co2_kg)} ({badge}) | Compliance: BLOCKED ({', '.join(comp['rules_triggered'])})")
+        return
+
     print(f"Amount: {fmt_money(amount)} {src}  →  {fmt_money(received)} {dst}\n")
 
     print("Before:")
@@ -460,21 +722,176 @@ def simulate(src: str, dst: str, amount: float):
     print(f"  {src}->{dst} @ {rate:.4f} | {fmt_money(amount)} {src} → {fmt_money(received)} {dst} "
           f"| CO₂ {fmt_kg(co2_kg)} ({badge}) | {comp['status'].upper()} ({comp['reason']})")
 
+def simulate(src: str, dst: str, amount: float, wallet_id: str | None = None, as_of=None):
+    state = load_state(as_of)
+    res = settle(state, src, dst, amount, wallet_id)
+    flush_state(state)
+    print_result(res)
+    return res
+
+# ---------- Batch mode ----------
+SCREEN_BATCH = 512   # orders prescreened together in simulate_many
+
+def load_orders(path: Path):
+    """Yield orders from a JSONL file: one {"src": "USD", "dst": "AUD", "amount": 200} per line."""
+    with open(path, "r") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{lineno}: invalid JSON ({e.msg})") from None
+
+def prescreen_orders(orders: list, rules: CompiledRules | None = None) -> list:
+    """
+    Sanctions + amount-threshold outcome for a chunk of orders in one
+    prescreen_many() pass (None for orders too malformed to screen; settle rejects them).
+    rules: the compiled rules to screen with (default: the current ones).
+    """
+    parsed = []
+    for order in orders:
+        try:
+            parsed.append((float(order["amount"]), str(order["src"]).upper().strip(),
+                           str(order["dst"]).upper().strip()))
+        except (KeyError, TypeError, ValueError):
+            parsed.append(None)
+    rules = rules or RULES.get()
+    stages = iter(rules.prescreen_many([p for p in parsed if p is not None]))
+    return [None if p is None else next(stages) for p in parsed]
+
+def simulate_many(orders, flush_every: int | None = None, as_of=None) -> dict:
+    """
+    Apply many orders in sequence against state loaded once.
+    Same compliance/carbon/audit semantics as simulate(); invalid orders
+    (bad currency, insufficient balance, ...) are counted and skipped.
+    The stateless compliance rules run per chunk of SCREEN_BATCH orders
+    (re-run for the rest of a chunk if the rule file is reloaded mid-chunk);
+    velocity still sees every earlier order.
+    Balances and logs are flushed every `flush_every` orders, and at the end.
+    """
+    state = load_state(as_of)
+    summary = {"orders": 0, "settled": 0, "blocked": 0, "rejected": 0, "errors": []}
+    orders = iter(orders)
+    try:
+        while chunk := list(islice(orders, SCREEN_BATCH)):
+            rules = RULES.get()
+            stages = prescreen_orders(chunk, rules)
+            for i, order in enumerate(chunk):
+                summary["orders"] += 1
+                if RULES.get() is not rules:      # hot reload: the precomputed stages are stale
+                    rules = RULES.get()
+                    stages[i:] = prescreen_orders(chunk[i:], rules)
+                try:
+                    res = settle(state, str(order["src"]), str(order["dst"]), float(order["amount"]),
+                                 order.get("wallet_id"), stages[i])
+                except (KeyError, TypeError, ValueError, OverflowError) as e:
+                    summary["rejected"] += 1
+                    summary["errors"].append({"order": summary["orders"], "error": str(e)})
+                else:
+                    summary["blocked" if res["compliance"]["status"] == "blocked" else "settled"] += 1
+
+                if flush_every and summary["orders"] % flush_every == 0:
+                    flush_state(state)
+    finally:
+        flush_state(state)
+    summary["balances"] = dict(state["balances"])
+    return summary
+
+def print_batch_summary(summary: dict):
+    print("[FX Conversion Simulation – Batch]")
+    print(f"Orders: {summary['orders']} | Settled: {summary['settled']} | "
+          f"Blocked: {summary['blocked']} | Rejected: {summary['rejected']}")
+    for err in summary["errors"][:10]:
+        print(f"  order #{err['order']}: {err['error']}")
+    if len(summary["errors"]) > 10:
+        print(f"  ... {len(summary['errors']) - 10} more")
+    b = summary["balances"]
+    print(f"Balances: USD {fmt_money(b.get('USD',0))} | "
+          f"EUR {fmt_money(b.get('EUR',0))} | "
+          f"AUD {fmt_money(b.get('AUD',0))}")
+
 # ---------- CLI ----------
+def usage():
+    print("Usage: python3 ai/fx_conversion_sim.py <SRC> <DST> <AMOUNT> [--wallet WALLET_ID] [--as-of T]")
+    print("       python3 ai/fx_conversion_sim.py --batch <orders.jsonl> [--flush-every N] [--as-of T]")
+    print("       (either form: [--metrics out.json|out.prom] [--profile out.prof])")
+    print("Example: python3 ai/fx_conversion_sim.py USD AUD 200")
+    sys.exit(1)
+
+def _pop_option(args: list, flag: str) -> tuple[str | None, list]:
+    """Remove `flag VALUE` from args; returns (VALUE or None, remaining args)."""
+    if flag not in args:
+        return None, args
+    i = args.index(flag)
+    if i + 1 >= len(args):
+        usage()
+    return args[i + 1], args[:i] + args[i + 2:]
+
 def main():
-    if len(sys.argv) != 4:
-        print("Usage: python3 ai/fx_conversion_sim.py <SRC> <DST> <AMOUNT>")
-        print("Example: python3 ai/fx_conversion_sim.py USD AUD 200")
-        sys.exit(1)
+    args = sys.argv[1:]
+    as_of, args = _pop_option(args, "--as-of")
+    metrics_out, args = _pop_option(args, "--metrics")
+    profile_out, args = _pop_option(args, "--profile")
+    if as_of is not None:
+        try:
+            as_of = parse_as_of(as_of)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+    if metrics_out:
+        metrics.enable()
+
+    try:
+        if profile_out:
+            with metrics.profiled(profile_out):
+                run(args, as_of)
+        else:
+            run(args, as_of)
+    finally:
+        if metrics_out:
+            metrics.write(metrics_out)
+            print(f"\n[Metrics] → {metrics_out}\n{metrics.report()}")
+
+def run(args: list, as_of=None):
+    if args and args[0] == "--batch":
+        if len(args) not in (2, 4) or (len(args) == 4 and args[2] != "--flush-every"):
+            usage()
+        try:
+            flush_every = int(args[3]) if len(args) == 4 else None
+        except ValueError:
+            print("--flush-every must be an integer, e.g., 1000")
+            sys.exit(1)
+        try:
+            summary = simulate_many(load_orders(Path(args[1])), flush_every=flush_every, as_of=as_of)
+        except (OSError, ValueError) as e:
+            print(f"Batch failed: {e}")
+            sys.exit(1)
+        print_batch_summary(summary)
+        return
 
-    src, dst, amount_str = sys.argv[1], sys.argv[2], sys.argv[3]
+    wallet_id = None
+    if len(args) == 5 and args[3] == "--wallet":
+        wallet_id = args[4]
+        args = args[:3]
+    if len(args) != 3:
+        usage()
+
+    src, dst, amount_str = args
     try:
         amount = float(amount_str)
     except ValueError:
         print("AMOUNT must be a number, e.g., 200 or 150.50")
         sys.exit(1)
 
-    simulate(src, dst, amount)
+    try:
+        simulate(src, dst, amount, wallet_id, as_of)
+    except ValueError as e:
+        if wallet_id is None and as_of is None:
+            raise
+        print(e)
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
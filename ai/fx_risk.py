@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo FX exposure (VaR / expected shortfall) for wallet balances
+
+- Fit: every non-base currency is priced in the base currency (AUD) on each
+  day of the rate history through the rate engine (direct, inverse or cross
+  quotes all work), then the mean and covariance of the daily log returns are
+  estimated jointly, so USD_AUD and EUR_AUD moves stay correlated
+- Simulate: `paths` correlated horizon returns, drawn once through the
+  Cholesky factor of the horizon covariance (seeded, reproducible)
+- Value: each wallet's base-currency P&L on every path is one matrix product;
+  wallets are processed in chunks so memory stays at about
+  chunk × paths × 8 bytes whatever the number of wallets
+
+VaR at confidence c is the loss not exceeded on c of the paths; expected
+shortfall is the mean loss over the remaining worst (1 − c) of paths.
+Balances in a currency the rate history cannot price in the base currency
+are not in the value or the risk: each result lists them under "unpriced",
+and the CLI warns about them.
+
+Usage:
+  python3 ai/fx_risk.py [run] [--wallet ID | --all-wallets] [--paths 50000] [--horizon 1]
+                        [--confidence 0.95,0.99] [--seed 7] [--chunk 256] [--base AUD]
+                        [--data fx_data/fxrates.json] [--out risk.json]
+  python3 ai/fx_risk.py fit [--data ...]
+"""
+
+import argparse
+import json
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+
+from fx_conversion_sim import BALANCES_PATH, get_rate
+from fx_trend_engine import DATA_PATH, load_rate_history
+from wallet_store import WalletStore
+
+BASE_CCY = "AUD"
+DEFAULT_PATHS = 50_000
+DEFAULT_CONFIDENCE = (0.95, 0.99)
+DEFAULT_CHUNK_CELLS = 4_000_000   # wallets × paths per chunk (~32 MB of float64 P&L)
+
+
+# ---------- Fit ----------
+@dataclass
+class ReturnModel:
+    base: str
+    currencies: list       # non-base currencies, column order
+    spot: np.ndarray       # latest price of 1 unit in base, shape (C,)
+    mu: np.ndarray         # mean daily log return, shape (C,)
+    cov: np.ndarray        # daily log-return covariance, shape (C, C)
+    observations: int      # daily returns used in the fit
+
+    def correlation(self) -> np.ndarray:
+        sd = np.sqrt(np.diag(self.cov))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = self.cov / np.outer(sd, sd)
+        return np.where(np.outer(sd, sd) > 0, corr, np.eye(len(sd)))
+
+
+def base_prices(hist, base: str = BASE_CCY) -> tuple[list, np.ndarray]:
+    """(currencies, dates × currencies price of 1 unit in `base`, NaN where unpriced)."""
+    currencies = sorted({c for p in hist.pairs for c in p.split("_", 1)} - {base})
+    prices = np.full((len(hist.dates), len(currencies)), np.nan)
+    for t, d in enumerate(hist.dates):
+        day = {p: float(hist.values[t, j]) for j, p in enumerate(hist.pairs) if hist.mask[t, j]}
+        if not day:
+            continue
+        fx_date = str(d).replace("T00:00:00", "")
+        for k, ccy in enumerate(currencies):
+            try:
+                prices[t, k] = get_rate(day, ccy, base, fx_date)
+            except ValueError:
+                pass
+    return currencies, prices
+
+
+def fit_model(hist, base: str = BASE_CCY) -> ReturnModel:
+    """Joint mean/covariance of daily log returns over the rows where every currency is priced."""
+    currencies, prices = base_prices(hist, base)
+    complete = prices[~np.isnan(prices).any(axis=1)]
+    if len(complete) < 2:
+        raise ValueError("Need at least two fully priced days in the rate history to fit returns.")
+    r = np.diff(np.log(complete), axis=0)
+    cov = np.cov(r, rowvar=False, ddof=1) if len(r) > 1 else np.zeros((len(currencies),) * 2)
+    return ReturnModel(base, currencies, complete[-1], r.mean(axis=0),
+                       np.atleast_2d(cov), len(r))
+
+
+def _cholesky(cov: np.ndarray) -> np.ndarray:
+    """Cholesky factor, with a growing diagonal jitter for (near-)singular covariances."""
+    jitter = 0.0
+    scale = max(float(np.mean(np.diag(cov))), 1e-18)
+    for _ in range(8):
+        try:
+            return np.linalg.cholesky(cov + jitter * np.eye(len(cov)))
+        except np.linalg.LinAlgError:
+            jitter = scale * 1e-10 if jitter == 0.0 else jitter * 100
+    raise ValueError("Return covariance is not positive semi-definite.")
+
+
+# ---------- Simulate ----------
+def simulate_moves(model: ReturnModel, paths: int, horizon: int = 1, seed: int | None = 7) -> np.ndarray:
+    """
+    Base-currency change in value of 1 unit of each currency on every path,
+    shape (paths, C): spot × (exp(R) − 1), R ~ N(h·mu, h·cov).
+    """
+    rng = np.random.default_rng(seed)
+    chol = _cholesky(model.cov * horizon)
+    z = rng.standard_normal((paths, len(model.currencies)))
+    r = model.mu * horizon + z @ chol.T
+    return model.spot * np.expm1(r)
+
+
+def exposure_matrix(wallets, model: ReturnModel) -> tuple[np.ndarray, np.ndarray, list]:
+    """
+    (balances in the model's currencies W × C, base-currency value now W,
+    per wallet the {currency: amount} the model cannot price).
+    """
+    col = {c: k for k, c in enumerate(model.currencies)}
+    exposure = np.zeros((len(wallets), len(model.currencies)))
+    value = np.zeros(len(wallets))
+    unpriced = [{} for _ in wallets]
+    for i, balances in enumerate(wallets):
+        for ccy, amount in balances.items():
+            if ccy == model.base:
+                value[i] += amount
+            elif ccy in col:
+                exposure[i, col[ccy]] += amount
+            elif amount:
+                unpriced[i][ccy] = unpriced[i].get(ccy, 0.0) + amount
+    value += exposure @ model.spot
+    return exposure, value, unpriced
+
+
+def tail_risk(pnl: np.ndarray, confidence) -> dict:
+    """
+    Per row of a wallets × paths P&L matrix: {c: (VaR, ES)} as positive losses.
+    One partition isolates the widest tail; narrower tails are cut from it.
+    """
+    paths = pnl.shape[1]
+    tails = {c: max(1, int(np.ceil((1.0 - c) * paths))) for c in confidence}   # paths in each tail
+    worst = np.partition(pnl, max(tails.values()) - 1, axis=1)[:, :max(tails.values())]
+    out = {}
+    for c, k in tails.items():
+        tail = np.partition(worst, k - 1, axis=1)[:, :k] if k < worst.shape[1] else worst
+        out[c] = (-tail.max(axis=1), -tail.mean(axis=1))
+    return out
+
+
+def risk_report(wallets, model: ReturnModel, moves: np.ndarray, confidence=DEFAULT_CONFIDENCE,
+                chunk_cells: int = DEFAULT_CHUNK_CELLS):
+    """
+    Yield one result dict per (wallet_id, balances) in `wallets`; the P&L
+    matrix is built chunk by chunk so at most chunk_cells floats are live.
+    """
+    chunk = max(1, chunk_cells // len(moves))
+    wallets = iter(wallets)
+    while True:
+        batch = [w for _, w in zip(range(chunk), wallets)]
+        if not batch:
+            return
+        exposure, value, unpriced = exposure_matrix([b for _, b in batch], model)
+        pnl = exposure @ moves.T                          # (chunk, paths)
+        tails = tail_risk(pnl, confidence)
+        for i, (wallet_id, _) in enumerate(batch):
+            row = {
+                "wallet_id": wallet_id,
+                "value": round(float(value[i]), 2),
+                "mean_pnl": round(float(pnl[i].mean()), 2),
+                "risk": {f"{c:g}": {"var": round(float(tails[c][0][i]), 2),
+                                    "es": round(float(tails[c][1][i]), 2)} for c in confidence},
+            }
+            if unpriced[i]:
+                row["unpriced"] = unpriced[i]             # not in value or risk
+            yield row
+
+
+# ---------- Wallet sources ----------
+def iter_store_wallets(batch_size: int = 10_000):
+    store = WalletStore()
+    try:
+        for batch in store.iter_wallets(batch_size):
+            yield from batch
+    finally:
+        store.close()
+
+
+def load_main_wallet():
+    with open(BALANCES_PATH, "r") as f:
+        return [("main", json.load(f))]
+
+
+# ---------- CLI ----------
+def _print_fit(model: ReturnModel):
+    corr = model.correlation()
+    print(f"[FX Risk fit] {model.observations} daily returns | base {model.base}")
+    for k, ccy in enumerate(model.currencies):
+        print(f"- {ccy}_{model.base}: spot {model.spot[k]:.6f} | mean {model.mu[k] * 100:+.4f}%/day "
+              f"| vol {np.sqrt(model.cov[k, k]) * 100:.4f}%/day")
+    for a in range(len(model.currencies)):
+        for b in range(a + 1, len(model.currencies)):
+            print(f"- corr({model.currencies[a]}, {model.currencies[b]}) = {corr[a, b]:+.3f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Monte Carlo FX VaR / expected shortfall for wallet balances")
+    ap.add_argument("cmd", nargs="?", choices=("run", "fit"), default="run",
+                    help="run: VaR/ES per wallet (default); fit: only print the fitted return model")
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--wallet", help="one wallet from the wallet store")
+    src.add_argument("--all-wallets", action="store_true", help="every wallet in the wallet store")
+    ap.add_argument("--paths", type=int, default=DEFAULT_PATHS)
+    ap.add_argument("--horizon", type=int, default=1, help="days")
+    ap.add_argument("--confidence", default=",".join(f"{c:g}" for c in DEFAULT_CONFIDENCE))
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--chunk", type=int, default=0, help="wallets per chunk (default: ~4M P&L cells)")
+    ap.add_argument("--base", default=BASE_CCY)
+    ap.add_argument("--data", default=DATA_PATH)
+    ap.add_argument("--out", help="write per-wallet results as JSON lines")
+    args = ap.parse_args()
+
+    try:
+        model = fit_model(load_rate_history(args.data), args.base.upper())
+    except ValueError as e:
+        sys.exit(str(e))
+    if args.cmd == "fit":
+        _print_fit(model)
+        return
+
+    confidence = sorted({float(c) for c in args.confidence.split(",") if c.strip()})
+    if not confidence or not all(0.0 < c < 1.0 for c in confidence):
+        sys.exit("--confidence values must be in (0, 1).")
+    if args.paths < 1 or args.horizon < 1:
+        sys.exit("--paths and --horizon must be >= 1.")
+
+    if args.all_wallets:
+        wallets = iter_store_wallets()
+    elif args.wallet:
+        store = WalletStore()
+        try:
+            wallets = [(args.wallet, dict(store.get(args.wallet)))]
+        except KeyError:
+            sys.exit(f"Unknown wallet {args.wallet!r}")
+        finally:
+            store.close()
+    else:
+        wallets = load_main_wallet()
+
+    moves = simulate_moves(model, args.paths, args.horizon, args.seed)
+    chunk_cells = args.chunk * args.paths if args.chunk else DEFAULT_CHUNK_CELLS
+
+    _print_fit(model)
+    print(f"{args.paths:,} paths | horizon {args.horizon} day(s) | seed {args.seed}\n")
+
+    out = open(args.out, "w") if args.out else None
+    total = {"wallets": 0, "value": 0.0}
+    unpriced: dict = {}
+    try:
+        for row in risk_report(wallets, model, moves, confidence, chunk_cells):
+            total["wallets"] += 1
+            total["value"] += row["value"]
+            for ccy, amount in row.get("unpriced", {}).items():
+                n, held = unpriced.get(ccy, (0, 0.0))
+                unpriced[ccy] = (n + 1, held + amount)
+            if out:
+                out.write(json.dumps(row) + "\n")
+            if total["wallets"] <= 20:
+                risk = " | ".join(f"VaR{c} {v['var']:,.2f} ES{c} {v['es']:,.2f}" for c, v in row["risk"].items())
+                print(f"- {row['wallet_id']}: value {row['value']:,.2f} {model.base} | {risk}")
+    finally:
+        if out:
+            out.close()
+    if total["wallets"] > 20:
+        print(f"... {total['wallets'] - 20:,} more")
+    print(f"\n{total['wallets']:,} wallets | total value {total['value']:,.2f} {model.base}"
+          + (f" | results → {args.out}" if args.out else ""))
+    for ccy, (n, held) in sorted(unpriced.items()):
+        print(f"Warning: {held:,.2f} {ccy} in {n:,} wallet(s) has no {ccy}_{model.base} price in "
+              f"{args.data}; it is left out of the value and the risk.", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
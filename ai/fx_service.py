@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+FX Conversion Service (resident mode for ai/fx_conversion_sim.py)
+- Loads rates, balances, carbon factors and the velocity index once
+- Serves conversions over local HTTP (or a Unix socket)
+- Serializes balance mutations with a single lock
+- Each settled/blocked conversion is committed to a journal
+  (fx_data/service_journal.jsonl) before the response is sent; concurrent
+  requests share one fsync (group commit, ai/group_commit.py)
+- A background thread flushes balances/logs (write-behind) and trims the journal;
+  a failed flush is logged and its batch retried from the journal on the next one
+- The same thread re-reads the latest rates when fxrates.json or the tick log changes
+- On startup, any journal left by a crash is replayed into balances/logs
+
+Usage:
+  python3 ai/fx_service.py [--host 127.0.0.1] [--port 8765] [--flush-interval 1.0]
+                           [--durability fsync|write|none] [--commit-delay-ms 0]
+  python3 ai/fx_service.py --unix /tmp/aiva.sock
+
+Endpoints:
+  POST /convert   {"src": "USD", "dst": "AUD", "amount": 200, "wallet_id": "w_123" (optional)}
+  GET  /balances[?wallet_id=w_123]
+  GET  /health
+  GET  /metrics   stage timings in Prometheus text format (when AIVA_METRICS=1)
+  POST /flush     force a write-behind flush
+"""
+
+import argparse
+import json
+import signal
+import socketserver
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import fx_conversion_sim as sim
+import metrics
+from group_commit import GroupCommitLog
+from log_store import iter_jsonl
+
+JOURNAL_PATH = Path("fx_data/service_journal.jsonl")
+
+
+# ---------- Journal ----------
+def _flushing_path(journal_path: Path) -> Path:
+    return journal_path.with_name(journal_path.name + ".flushing")
+
+def recover_journal(journal_path: Path = JOURNAL_PATH) -> int:
+    """
+    Replay journal records that never made it into the logs (crash between
+    journal commit and write-behind flush); see sim.replay_commits().
+    """
+    records = []
+    for p in (_flushing_path(journal_path), journal_path):
+        records.extend(iter_jsonl(p))
+    if records:
+        sim.replay_commits(records)
+    for p in (_flushing_path(journal_path), journal_path):
+        p.unlink(missing_ok=True)
+    return len(records)
+
+
+class ConversionService:
+    """In-memory conversion state + durable journal + write-behind flusher."""
+
+    def __init__(self, journal_path: Path = JOURNAL_PATH, flush_interval: float = 1.0,
+                 durability: str | None = None, commit_delay: float | None = None):
+        self.journal_path = Path(journal_path)
+        self.flush_interval = flush_interval
+        self.recovered = recover_journal(self.journal_path)
+        self.state = sim.load_state()
+        self.journal = GroupCommitLog(self.journal_path, durability, max_delay=commit_delay)
+        self.lock = threading.Lock()          # guards state + journal
+        self.flush_lock = threading.Lock()    # one flush at a time
+        self._failed = None                   # (wallet store, snapshots) of a batch whose flush failed
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="write-behind", daemon=True)
+
+    def start(self):
+        self._flusher.start()
+
+    def convert(self, src: str, dst: str, amount: float, wallet_id: str | None = None) -> dict:
+        with self.lock:
+            res = sim.settle(self.state, src, dst, amount, wallet_id)
+            ticket = self.journal.append({
+                "balances": [[wallet_id, res["after"]]],
+                "tx": [res["tx_entry"]],
+                "audit": [self.state["pending_audit"][-1]],
+            })
+        self.journal.wait(ticket)  # outside the lock, so requests queued meanwhile share the fsync
+        tx = res["tx_entry"]
+        out = {
+            "wallet_id": wallet_id,
+            "tx_id": tx["tx_id"],
+            "fx_date_used": tx["fx_date_used"],
+            "pair": tx["pair"],
+            "rate": tx["rate"],
+            "amount_src": tx["amount_src"],
+            "amount_dst": tx["amount_dst"],
+            "balances": res["after"],
+            "carbon": tx["carbon"],
+            "compliance": tx["compliance"],
+        }
+        if "fx_time_used" in tx:
+            out["fx_time_used"] = tx["fx_time_used"]
+        return out
+
+    def balances(self, wallet_id: str | None = None) -> dict:
+        with self.lock:
+            return dict(sim.wallet_balances(self.state, wallet_id))
+
+    def pending(self) -> int:
+        with self.lock:
+            return len(self.state["pending_tx"])
+
+    def refresh_rates(self) -> bool:
+        """Pick up new rates (fxrates.json edited, ticks ingested) for the next conversions."""
+        with self.lock:
+            return sim.refresh_rates(self.state)
+
+    def flush(self):
+        """
+        Swap out queued effects and rotate the journal under the lock, then
+        write them outside it so requests keep flowing during disk I/O.
+        If the write fails, the batch stays in the .flushing journal and the
+        error is raised; the next flush finishes that batch first.
+        """
+        with self.flush_lock:
+            self._finish_failed()
+            with self.lock:
+                if not self.state["pending_tx"] and not self.state["balances_dirty"]:
+                    return
+                self.journal.rotate(_flushing_path(self.journal_path))   # first: if it fails, nothing moved
+                batch = {
+                    "balances": dict(self.state["balances"]),
+                    "balances_dirty": self.state["balances_dirty"],
+                    "pending_tx": self.state["pending_tx"],
+                    "pending_audit": self.state["pending_audit"],
+                }
+                if self.state["wallets"] is not None:
+                    # snapshot changed wallets now; their sqlite UPSERT runs below, outside the lock
+                    batch["wallet_store"] = self.state["wallets"]
+                    batch["wallet_snapshots"] = self.state["wallets"].take_dirty()
+                self.state["pending_tx"], self.state["pending_audit"] = [], []
+                self.state["balances_dirty"] = False
+                velocity_dirty = self.state.pop("velocity_dirty", False)
+
+            snapshots = batch.get("wallet_snapshots")
+            try:
+                sim.apply_effects(batch)   # the journal already is this batch's commit log
+                sim.checkpoint_logs()
+            except Exception:
+                self._failed = (batch.get("wallet_store"), snapshots)
+                if velocity_dirty:
+                    with self.lock:
+                        self.state["velocity_dirty"] = True
+                raise
+            _flushing_path(self.journal_path).unlink(missing_ok=True)
+
+            if velocity_dirty:
+                with self.lock:  # the index is mutated by requests
+                    sim.save_velocity_index(self.state["velocity"])
+
+    def _finish_failed(self):
+        """
+        Apply the batch of a failed flush from its .flushing journal before the
+        journal is rotated onto it again. Replay is idempotent, so effects that
+        were written before the failure are not duplicated.
+        """
+        flushing = _flushing_path(self.journal_path)
+        if not flushing.exists():
+            return
+        store, snapshots = self._failed or (None, None)
+        if snapshots:
+            store.write_snapshots(snapshots)   # also releases the wallets pinned for this batch
+        sim.replay_commits(list(iter_jsonl(flushing)))
+        flushing.unlink()
+        self._failed = None
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.refresh_rates()
+                self.flush()
+            except Exception as e:        # keep serving: the batch is retried on the next tick
+                print(f"[FX Service] write-behind flush failed, will retry: {e!r}", file=sys.stderr)
+
+    def close(self):
+        self._stop.set()
+        if self._flusher.is_alive():
+            self._flusher.join()
+        self.flush()
+        self.journal.close()
+
+
+# ---------- HTTP ----------
+class Handler(BaseHTTPRequestHandler):
+    service: ConversionService = None  # set by make_server()
+    verbose = False
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+    def address_string(self):
+        # Unix sockets have no (host, port) client address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def _send(self, code: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/balances":
+            wallet_id = parse_qs(url.query).get("wallet_id", [None])[0]
+            try:
+                self._send(200, self.service.balances(wallet_id))
+            except ValueError as e:
+                self._send(404, {"error": str(e)})
+        elif url.path == "/metrics":
+            data = metrics.to_prometheus().encode()   # empty unless AIVA_METRICS=1
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        elif url.path == "/health":
+            self._send(200, {"status": "ok", "pending": self.service.pending(),
+                             "commit": self.service.journal.stats()})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path == "/flush":
+            try:
+                self.service.flush()
+            except Exception as e:
+                self._send(500, {"error": f"flush failed: {e!r}"})
+                return
+            self._send(200, {"status": "flushed"})
+            return
+        if self.path != "/convert":
+            self._send(404, {"error": "not found"})
+            return
+        try:
+            order = self._read_json()
+            wallet_id = order.get("wallet_id")
+            result = self.service.convert(str(order["src"]), str(order["dst"]), float(order["amount"]),
+                                          None if wallet_id is None else str(wallet_id))
+        except (KeyError, TypeError, ValueError) as e:
+            self._send(400, {"error": str(e)})
+            return
+        self._send(200, result)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service: ConversionService, host: str = "127.0.0.1", port: int = 8765,
+                unix_path: str | None = None, verbose: bool = False):
+    handler = type("BoundHandler", (Handler,), {"service": service, "verbose": verbose})
+    if unix_path:
+        Path(unix_path).unlink(missing_ok=True)
+        return UnixHTTPServer(unix_path, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+# ---------- CLI ----------
+def main():
+    ap = argparse.ArgumentParser(description="Resident FX conversion service")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--unix", help="serve on a Unix socket path instead of TCP")
+    ap.add_argument("--flush-interval", type=float, default=1.0, help="write-behind interval (seconds)")
+    ap.add_argument("--durability", choices=("fsync", "write", "none"), default=None,
+                    help="journal durability (default: AIVA_DURABILITY or fsync)")
+    ap.add_argument("--commit-delay-ms", type=float, default=None,
+                    help="max wait to gather more requests into one journal fsync (default: AIVA_COMMIT_DELAY_MS or 0)")
+    ap.add_argument("--verbose", action="store_true", help="log every request")
+    args = ap.parse_args()
+
+    def _stop(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, _stop)
+
+    service = ConversionService(flush_interval=args.flush_interval, durability=args.durability,
+                                commit_delay=None if args.commit_delay_ms is None else args.commit_delay_ms / 1000.0)
+    if service.recovered:
+        print(f"[FX Service] Replayed {service.recovered} journal records from a previous run")
+    server = make_server(service, args.host, args.port, args.unix, args.verbose)
+    service.start()
+    where = args.unix or f"http://{args.host}:{args.port}"
+    print(f"[FX Service] Listening on {where} (fx date {service.state['fx_date']})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        print("[FX Service] Flushed and stopped")
+
+if __name__ == "__main__":
+    main()
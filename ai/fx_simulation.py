@@ -85,9 +85,13 @@ def convert(amount, from_cur, to_cur):
     print("Updated Balances:", balances)
 
 # ------------------------
-# Test
+# Demo
 # ------------------------
-print("Initial Balances:", balances)
-convert(100, "AUD", "USD")
-convert(200, "USD", "EUR")
-print("All Transactions:", transactions)
+def main():
+    print("Initial Balances:", balances)
+    convert(100, "AUD", "USD")
+    convert(200, "USD", "EUR")
+    print("All Transactions:", transactions)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,6 @@
-import json
+from fx_trend_engine import DATA_PATH, first_last_change, load_rate_history
 
-# Load data from fxrates.json
-with open('fx_data/fxrates.json', 'r') as f:
-    data = json.load(f)
-
-trend_summary = {}
+PAIRS = ['USD_AUD', 'EUR_AUD', 'AUD_USD']
 
 def detect_trend(rates):
     if rates[-1] > rates[0]:
@@ -14,27 +10,40 @@ def detect_trend(rates):
     else:
         return "stable"
 
-# Analyze each currency pair
-for pair in ['USD_AUD', 'EUR_AUD', 'AUD_USD']:
-    # Collect that pair's values from each date
-    try:
-        pair_values = [entry[pair] for entry in data.values()]
-        trend = detect_trend(pair_values)
-    except KeyError:
-        trend = "N/A (Data missing)"
-    
-    trend_summary[pair] = trend
-
-# Prepare recommendation string
-suggestion = "[Smart FX Suggestion] Based on the past 7 days:\n"
-for pair, trend in trend_summary.items():
-    if trend == "rising":
-        action = "Consider converting into"
-    elif trend == "falling":
-        action = "Consider converting out of"
-    else:
-        action = "Hold position in"
-    
-    suggestion += f"- {pair}: {trend} trend → {action} {pair.split('_')[1]}\n"
+def trend_summary(path=DATA_PATH, pairs=PAIRS):
+    # Load data from fxrates.json (dates × pairs, missing days masked)
+    hist = load_rate_history(path)
+    firsts, lasts, _ = first_last_change(hist)
+
+    summary = {}
+    # Analyze each currency pair
+    for pair in pairs:
+        # Compare the first and last observed values of the pair
+        if pair in hist.pairs and hist.mask[:, hist.column(pair)].any():
+            j = hist.column(pair)
+            trend = detect_trend([firsts[j], lasts[j]])
+        else:
+            trend = "N/A (Data missing)"
+
+        summary[pair] = trend
+    return summary
+
+def suggestion_text(summary):
+    # Prepare recommendation string
+    suggestion = "[Smart FX Suggestion] Based on the past 7 days:\n"
+    for pair, trend in summary.items():
+        if trend == "rising":
+            action = "Consider converting into"
+        elif trend == "falling":
+            action = "Consider converting out of"
+        else:
+            action = "Hold position in"
+
+        suggestion += f"- {pair}: {trend} trend → {action} {pair.split('_')[1]}\n"
+    return suggestion
+
+def main():
+    print(suggestion_text(trend_summary()))
 
-print(suggestion)
+if __name__ == "__main__":
+    main()
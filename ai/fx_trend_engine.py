@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Vectorized FX trend analytics (NumPy)
+
+Loads a rate history into one dates × pairs float64 matrix (NaN + mask for
+missing observations) and computes, for all pairs at once:
+- rolling % change over a window
+- moving averages
+- rolling volatility of period returns
+- threshold signals (+1 up-move ≥ threshold, -1 down-move ≥ threshold, 0 wait)
+
+Unlike series_for_pair(), a pair with a missing day is not dropped: gaps are
+masked, and changes are measured on the last observed value.
+
+Accepted inputs:
+- fx_data/fxrates.json  {"2025-08-01": {"USD_AUD": 1.52, ...}, ...}
+- mockdata/fxrates.json [{"date": "2025-08-01", "AUD_USD": 0.68, ...}, ...]
+Dates may be days or ISO timestamps (intraday).
+
+Usage:
+  python3 ai/fx_trend_engine.py [THRESHOLD_PCT] [--window N] [--data fx_data/fxrates.json]
+"""
+
+import argparse
+import json
+from dataclasses import dataclass
+
+import numpy as np
+
+from data_cache import cached
+
+DATA_PATH = "fx_data/fxrates.json"
+
+
+@dataclass
+class RateHistory:
+    dates: np.ndarray    # datetime64[s], ascending, shape (T,)
+    pairs: list          # column names, shape (P,)
+    values: np.ndarray   # float64, shape (T, P), NaN where missing
+    mask: np.ndarray     # bool, shape (T, P), True where observed
+
+    def column(self, pair: str) -> int:
+        return self.pairs.index(pair)
+
+
+def history_from_rows(rows) -> RateHistory:
+    """rows: iterable of (date_str, {pair: rate}) in any order."""
+    rows = list(rows)
+    pairs = sorted({p for _, day in rows for p in day if "_" in p})
+    col = {p: j for j, p in enumerate(pairs)}
+    dates = np.array([d.rstrip("Z") for d, _ in rows], dtype="datetime64[s]")
+    values = np.full((len(rows), len(pairs)), np.nan)
+    for i, (_, day) in enumerate(rows):
+        for p, v in day.items():
+            j = col.get(p)
+            if j is not None and v is not None:
+                values[i, j] = float(v)
+    order = np.argsort(dates, kind="stable")
+    values = values[order]
+    return RateHistory(dates[order], pairs, values, ~np.isnan(values))
+
+
+def load_rate_history(path: str = DATA_PATH) -> RateHistory:
+    """Parsed once per file version; later calls/processes unpickle it (ai/data_cache.py)."""
+    return cached(path, _parse_rate_history, "rate_history")
+
+
+def _parse_rate_history(path) -> RateHistory:
+    with open(path, "r") as f:
+        data = json.load(f)
+    if isinstance(data, dict):                         # date -> {pair: rate}
+        return history_from_rows(data.items())
+    return history_from_rows(                          # [{"date": ..., pair: rate}, ...]
+        (row["date"], {k: v for k, v in row.items() if k != "date"}) for row in data
+    )
+
+
+# ---------- Vectorized building blocks (all pairs at once) ----------
+def forward_fill(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Carry the last observed value down each column (leading gaps stay NaN)."""
+    idx = np.where(mask, np.arange(len(values))[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    filled = values[idx, np.arange(values.shape[1])]
+    filled[~np.maximum.accumulate(mask, axis=0)] = np.nan
+    return filled
+
+
+def _window_sums(x: np.ndarray, window: int) -> np.ndarray:
+    """Sum over the trailing `window` rows (shorter at the start), via one cumsum."""
+    c = np.cumsum(x, axis=0)
+    out = c.copy()
+    out[window:] = c[window:] - c[:-window]
+    return out
+
+
+def rolling_pct_change(values: np.ndarray, mask: np.ndarray, window: int,
+                       filled: np.ndarray | None = None) -> np.ndarray:
+    """% change between the last observed value now and `window` rows earlier."""
+    ff = forward_fill(values, mask) if filled is None else filled
+    out = np.full_like(ff, np.nan)
+    if window < len(ff):
+        prev = ff[:-window]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[window:] = np.where(prev != 0, (ff[window:] - prev) / prev * 100.0, 0.0)
+    return out
+
+
+def moving_average(values: np.ndarray, mask: np.ndarray, window: int) -> np.ndarray:
+    """Mean of the observed values in each trailing window (NaN if none observed)."""
+    sums = _window_sums(np.where(mask, values, 0.0), window)
+    counts = _window_sums(mask.astype(np.int64), window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def period_returns(values: np.ndarray, mask: np.ndarray,
+                   filled: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """Simple returns between consecutive observations of each pair (+ validity mask)."""
+    ff = forward_fill(values, mask) if filled is None else filled
+    r = np.full_like(ff, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r[1:] = ff[1:] / ff[:-1] - 1.0
+    valid = mask & ~np.isnan(r)
+    return np.where(valid, r, 0.0), valid
+
+
+def rolling_volatility(values: np.ndarray, mask: np.ndarray, window: int,
+                       filled: np.ndarray | None = None) -> np.ndarray:
+    """Sample std (in %) of period returns in each trailing window; NaN with < 2 returns."""
+    r, valid = period_returns(values, mask, filled)
+    n = _window_sums(valid.astype(np.int64), window)
+    s1 = _window_sums(r, window)
+    s2 = _window_sums(r * r, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var = (s2 - s1 * s1 / n) / (n - 1)
+    return np.where(n >= 2, np.sqrt(np.maximum(var, 0.0)) * 100.0, np.nan)
+
+
+def threshold_signals(change_pct: np.ndarray, threshold_pct: float) -> np.ndarray:
+    """+1 / -1 when |move| ≥ threshold (Convert Now), 0 otherwise (Wait); int8."""
+    sig = np.zeros(change_pct.shape, dtype=np.int8)
+    with np.errstate(invalid="ignore"):
+        sig[change_pct >= threshold_pct] = 1
+        sig[change_pct <= -threshold_pct] = -1
+    return sig
+
+
+def first_last_change(hist: RateHistory) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per pair: first observed, last observed, and % change between them (NaN if never observed)."""
+    observed = hist.mask.any(axis=0)
+    cols = np.arange(len(hist.pairs))
+    first_i = np.argmax(hist.mask, axis=0)
+    last_i = len(hist.dates) - 1 - np.argmax(hist.mask[::-1], axis=0)
+    first = np.where(observed, hist.values[first_i, cols], np.nan)
+    last = np.where(observed, hist.values[last_i, cols], np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = np.where(first != 0, (last - first) / first * 100.0, 0.0)
+    return first, last, np.where(observed, change, np.nan)
+
+
+def analyze(hist: RateHistory, window: int, threshold_pct: float) -> dict:
+    """All indicators for the whole history (the forward-filled matrix is computed once)."""
+    filled = forward_fill(hist.values, hist.mask)
+    change = rolling_pct_change(hist.values, hist.mask, window, filled)
+    return {
+        "pct_change": change,
+        "moving_avg": moving_average(hist.values, hist.mask, window),
+        "volatility": rolling_volatility(hist.values, hist.mask, window, filled),
+        "signals": threshold_signals(change, threshold_pct),
+    }
+
+
+# ---------- CLI ----------
+def main():
+    ap = argparse.ArgumentParser(description="Vectorized FX trend summary for every pair")
+    ap.add_argument("threshold", nargs="?", type=float, default=1.0, help="decision threshold in %% (default 1.0)")
+    ap.add_argument("--window", type=int, default=0, help="rows per window (default: whole history)")
+    ap.add_argument("--data", default=DATA_PATH)
+    args = ap.parse_args()
+
+    hist = load_rate_history(args.data)
+    window = args.window or max(len(hist.dates) - 1, 1)
+    ind = analyze(hist, window, args.threshold)
+    first, last, total = first_last_change(hist)
+
+    span = [str(d).replace("T00:00:00", "") for d in (hist.dates[0], hist.dates[-1])]
+    print(f"[Smart FX Trends] {len(hist.dates)} observations × {len(hist.pairs)} pairs "
+          f"({span[0]} → {span[1]})")
+    print(f"Window: {window} rows | Threshold: {args.threshold:.2f}%\n")
+    for j, pair in enumerate(hist.pairs):
+        gaps = int((~hist.mask[:, j]).sum())
+        move = ind["pct_change"][-1, j]
+        if np.isnan(move):
+            move = total[j]
+        urgency = "Convert Now" if abs(move) >= args.threshold else "Wait"
+        vol = ind["volatility"][-1, j]
+        vol = "n/a" if np.isnan(vol) else f"{vol:.2f}%"
+        print(f"- {pair}: {move:+.2f}% over window → {urgency} | "
+              f"MA {ind['moving_avg'][-1, j]:.4f} | vol {vol} | "
+              f"first {first[j]:.4f} → last {last[j]:.4f}"
+              + (f" | {gaps} missing" if gaps else ""))
+
+if __name__ == "__main__":
+    main()
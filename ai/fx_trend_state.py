@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Incremental per-pair trend state (fx_data/trend_state.json)
+
+For each pair it keeps, over the last `window` observations:
+- the values in the window (oldest → newest) and their running sum (moving average)
+- running sum / sum of squares of period returns (rolling variance)
+- first-ever and last observed value/date
+- the threshold crossing state (+1 up, -1 down, 0 inside the band) and when it last changed
+Appending one date's rates is O(1) per pair; no history scan is needed. The
+running sums are recomputed exactly (math.fsum) each time the window turns
+over, so float error cannot build up over a long history.
+A pair missing on a date (no rate, null, not a positive number) is simply
+not updated (its window spans observations).
+sync reads fx_data/fxrates.json ({"2025-08-01": {"USD_AUD": 1.52, ...}}) or
+mockdata/fxrates.json rows ([{"date": "2025-08-01", "AUD_USD": 0.68, ...}]).
+
+Usage:
+  python3 ai/fx_trend_state.py sync [--data fx_data/fxrates.json] [--window 7] [--threshold 1.0]
+  python3 ai/fx_trend_state.py update <DATE> <PAIR=RATE> [PAIR=RATE ...]
+  python3 ai/fx_trend_state.py show
+"""
+
+import argparse
+import json
+import math
+import os
+from collections import deque
+from pathlib import Path
+
+from fx_trend_with_threshold import DATA_PATH, action_from_move, classify_move, pct_change
+
+STATE_PATH = Path("fx_data/trend_state.json")
+DEFAULT_WINDOW = 7          # observations, matching the 7-day summary
+DEFAULT_THRESHOLD_PCT = 1.0
+
+
+def _rate(val) -> float | None:
+    """A usable rate, or None for a missing/null/non-numeric/non-positive one."""
+    if val is None or isinstance(val, bool):
+        return None
+    try:
+        rate = float(val)
+    except (TypeError, ValueError):
+        return None
+    return rate if math.isfinite(rate) and rate > 0 else None
+
+def load_rates(path) -> dict:
+    """Date → {pair: rate} in date order, from a dict-of-days or a list-of-rows file."""
+    with open(path, "r") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        days: dict = {}
+        for row in data:
+            if isinstance(row, dict) and row.get("date"):
+                days.setdefault(str(row["date"]), {}).update(
+                    (k, v) for k, v in row.items() if k != "date")
+        data = days
+    return dict(sorted(data.items()))
+
+
+class PairTrend:
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()       # last `window` observations
+        self.returns = deque()      # returns between consecutive values in the window
+        self.sum = 0.0
+        self.ret_sum = 0.0
+        self.ret_sq = 0.0
+        self.first = self.first_date = None
+        self.last = self.last_date = None
+        self.count = 0
+        self.signal = 0
+        self.signal_since = None
+
+    def push(self, date: str, rate: float):
+        if self.values:
+            r = rate / self.values[-1] - 1.0 if self.values[-1] else 0.0
+            self.returns.append(r)
+            self.ret_sum += r
+            self.ret_sq += r * r
+        self.values.append(rate)
+        self.sum += rate
+        if len(self.values) > self.window:
+            self.sum -= self.values.popleft()
+            old = self.returns.popleft()
+            self.ret_sum -= old
+            self.ret_sq -= old * old
+        if self.first is None:
+            self.first, self.first_date = rate, date
+        self.last, self.last_date = rate, date
+        self.count += 1
+        if self.count % self.window == 0:
+            self.resum()
+
+    def resum(self):
+        """Recompute the running sums from the window (drops accumulated rounding error)."""
+        self.sum = math.fsum(self.values)
+        self.ret_sum = math.fsum(self.returns)
+        self.ret_sq = math.fsum(r * r for r in self.returns)
+
+    # ---------- Queries ----------
+    def change_pct(self) -> float:
+        """% move from the oldest to the newest value in the window."""
+        return pct_change(self.values[0], self.values[-1]) if self.values else 0.0
+
+    def moving_avg(self) -> float:
+        return self.sum / len(self.values) if self.values else math.nan
+
+    def volatility_pct(self) -> float:
+        """Sample std (in %) of the returns in the window; NaN with fewer than 2."""
+        n = len(self.returns)
+        if n < 2:
+            return math.nan
+        var = (self.ret_sq - self.ret_sum * self.ret_sum / n) / (n - 1)
+        return math.sqrt(max(var, 0.0)) * 100.0
+
+    def update_signal(self, threshold_pct: float, date: str) -> bool:
+        """Recompute the crossing state; True if it changed."""
+        change = self.change_pct()
+        signal = 1 if change >= threshold_pct else (-1 if change <= -threshold_pct else 0)
+        if signal == self.signal:
+            return False
+        self.signal, self.signal_since = signal, date
+        return True
+
+    # ---------- Persistence ----------
+    def to_dict(self) -> dict:
+        return {
+            "values": list(self.values), "returns": list(self.returns),
+            "sum": self.sum, "ret_sum": self.ret_sum, "ret_sq": self.ret_sq,
+            "first": self.first, "first_date": self.first_date,
+            "last": self.last, "last_date": self.last_date,
+            "count": self.count, "signal": self.signal, "signal_since": self.signal_since,
+        }
+
+    @classmethod
+    def from_dict(cls, window: int, d: dict) -> "PairTrend":
+        pt = cls(window)
+        pt.values, pt.returns = deque(d["values"]), deque(d["returns"])
+        for key in ("sum", "ret_sum", "ret_sq", "first", "first_date", "last", "last_date",
+                    "count", "signal", "signal_since"):
+            setattr(pt, key, d[key])
+        return pt
+
+
+class TrendState:
+    def __init__(self, window: int = DEFAULT_WINDOW, threshold_pct: float = DEFAULT_THRESHOLD_PCT):
+        self.window = window
+        self.threshold_pct = threshold_pct
+        self.pairs: dict[str, PairTrend] = {}
+        self.last_date = None
+
+    def update(self, date: str, day_rates: dict) -> list:
+        """
+        Append one date's rates. Dates at or before the last applied one are
+        ignored (so re-syncing is idempotent). Returns the pairs whose
+        threshold crossing state changed.
+        """
+        if self.last_date is not None and date <= self.last_date:
+            return []
+        crossed = []
+        for pair, rate in day_rates.items():
+            rate = _rate(rate)
+            if "_" not in pair or rate is None:
+                continue
+            pt = self.pairs.get(pair)
+            if pt is None:
+                pt = self.pairs[pair] = PairTrend(self.window)
+            pt.push(date, rate)
+            if pt.update_signal(self.threshold_pct, date):
+                crossed.append(pair)
+        self.last_date = date
+        return crossed
+
+    def sync(self, data: dict) -> list:
+        """Apply every date in `data` newer than the last applied one (in date order)."""
+        crossed = []
+        for date, day in data.items():
+            if isinstance(day, dict):
+                crossed.extend(self.update(date, day))
+        return crossed
+
+    def recommendation(self, pair: str) -> dict | None:
+        """The current action_from_move() answer for a pair, or None if never seen."""
+        pt = self.pairs.get(pair)
+        if pt is None:
+            return None
+        base, quote = pair.split("_")
+        change = pt.change_pct()
+        urgency, note, tip = action_from_move(change, quote_ccy=quote, base_ccy=base,
+                                              threshold_pct=self.threshold_pct)
+        return {"pair": pair, "move": classify_move(change), "change_pct": change,
+                "urgency": urgency, "note": note, "tip": tip, "as_of": pt.last_date,
+                "signal": pt.signal, "signal_since": pt.signal_since}
+
+    # ---------- Persistence ----------
+    def save(self, path: Path = STATE_PATH):
+        """Write atomically (temp file + rename)."""
+        path = Path(path)
+        doc = {
+            "window": self.window,
+            "threshold_pct": self.threshold_pct,
+            "last_date": self.last_date,
+            "pairs": {p: pt.to_dict() for p, pt in self.pairs.items()},
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(doc, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path = STATE_PATH, window: int | None = None,
+             threshold_pct: float | None = None) -> "TrendState":
+        """
+        Load the saved state. A missing/corrupt file, or a different window,
+        starts empty (the next sync rebuilds it); a new threshold only
+        resets the crossing state.
+        """
+        try:
+            with open(path, "r") as f:
+                doc = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            doc = None
+        if doc is None or (window is not None and doc["window"] != window):
+            return cls(window or DEFAULT_WINDOW,
+                       DEFAULT_THRESHOLD_PCT if threshold_pct is None else threshold_pct)
+        state = cls(doc["window"], doc["threshold_pct"] if threshold_pct is None else threshold_pct)
+        state.last_date = doc["last_date"]
+        state.pairs = {p: PairTrend.from_dict(state.window, d) for p, d in doc["pairs"].items()}
+        if state.threshold_pct != doc["threshold_pct"]:
+            for pt in state.pairs.values():
+                pt.update_signal(state.threshold_pct, pt.last_date)
+        return state
+
+
+# ---------- CLI ----------
+def _report(state: TrendState):
+    print(f"[Smart FX Suggestion] as of {state.last_date} | window {state.window} obs | "
+          f"threshold {state.threshold_pct:.2f}%")
+    for pair in sorted(state.pairs):
+        rec = state.recommendation(pair)
+        pt = state.pairs[pair]
+        sign = "+" if rec["change_pct"] > 0 else ("−" if rec["change_pct"] < 0 else "±")
+        vol = pt.volatility_pct()
+        vol = "n/a" if math.isnan(vol) else f"{vol:.2f}%"
+        print(f"- {pair}: {rec['move']} ({sign}{abs(rec['change_pct']):.2f}%) → {rec['urgency']} | "
+              f"{rec['note']} | {rec['tip']} | MA {pt.moving_avg():.4f} | vol {vol}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Incremental Smart FX trend state")
+    ap.add_argument("cmd", choices=("sync", "update", "show"))
+    ap.add_argument("args", nargs="*", help="update: DATE PAIR=RATE [PAIR=RATE ...]")
+    ap.add_argument("--data", default=DATA_PATH, help="rates file for sync")
+    ap.add_argument("--window", type=int, help=f"observations per window (default {DEFAULT_WINDOW})")
+    ap.add_argument("--threshold", type=float, help=f"decision threshold in %% (default {DEFAULT_THRESHOLD_PCT})")
+    args = ap.parse_args()
+
+    state = TrendState.load(STATE_PATH, args.window, args.threshold)
+    if args.cmd == "sync":
+        crossed = state.sync(load_rates(args.data))
+    elif args.cmd == "update":
+        if len(args.args) < 2:
+            ap.error("update needs DATE and at least one PAIR=RATE")
+        day = {}
+        for kv in args.args[1:]:
+            pair, _, rate = kv.partition("=")
+            day[pair.upper()] = float(rate)
+        crossed = state.update(args.args[0], day)
+    else:
+        crossed = []
+    if args.cmd != "show":
+        state.save(STATE_PATH)
+
+    _report(state)
+    for pair in crossed:
+        rec = state.recommendation(pair)
+        print(f"! {pair} crossed the threshold on {rec['signal_since']} → {rec['urgency']}")
+
+if __name__ == "__main__":
+    main()
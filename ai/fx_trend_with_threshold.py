@@ -2,9 +2,11 @@ import sys
 import json
 from collections import OrderedDict
 
+from fx_trend_engine import first_last_change, load_rate_history
+
 DATA_PATH = "fx_data/fxrates.json"
 PAIRS_TO_CHECK = ["USD_AUD", "EUR_AUD", "AUD_USD"]  # safe to include missing; we'll handle it
-THRESHOLD_PCT = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+THRESHOLD_PCT = 1.0  # overridden by argv[1] in main()
 
 
 def load_data(path):
@@ -36,15 +38,17 @@ def classify_move(pct):
     else:
         return "stable"
 
-def action_from_move(pct, quote_ccy, base_ccy):
+def action_from_move(pct, quote_ccy, base_ccy, threshold_pct=None):
     """
     For pair BASE_QUOTE (e.g., USD_AUD = how many AUD per 1 USD):
     - If % change magnitude >= threshold → "Convert Now"
     - Else → "Wait"
     And we phrase the action relative to the quote currency the user holds.
+    threshold_pct defaults to THRESHOLD_PCT.
     """
     magnitude = abs(pct)
-    urgency = "Convert Now" if magnitude >= THRESHOLD_PCT else "Wait"
+    threshold = THRESHOLD_PCT if threshold_pct is None else threshold_pct
+    urgency = "Convert Now" if magnitude >= threshold else "Wait"
 
     # Messaging: if USD_AUD is rising, AUD is weakening vs USD.
     # Keeping it simple and consistent with your earlier copy:
@@ -67,6 +71,9 @@ def demo_pct(vals):
 
 
 def main():
+    global THRESHOLD_PCT
+    if len(sys.argv) > 1:
+        THRESHOLD_PCT = float(sys.argv[1])
     data = load_data(DATA_PATH)
 
     print("TYPE:", type(data))
@@ -96,14 +103,18 @@ def main():
     report_lines.append("[Smart FX Suggestion] 7‑day summary with threshold logic")
     report_lines.append(f"Decision threshold: {THRESHOLD_PCT:.2f}% total move\n")
 
+    # Columnar history: a missing day is masked instead of dropping the whole pair
+    hist = load_rate_history(DATA_PATH)
+    firsts, lasts, changes = first_last_change(hist)
+
     for pair in PAIRS_TO_CHECK:
-        series = series_for_pair(data, pair)
-        if series is None:
+        if pair not in hist.pairs or not hist.mask[:, hist.column(pair)].any():
             report_lines.append(f"- {pair}: N/A (data missing) → Hold position")
             continue
 
-        first, last = series[0], series[-1]
-        change = pct_change(first, last)
+        j = hist.column(pair)
+        first, last = float(firsts[j]), float(lasts[j])
+        change = float(changes[j])
         move = classify_move(change)
 
         base, quote = pair.split("_")  # e.g., USD_AUD
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Group-commit log: the durability point for settlements
+
+A commit is one JSON line. Concurrent committers append to an in-memory
+queue; the first one to wait becomes the leader, writes every queued line
+in one write() and (in "fsync" mode) one fsync, then wakes the whole group.
+So N conversions arriving together cost one fsync, not N, and each
+committer still only returns once its own record is durable.
+
+A line is all-or-nothing: a torn last line is skipped on replay, so every
+effect in a record (balances + tx + audit) is either replayed together or
+not at all. If a group's write or fsync fails, its lines go back to the
+front of the queue (and the partial write is cut off the file): the failing
+leader raises, and every committer of that group retries as leader, so none
+returns until its own record was written.
+
+One writer per log file: the open log holds an exclusive flock (POSIX), so
+a second process fails fast instead of having its records truncated by
+this one's checkpoint().
+
+Durability modes (AIVA_DURABILITY, or durability=):
+  fsync  (default) commit returns after the group is fsync'd — survives power loss
+  write            commit returns after write() to the OS — survives a process crash
+  none             lines are buffered in-process and written per max_batch / sync()
+
+Latency vs throughput: AIVA_COMMIT_DELAY_MS (default 0) lets a leader wait that
+long for more committers before syncing; AIVA_COMMIT_BATCH caps a group.
+
+Usage (threads × commits, per-record fsync vs group commit):
+  python3 ai/group_commit.py bench [THREADS] [COMMITS_PER_THREAD]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:          # Windows: no advisory lock, single writer by convention
+    fcntl = None
+
+DURABILITY_MODES = ("fsync", "write", "none")
+DURABILITY = os.environ.get("AIVA_DURABILITY", "fsync")
+if DURABILITY not in DURABILITY_MODES:
+    raise ValueError(f"Unknown AIVA_DURABILITY {DURABILITY!r}. Use one of {list(DURABILITY_MODES)}.")
+COMMIT_DELAY = float(os.environ.get("AIVA_COMMIT_DELAY_MS", "0")) / 1000.0
+COMMIT_BATCH = int(os.environ.get("AIVA_COMMIT_BATCH", "1024"))
+
+
+class GroupCommitLog:
+    def __init__(self, path: Path, durability: str | None = None,
+                 max_delay: float | None = None, max_batch: int | None = None):
+        self.path = Path(path)
+        self.durability = durability or DURABILITY
+        if self.durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability {self.durability!r}. Use one of {list(DURABILITY_MODES)}.")
+        self.max_delay = COMMIT_DELAY if max_delay is None else max_delay
+        self.max_batch = max(1, COMMIT_BATCH if max_batch is None else max_batch)
+        self._cond = threading.Condition()
+        self._queue: list = []       # encoded lines not yet written
+        self._appended = 0           # ticket of the last queued record
+        self._durable = 0            # ticket of the last record made durable
+        self._leader = False
+        self._fh = None
+        self.groups = 0
+        self.records = 0
+
+    # ---------- Commit ----------
+    def append(self, record: dict) -> int:
+        """Queue a record; returns its ticket for wait()."""
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._cond:
+            self._queue.append(line)
+            self._appended += 1
+            if len(self._queue) >= self.max_batch:
+                self._cond.notify_all()      # wake a leader that is gathering
+            return self._appended
+
+    def wait(self, ticket: int):
+        """Block until the record with `ticket` is durable (per the durability mode)."""
+        if self.durability == "none":
+            with self._cond:
+                if len(self._queue) < self.max_batch:
+                    return
+                ticket = self._appended
+        with self._cond:
+            while self._durable < ticket:
+                if not self._leader:
+                    self._leader = True
+                    break
+                self._cond.wait()
+            else:
+                return
+        self._lead()
+
+    def commit(self, record: dict):
+        self.wait(self.append(record))
+
+    def _lead(self):
+        """Write (and sync) everything queued so far as one group."""
+        try:
+            with self._cond:
+                if self.max_delay and len(self._queue) < self.max_batch:
+                    self._cond.wait_for(lambda: len(self._queue) >= self.max_batch, timeout=self.max_delay)
+                lines, self._queue = self._queue, []
+                upto = self._appended
+            if lines:
+                fh = self._handle()
+                start = os.fstat(fh.fileno()).st_size
+                try:
+                    fh.write("".join(lines))
+                    fh.flush()
+                    if self.durability == "fsync":
+                        os.fsync(fh.fileno())
+                except OSError:
+                    self._discard_from(start)
+                    with self._cond:
+                        self._queue[:0] = lines      # not durable: the next leader writes them again
+                    raise
+            with self._cond:
+                self._durable = upto
+                if lines:
+                    self.groups += 1
+                    self.records += len(lines)
+        finally:
+            with self._cond:
+                self._leader = False
+                self._cond.notify_all()
+
+    def _handle(self):
+        if self._fh is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fh = open(self.path, "a")
+            if fcntl is not None:
+                try:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    fh.close()
+                    raise RuntimeError(f"{self.path} is open in another process (one writer per commit log).") from None
+            self._fh = fh
+        return self._fh
+
+    def _discard_from(self, size: int):
+        """Drop a failed group's partial write (best effort; a torn line is skipped on replay anyway)."""
+        fh, self._fh = self._fh, None
+        try:
+            fh.close()                          # may still flush buffered lines: they are cut below
+        except OSError:
+            pass
+        try:
+            os.truncate(self.path, size)
+        except OSError:
+            pass
+
+    def sync(self):
+        """Make every queued record durable (fsync regardless of mode)."""
+        with self._cond:
+            ticket = self._appended
+        while True:
+            with self._cond:
+                if self._durable >= ticket:
+                    break
+                if self._leader:
+                    self._cond.wait()
+                    continue
+                self._leader = True
+            self._lead()
+        if self._fh is not None:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+
+    # ---------- Log file ----------
+    def checkpoint(self):
+        """Every record (written or still queued) has been applied durably elsewhere: start afresh."""
+        with self._cond:
+            while self._leader:
+                self._cond.wait()
+            self._queue = []
+            self._durable = self._appended
+            if self.path.exists() and self.path.stat().st_size:
+                self._handle()                  # truncate only while holding the writer lock
+                os.truncate(self.path, 0)
+            self.close()
+
+    def rotate(self, to: Path):
+        """
+        Sync and move the current log aside (callers stop appending meanwhile).
+        Refuses to replace a `to` that still holds records: apply those first.
+        """
+        to = Path(to)
+        if to.exists() and to.stat().st_size:
+            raise FileExistsError(f"{to} still holds unapplied records.")
+        self.sync()
+        self.close()
+        if self.path.exists():
+            os.replace(self.path, to)
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def stats(self) -> dict:
+        return {"durability": self.durability, "groups": self.groups, "records": self.records,
+                "avg_group": round(self.records / self.groups, 2) if self.groups else 0.0}
+
+
+_LOGS: dict = {}
+
+def get_commit_log(path: Path) -> GroupCommitLog:
+    """One shared commit log per path."""
+    key = str(path)
+    log = _LOGS.get(key)
+    if log is None:
+        log = _LOGS[key] = GroupCommitLog(path)
+    return log
+
+
+# ---------- Benchmark ----------
+def bench(threads: int = 8, per_thread: int = 200):
+    record = {"balances": [[None, {"USD": 1000.0, "AUD": 1500.0}]], "tx": [{"tx_id": "x" * 32}], "audit": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"[Group commit bench] {threads} threads × {per_thread} commits, 1 fsync'd record each")
+
+        path = Path(tmp) / "single.jsonl"
+        lock = threading.Lock()
+        with open(path, "a") as fh:
+            def one_by_one():
+                for _ in range(per_thread):
+                    line = json.dumps(record) + "\n"
+                    with lock:
+                        fh.write(line)
+                        fh.flush()
+                        os.fsync(fh.fileno())
+            t_single = _run_threads(one_by_one, threads)
+
+        results = [("fsync per record", t_single, threads * per_thread)]
+        for durability in ("fsync", "write"):
+            log = GroupCommitLog(Path(tmp) / f"group_{durability}.jsonl", durability, max_delay=0.0)
+            def grouped():
+                for _ in range(per_thread):
+                    log.commit(record)
+            t = _run_threads(grouped, threads)
+            log.close()
+            results.append((f"group commit ({durability})", t, log.records))
+            if durability == "fsync":
+                print(f"  groups: {log.groups} | avg {log.stats()['avg_group']} records per fsync")
+        for name, t, n in results:
+            print(f"  {name:24s} {t * 1e3:9.1f} ms   {n / max(t, 1e-9):>12,.0f} commits/s")
+
+def _run_threads(fn, threads: int) -> float:
+    workers = [threading.Thread(target=fn) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return time.perf_counter() - t0
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] != "bench":
+        print(__doc__.split("Usage")[1].split(":", 1)[1].rstrip())
+        sys.exit(1)
+    bench(*(int(a) for a in args[1:3]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Double-entry ledger journal with periodic snapshots (fx_data/ledger_journal.jsonl)
+
+Every settled conversion is one journal entry whose postings balance per
+currency (integer minor units, see ai/money.py):
+  main (or w:<wallet_id>)  USD  -20000      fx:clearing  USD  +20000
+  fx:clearing              AUD  -30000      main         AUD  +30000
+The first time a wallet appears it gets an "opening" entry against
+equity:opening (from the tx's balances_before); if a wallet's balances were
+changed outside conversions, an "adjustment" entry against equity:adjustment
+records the difference.
+
+Every SNAPSHOT_EVERY entries a compact snapshot of all account balances is
+written to fx_data/ledger_snapshots/ with the journal byte offset it covers,
+so balances now or at any past time/sequence are rebuilt from the nearest
+snapshot plus the journal tail only. A checkpoint (after each flush of the
+simulator/service) also snapshots once CHECKPOINT_SNAPSHOT_AFTER entries
+came since the last one, and start-up snapshots after replaying a longer
+tail, so opening the ledger never replays more than that again.
+
+Usage:
+  python3 ai/ledger.py balances [--at 2025-09-22T10:00:00Z | --seq N] [--wallet ID]
+  python3 ai/ledger.py import [--force]     rebuild the journal from transactions_log
+  python3 ai/ledger.py verify               cross-check the journal against transactions_log
+  python3 ai/ledger.py snapshot             write a snapshot now
+"""
+
+import argparse
+import bisect
+import json
+import os
+from collections import deque
+from pathlib import Path
+
+from log_store import JsonlLog, get_log, iter_jsonl
+from money import from_minor, to_minor
+
+JOURNAL_PATH = Path("fx_data/ledger_journal.jsonl")
+SNAPSHOT_DIR = Path("fx_data/ledger_snapshots")
+TX_LOG_PATH = Path("fx_data/transactions_log.json")
+SNAPSHOT_EVERY = int(os.environ.get("AIVA_LEDGER_SNAPSHOT_EVERY", "10000"))
+CHECKPOINT_SNAPSHOT_AFTER = int(os.environ.get("AIVA_LEDGER_CHECKPOINT_SNAPSHOT", "1000"))
+
+MAIN = "main"                      # the fx_data/balances.json wallet
+CLEARING = "fx:clearing"
+OPENING = "equity:opening"
+ADJUSTMENT = "equity:adjustment"
+_RECENT_TX_IDS = 4096              # duplicate guard for replays (e.g. service journal recovery)
+
+
+def wallet_account(wallet_id: str | None) -> str:
+    return MAIN if wallet_id is None else f"w:{wallet_id}"
+
+def tx_status(tx: dict) -> str:
+    comp = tx.get("compliance")
+    status = comp.get("status") if isinstance(comp, dict) else comp  # early entries: "Clear"
+    return (status or "").lower()
+
+def conversion_postings(tx: dict) -> list:
+    """Balanced postings for one settled tx log record."""
+    src, _, dst = tx["pair"].partition("_")
+    account = wallet_account(tx.get("wallet_id"))
+    a = to_minor(tx["amount_src"], src)
+    r = to_minor(tx["amount_dst"], dst)
+    return [[account, src, -a], [CLEARING, src, a], [CLEARING, dst, -r], [account, dst, r]]
+
+def apply_postings(balances: dict, postings):
+    for account, ccy, minor in postings:
+        acc = balances.get(account)
+        if acc is None:
+            acc = balances[account] = {}
+        acc[ccy] = acc.get(ccy, 0) + minor
+
+def is_balanced(postings) -> bool:
+    net = {}
+    for _, ccy, minor in postings:
+        net[ccy] = net.get(ccy, 0) + minor
+    return not any(net.values())
+
+
+class Ledger:
+    def __init__(self, journal_path: Path = JOURNAL_PATH, snapshot_dir: Path = SNAPSHOT_DIR,
+                 snapshot_every: int = SNAPSHOT_EVERY, checkpoint_snapshot_after: int = CHECKPOINT_SNAPSHOT_AFTER):
+        self.journal_path = Path(journal_path)
+        self.snapshot_dir = Path(snapshot_dir)
+        self.snapshot_every = max(1, snapshot_every)
+        self.checkpoint_snapshot_after = max(1, checkpoint_snapshot_after)
+        self.journal = JsonlLog(self.journal_path)
+        self._load_snapshot_index()
+        self.balances, self.seq, self.last_ts, _ = self._replay(self._snapshots[-1] if self._snapshots else None)
+        if self.seq - self._last_snapshot_seq() >= self.checkpoint_snapshot_after:
+            self.snapshot()      # a long tail was replayed: don't replay it again next time
+        self._recent = deque(maxlen=_RECENT_TX_IDS)
+        for e in self.journal.tail(_RECENT_TX_IDS):
+            if e.get("tx_id"):
+                self._recent.append(e["tx_id"])
+        self._recent_set = set(self._recent)
+
+    # ---------- Snapshots ----------
+    def _index_path(self) -> Path:
+        return self.snapshot_dir / "index.jsonl"
+
+    def _load_snapshot_index(self):
+        size = self.journal_path.stat().st_size if self.journal_path.exists() else 0
+        # snapshots past the end of the journal (journal rewritten/truncated) are ignored
+        self._snapshots = [s for s in iter_jsonl(self._index_path()) if s["offset"] <= size]
+        self._snap_seqs = [s["seq"] for s in self._snapshots]
+        self._snap_ts = [s["ts"] or "" for s in self._snapshots]
+
+    def _last_snapshot_seq(self) -> int:
+        return self._snap_seqs[-1] if self._snap_seqs else 0
+
+    def _read_snapshot(self, meta: dict) -> dict:
+        with open(self.snapshot_dir / meta["file"], "r") as f:
+            return json.load(f)
+
+    def snapshot(self):
+        """Write all balances + the journal offset they cover (file first, then the index line)."""
+        self.journal.flush()
+        offset = self.journal_path.stat().st_size if self.journal_path.exists() else 0
+        meta = {"seq": self.seq, "ts": self.last_ts, "offset": offset, "file": f"{self.seq:012d}.json"}
+        if self._snap_seqs and self._snap_seqs[-1] == self.seq:
+            return
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        path = self.snapshot_dir / meta["file"]
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump({**meta, "balances": self.balances}, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        with open(self._index_path(), "a") as f:
+            f.write(json.dumps(meta) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._snapshots.append(meta)
+        self._snap_seqs.append(meta["seq"])
+        self._snap_ts.append(meta["ts"] or "")
+
+    # ---------- Replay ----------
+    def _replay(self, meta: dict | None, until_seq: int | None = None, until_ts: str | None = None):
+        """Snapshot (or empty) + journal entries after it, stopping past until_seq/until_ts."""
+        if meta is None:
+            balances, seq, ts, offset = {}, 0, None, 0
+        else:
+            snap = self._read_snapshot(meta)
+            balances, seq, ts, offset = snap["balances"], snap["seq"], snap["ts"], snap["offset"]
+        if self.journal_path.exists():
+            self.journal.flush()
+            with open(self.journal_path, "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # torn last line
+                    entry = json.loads(line)
+                    if until_seq is not None and entry["seq"] > until_seq:
+                        break
+                    if until_ts is not None and (entry["ts"] or "") > until_ts:
+                        break
+                    apply_postings(balances, entry["postings"])
+                    seq, ts = entry["seq"], entry["ts"]
+        return balances, seq, ts, offset
+
+    def balances_at(self, ts: str | None = None, seq: int | None = None) -> dict:
+        """All account balances (minor units) as of a timestamp or sequence number (default: now)."""
+        if ts is None and seq is None:
+            return {a: dict(b) for a, b in self.balances.items()}
+        if seq is not None:
+            i = bisect.bisect_right(self._snap_seqs, seq) - 1
+        else:
+            i = bisect.bisect_right(self._snap_ts, ts) - 1
+        return self._replay(self._snapshots[i] if i >= 0 else None, seq, ts)[0]
+
+    # ---------- Posting ----------
+    def _post(self, kind: str, ts: str | None, postings: list, tx_id: str | None = None):
+        if not is_balanced(postings):
+            raise ValueError(f"Unbalanced {kind} entry {tx_id}: {postings}")
+        self.seq += 1
+        self.last_ts = ts
+        entry = {"seq": self.seq, "ts": ts, "kind": kind, "tx_id": tx_id, "postings": postings}
+        apply_postings(self.balances, postings)
+        return entry
+
+    def _reconcile(self, account: str, before: dict, ts: str | None) -> list:
+        """Opening/adjustment entries so `account` matches a tx's balances_before."""
+        entries = []
+        current = self.balances.get(account)
+        if current is None:
+            postings = []
+            for ccy, amt in before.items():
+                m = to_minor(amt, ccy)
+                postings += [[account, ccy, m], [OPENING, ccy, -m]]
+            entries.append(self._post("opening", ts, postings))
+            return entries
+        postings = []
+        for ccy, amt in before.items():
+            diff = to_minor(amt, ccy) - current.get(ccy, 0)
+            if diff:
+                postings += [[account, ccy, diff], [ADJUSTMENT, ccy, -diff]]
+        if postings:
+            entries.append(self._post("adjustment", ts, postings))
+        return entries
+
+    def record_transactions(self, txs) -> int:
+        """
+        Journal settled tx log records (blocked ones move no money and are skipped;
+        tx_ids already journaled recently are skipped too). Returns entries written.
+        A snapshot is taken every snapshot_every entries.
+        """
+        buf, written = [], 0
+        last_snap = self._last_snapshot_seq()
+        for tx in txs:
+            tx_id = tx.get("tx_id")
+            if tx_status(tx) == "blocked" or tx_id in self._recent_set:
+                continue
+            ts = tx.get("timestamp")
+            account = wallet_account(tx.get("wallet_id"))
+            buf += self._reconcile(account, tx.get("balances_before") or {}, ts)
+            buf.append(self._post("conversion", ts, conversion_postings(tx), tx_id))
+            if tx_id:
+                if len(self._recent) == self._recent.maxlen:
+                    self._recent_set.discard(self._recent[0])
+                self._recent.append(tx_id)
+                self._recent_set.add(tx_id)
+            if self.seq - last_snap >= self.snapshot_every:
+                self.journal.append_many(buf)
+                written, buf = written + len(buf), []
+                self.snapshot()
+                last_snap = self.seq
+        self.journal.append_many(buf)
+        return written + len(buf)
+
+    def flush(self):
+        self.journal.flush()
+
+    def checkpoint(self):
+        """fsync the journal; snapshot if checkpoint_snapshot_after entries came since the last snapshot."""
+        self.journal.flush()
+        if self.seq - self._last_snapshot_seq() >= self.checkpoint_snapshot_after:
+            self.snapshot()
+
+    def close(self):
+        self.journal.close()
+
+
+_LEDGERS: dict = {}
+
+def get_ledger(journal_path: Path = JOURNAL_PATH) -> Ledger:
+    """Process-wide ledger per journal path (running balances stay in memory)."""
+    key = str(journal_path)
+    ledger = _LEDGERS.get(key)
+    if ledger is None:
+        ledger = _LEDGERS[key] = Ledger(journal_path)
+    return ledger
+
+
+# ---------- Import / verify ----------
+def rebuild_from_log(tx_log_path: Path = TX_LOG_PATH, journal_path: Path = JOURNAL_PATH,
+                     snapshot_dir: Path = SNAPSHOT_DIR, force: bool = False, batch: int = 10_000) -> Ledger:
+    """Build a fresh journal (+ snapshots) by streaming the whole transactions log."""
+    journal_path, snapshot_dir = Path(journal_path), Path(snapshot_dir)
+    if journal_path.exists() and journal_path.stat().st_size and not force:
+        raise FileExistsError(f"{journal_path} already exists (use --force to rebuild).")
+    journal_path.unlink(missing_ok=True)
+    if snapshot_dir.exists():
+        for p in snapshot_dir.iterdir():
+            p.unlink()
+    ledger = Ledger(journal_path, snapshot_dir)
+    buf = []
+    for tx in get_log(tx_log_path).iter_records():
+        buf.append(tx)
+        if len(buf) >= batch:
+            ledger.record_transactions(buf)
+            buf = []
+    ledger.record_transactions(buf)
+    ledger.flush()
+    return ledger
+
+def verify(tx_log_path: Path = TX_LOG_PATH, journal_path: Path = JOURNAL_PATH) -> dict:
+    """
+    Merge-join the journal and the tx log (both in posting order, constant memory):
+    - every journal entry balances per currency
+    - every settled tx after the journal's first conversion has a conversion entry
+      with the same amounts, and blocked txs have none
+    - after replaying each conversion, the wallet's src/dst balances equal the
+      tx's balances_after
+    """
+    report = {"entries": 0, "unbalanced": 0, "conversions": 0, "matched": 0, "missing": 0,
+              "amount_mismatch": 0, "balance_mismatch": 0, "blocked_journaled": 0, "before_journal": 0,
+              "problems": []}
+    problems = report["problems"]
+
+    def problem(msg):
+        if len(problems) < 20:
+            problems.append(msg)
+
+    entries = iter_jsonl(Path(journal_path))
+    balances = {}
+    pending = None  # next conversion entry not yet matched to a tx
+
+    def next_conversion():
+        for e in entries:
+            report["entries"] += 1
+            if not is_balanced(e["postings"]):
+                report["unbalanced"] += 1
+                problem(f"seq {e['seq']}: unbalanced postings")
+            apply_postings(balances, e["postings"])
+            if e["kind"] == "conversion":
+                report["conversions"] += 1
+                return e
+        return None
+
+    pending = next_conversion()
+    started = False
+    for tx in get_log(tx_log_path).iter_records():
+        settled = tx_status(tx) != "blocked"
+        if pending is not None and tx.get("tx_id") == pending["tx_id"]:
+            started = True
+            if not settled:
+                report["blocked_journaled"] += 1
+                problem(f"tx {tx['tx_id']}: blocked but journaled")
+            elif sorted(map(tuple, pending["postings"])) != sorted(map(tuple, conversion_postings(tx))):
+                report["amount_mismatch"] += 1
+                problem(f"tx {tx['tx_id']}: amounts differ from journal seq {pending['seq']}")
+            else:
+                report["matched"] += 1
+            account = wallet_account(tx.get("wallet_id"))
+            src, _, dst = tx["pair"].partition("_")
+            after = tx.get("balances_after") or {}
+            for ccy in (src, dst):
+                if ccy in after and balances.get(account, {}).get(ccy, 0) != to_minor(after[ccy], ccy):
+                    report["balance_mismatch"] += 1
+                    problem(f"tx {tx['tx_id']}: {account} {ccy} replay "
+                            f"{from_minor(balances.get(account, {}).get(ccy, 0), ccy)} != log {after[ccy]}")
+            pending = next_conversion()
+        elif settled:
+            if started:
+                report["missing"] += 1
+                problem(f"tx {tx.get('tx_id')}: settled but not in the journal")
+            else:
+                report["before_journal"] += 1
+    while pending is not None:
+        report["missing"] += 1
+        problem(f"seq {pending['seq']}: journal conversion {pending['tx_id']} not in the tx log")
+        pending = next_conversion()
+    report["ok"] = not any(report[k] for k in ("unbalanced", "missing", "amount_mismatch",
+                                                 "balance_mismatch", "blocked_journaled"))
+    return report
+
+
+# ---------- CLI ----------
+def _print_balances(balances: dict, wallet_id: str | None, all_accounts: bool):
+    accounts = [wallet_account(wallet_id)] if wallet_id is not None or not all_accounts else sorted(balances)
+    for account in accounts:
+        bal = balances.get(account, {})
+        shown = " | ".join(f"{c} {from_minor(m, c):,.2f}" for c, m in sorted(bal.items())) or "-"
+        print(f"  {account:20s} {shown}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Double-entry ledger journal + snapshots")
+    ap.add_argument("cmd", choices=("balances", "import", "verify", "snapshot"))
+    ap.add_argument("--at", help="point in time (ISO timestamp, e.g. 2025-09-22T10:00:00Z)")
+    ap.add_argument("--seq", type=int, help="point in time as a journal sequence number")
+    ap.add_argument("--wallet", help="wallet id (default: the balances.json wallet)")
+    ap.add_argument("--all", action="store_true", help="show every account")
+    ap.add_argument("--force", action="store_true")
+    args = ap.parse_args()
+
+    if args.cmd == "import":
+        try:
+            ledger = rebuild_from_log(force=args.force)
+        except FileExistsError as e:
+            print(e)
+            raise SystemExit(1)
+        print(f"[Ledger] Journaled {ledger.seq} entries, {len(ledger._snapshots)} snapshots → {JOURNAL_PATH}")
+    elif args.cmd == "verify":
+        rep = verify()
+        print(f"[Ledger verify] {'OK' if rep['ok'] else 'FAILED'} | entries {rep['entries']} | "
+              f"conversions {rep['conversions']} | matched {rep['matched']} | missing {rep['missing']} | "
+              f"amount mismatches {rep['amount_mismatch']} | balance mismatches {rep['balance_mismatch']} | "
+              f"unbalanced {rep['unbalanced']} | settled before journal start {rep['before_journal']}")
+        for p in rep["problems"]:
+            print(f"  - {p}")
+        raise SystemExit(0 if rep["ok"] else 1)
+    elif args.cmd == "snapshot":
+        ledger = get_ledger()
+        ledger.snapshot()
+        print(f"[Ledger] Snapshot at seq {ledger.seq} ({ledger.last_ts})")
+    else:
+        ledger = get_ledger()
+        balances = ledger.balances_at(ts=args.at, seq=args.seq)
+        when = args.at or (f"seq {args.seq}" if args.seq is not None else f"now (seq {ledger.seq})")
+        print(f"[Ledger] Balances as of {when}")
+        _print_balances(balances, args.wallet, args.all)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Log storage backends for fx_data/transactions_log.json and fx_data/audit_log.json
+
+Two on-disk formats:
+- "json":  the original pretty-printed JSON array (load all, append, rewrite)
+- "jsonl": one JSON record per line, O(1) appends, fsync'd in batches
+
+Backend choice (per log path):
+  1. explicit `backend=` argument
+  2. AIVA_LOG_BACKEND env var ("json" | "jsonl")
+  3. "jsonl" if the .jsonl sibling already exists (i.e. after migrating), else "json"
+
+Usage (one-shot migration of the current array files):
+  python3 ai/log_store.py migrate fx_data/transactions_log.json
+  python3 ai/log_store.py migrate fx_data/audit_log.json
+"""
+
+import atexit
+import json
+import os
+import sys
+from pathlib import Path
+
+DEFAULT_FSYNC_EVERY = int(os.environ.get("AIVA_LOG_FSYNC_EVERY", "64"))
+_CHUNK = 64 * 1024
+
+
+# ---------- Streaming readers ----------
+def iter_json_array(path: Path, chunk_size: int = _CHUNK):
+    """
+    Yield records from a JSON array file one at a time, without loading
+    the whole array (raw_decode over a sliding buffer).
+    Missing/empty files yield nothing.
+    """
+    path = Path(path)
+    if not path.exists():
+        return
+    decoder = json.JSONDecoder()
+    with open(path, "r") as f:
+        buf = f.read(chunk_size).lstrip()
+        if not buf.startswith("["):
+            return
+        buf = buf[1:]
+        eof = False
+        while True:
+            buf = buf.lstrip().lstrip(",").lstrip()
+            if buf.startswith("]"):
+                return
+            if not buf and eof:
+                return
+            try:
+                obj, end = decoder.raw_decode(buf)
+            except json.JSONDecodeError:
+                if eof:
+                    return  # truncated/invalid tail → stop like load_json's default
+                more = f.read(chunk_size)
+                eof = not more
+                buf += more
+                continue
+            yield obj
+            buf = buf[end:]
+            if len(buf) < chunk_size and not eof:
+                more = f.read(chunk_size)
+                eof = not more
+                buf += more
+
+
+def iter_jsonl(path: Path):
+    """Yield records from a line-delimited JSON file, skipping blank/partial lines."""
+    path = Path(path)
+    if not path.exists():
+        return
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line after a crash
+
+
+def tail_jsonl(path: Path, n: int, block_size: int = 8192) -> list:
+    """Return the last n records of a JSONL file by reading backwards from EOF."""
+    path = Path(path)
+    if n <= 0 or not path.exists():
+        return []
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b""
+        while pos > 0 and data.count(b"\n") <= n:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    out = []
+    for line in data.splitlines()[-(n + 1):]:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            out.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue  # first (partial) line of the window, or a torn write
+    return out[-n:]
+
+
+# ---------- Atomic writes ----------
+def atomic_write_json(path: Path, data, indent: int | None = 2, fsync: bool = True):
+    """
+    Replace `path` with `data` as JSON all at once: write a temp file in the
+    same directory, fsync it, rename it over the target, fsync the directory.
+    Readers (and a crash) see either the old file or the new one, never a mix.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=indent)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+    if fsync:
+        fd = os.open(path.parent, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+# ---------- Backends ----------
+class JsonArrayLog:
+    """Original format: whole-file JSON array, rewritten (atomically) on every append."""
+
+    backend = "json"
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def _load(self) -> list:
+        if not self.path.exists():
+            return []
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except json.JSONDecodeError:
+            return []
+        return data if isinstance(data, list) else []
+
+    def append(self, record: dict):
+        self.append_many([record])
+
+    def append_many(self, records: list):
+        if not records:
+            return
+        log = self._load()
+        log.extend(records)
+        atomic_write_json(self.path, log)
+
+    def iter_records(self):
+        return iter_json_array(self.path)
+
+    def tail(self, n: int) -> list:
+        return self._load()[-n:] if n > 0 else []
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class JsonlLog:
+    """
+    Append-only, one record per line. The file handle stays open and is
+    fsync'd every `fsync_every` records (and on flush/close/exit), so a
+    crash can lose at most the last unsynced batch — never earlier records.
+    """
+
+    backend = "jsonl"
+
+    def __init__(self, path: Path, fsync_every: int = DEFAULT_FSYNC_EVERY):
+        self.path = Path(path)
+        self.fsync_every = max(1, int(fsync_every))
+        self._fh = None
+        self._unsynced = 0
+
+    def _handle(self):
+        if self._fh is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fh = open(self.path, "a")
+            atexit.register(self.close)
+        return self._fh
+
+    def append(self, record: dict):
+        self.append_many([record])
+
+    def append_many(self, records: list):
+        if not records:
+            return
+        fh = self._handle()
+        fh.write("".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records))
+        fh.flush()
+        self._unsynced += len(records)
+        if self._unsynced >= self.fsync_every:
+            self._sync()
+
+    def _sync(self):
+        if self._fh is not None and self._unsynced:
+            os.fsync(self._fh.fileno())
+            self._unsynced = 0
+
+    def iter_records(self):
+        if self._fh is not None:
+            self._fh.flush()
+        return iter_jsonl(self.path)
+
+    def tail(self, n: int) -> list:
+        if self._fh is not None:
+            self._fh.flush()
+        return tail_jsonl(self.path, n)
+
+    def flush(self):
+        self._sync()
+
+    def close(self):
+        if self._fh is not None:
+            self._sync()
+            self._fh.close()
+            self._fh = None
+
+
+BACKENDS = {"json": JsonArrayLog, "jsonl": JsonlLog}
+
+
+def jsonl_path_for(path: Path) -> Path:
+    return Path(path).with_suffix(".jsonl")
+
+
+def open_log(path: Path, backend: str | None = None):
+    """Build a log backend for `path` (see module docstring for how the backend is chosen)."""
+    path = Path(path)
+    if path.suffix == ".jsonl":
+        backend = backend or "jsonl"
+    backend = backend or os.environ.get("AIVA_LOG_BACKEND")
+    if backend is None:
+        backend = "jsonl" if jsonl_path_for(path).exists() else "json"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown log backend {backend!r}. Use one of {sorted(BACKENDS)}.")
+    if backend == "jsonl" and path.suffix != ".jsonl":
+        path = jsonl_path_for(path)
+    return BACKENDS[backend](path)
+
+
+_OPEN_LOGS: dict = {}
+
+def get_log(path: Path):
+    """Process-wide log instance per path (keeps one JSONL handle open per file)."""
+    key = str(path)
+    log = _OPEN_LOGS.get(key)
+    if log is None:
+        log = _OPEN_LOGS[key] = open_log(path)
+    return log
+
+def reset_logs():
+    """Close and forget cached logs (e.g. after a migration or path change)."""
+    for log in _OPEN_LOGS.values():
+        log.close()
+    _OPEN_LOGS.clear()
+
+
+# ---------- Migration ----------
+def migrate_json_array(src: Path, dst: Path | None = None, force: bool = False) -> int:
+    """
+    Stream a JSON array log into JSONL (written to a temp file, fsync'd,
+    then renamed into place). The source file is left untouched.
+    Returns the number of records migrated.
+    """
+    src = Path(src)
+    dst = Path(dst) if dst else jsonl_path_for(src)
+    if dst.exists() and not force:
+        raise FileExistsError(f"{dst} already exists (use --force to overwrite).")
+    tmp = dst.with_name(dst.name + ".tmp")
+    n = 0
+    with open(tmp, "w") as out:
+        for rec in iter_json_array(src):
+            out.write(json.dumps(rec, separators=(",", ":")) + "\n")
+            n += 1
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp, dst)
+    return n
+
+
+# ---------- CLI ----------
+def main():
+    args = sys.argv[1:]
+    force = "--force" in args
+    args = [a for a in args if a != "--force"]
+    if len(args) < 2 or args[0] != "migrate":
+        print("Usage: python3 ai/log_store.py migrate <LOG.json> [<OUT.jsonl>] [--force]")
+        print("Example: python3 ai/log_store.py migrate fx_data/transactions_log.json")
+        sys.exit(1)
+
+    src = Path(args[1])
+    dst = Path(args[2]) if len(args) > 2 else None
+    try:
+        n = migrate_json_array(src, dst, force=force)
+    except FileExistsError as e:
+        print(e)
+        sys.exit(1)
+    print(f"Migrated {n} records: {src} → {dst or jsonl_path_for(src)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Stage timings and counters for the conversion pipeline.
+
+Off by default. Turn on with AIVA_METRICS=1 (or metrics.enable(), or the
+--metrics flag of fx_conversion_sim); when off, a timed stage costs one flag
+check. When on, every stage records a latency histogram (fixed log-spaced
+buckets, so recording is O(log buckets) with no allocation) and code can bump
+counters such as bytes read/written or log bytes scanned.
+
+Export:
+- snapshot() → dict (JSON), to_prometheus() → text exposition format
+- write(path): .json or .prom by suffix; AIVA_METRICS_OUT=<path> writes at exit
+- profiled(path): cProfile one run into a .prof file (+ top functions on stdout)
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+ENABLED = os.environ.get("AIVA_METRICS", "") not in ("", "0")
+METRICS_OUT = os.environ.get("AIVA_METRICS_OUT")
+
+# Upper bounds in seconds: 1 µs … ~10 s, 4 buckets per decade
+BUCKETS = tuple(round(10 ** (e / 4) * 1e-6, 12) for e in range(0, 29))
+
+_lock = threading.Lock()
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)   # last bucket: +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (max for the +Inf bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum_s": self.sum,
+            "mean_us": self.sum / self.count * 1e6 if self.count else 0.0,
+            "min_us": self.min * 1e6 if self.count else 0.0,
+            "max_us": self.max * 1e6,
+            "p50_us": self.quantile(0.50) * 1e6,
+            "p95_us": self.quantile(0.95) * 1e6,
+            "p99_us": self.quantile(0.99) * 1e6,
+        }
+
+
+_stages: dict = {}     # stage -> Histogram
+_counters: dict = {}   # name -> number
+
+
+def enable(on: bool = True):
+    global ENABLED
+    ENABLED = on
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+
+# ---------- Recording ----------
+def observe(stage: str, seconds: float):
+    with _lock:
+        hist = _stages.get(stage)
+        if hist is None:
+            hist = _stages[stage] = Histogram()
+        hist.observe(seconds)
+
+def count(name: str, n: float = 1):
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+def count_file(name: str, path) -> int:
+    """Add a file's size to counter `name` (e.g. bytes read / log bytes scanned)."""
+    if not ENABLED:
+        return 0
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return 0
+    count(name, size)
+    return size
+
+
+class _Stage:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+class _NoStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name: str):
+    """with stage("get_rate"): ...  — timed only while metrics are enabled."""
+    return _Stage(name) if ENABLED else _NO_STAGE
+
+def timed(name: str):
+    """Decorator form of stage()."""
+    def wrap(fn):
+        @wraps(fn)
+        def inner(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - t0)
+        return inner
+    return wrap
+
+
+# ---------- Export ----------
+def snapshot() -> dict:
+    with _lock:
+        return {
+            "stages": {k: h.to_dict() for k, h in sorted(_stages.items())},
+            "counters": dict(sorted(_counters.items())),
+        }
+
+def _metric_name(name: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in name)
+
+def to_prometheus(prefix: str = "aiva") -> str:
+    """Prometheus text format: one histogram per stage (label stage=...), one counter per name."""
+    lines = [f"# HELP {prefix}_stage_seconds Conversion pipeline stage latency",
+             f"# TYPE {prefix}_stage_seconds histogram"]
+    with _lock:
+        stages = sorted(_stages.items())
+        counters = sorted(_counters.items())
+    for name, h in stages:
+        cum = 0
+        for bound, c in zip(BUCKETS + (float("inf"),), h.counts):
+            cum += c
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{le}"}} {cum}')
+        lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {h.sum!r}')
+        lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {h.count}')
+    for name, value in counters:
+        metric = f"{prefix}_{_metric_name(name)}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+def write(path):
+    """Write the current metrics to `path` (.prom → Prometheus text, otherwise JSON)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    text = to_prometheus() if path.suffix == ".prom" else json.dumps(snapshot(), indent=2)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+def report(top: int = 20) -> str:
+    """Human summary: stages by total time."""
+    snap = snapshot()
+    rows = sorted(snap["stages"].items(), key=lambda kv: -kv[1]["sum_s"])[:top]
+    out = [f"{'stage':34s} {'count':>8s} {'total ms':>10s} {'mean µs':>10s} {'p95 µs':>10s} {'p99 µs':>10s}"]
+    for name, s in rows:
+        out.append(f"{name:34s} {s['count']:8d} {s['sum_s'] * 1e3:10.2f} {s['mean_us']:10.1f} "
+                   f"{s['p95_us']:10.1f} {s['p99_us']:10.1f}")
+    for name, value in snap["counters"].items():
+        out.append(f"{name:34s} {value:,}")
+    return "\n".join(out)
+
+
+@contextmanager
+def profiled(path=None, top: int = 20):
+    """cProfile the block; dump stats to `path` (if given) and print the top functions."""
+    import cProfile
+    import pstats
+
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield prof
+    finally:
+        prof.disable()
+        if path:
+            prof.dump_stats(str(path))
+        pstats.Stats(prof).sort_stats("cumulative").print_stats(top)
+
+
+def _write_at_exit():
+    if ENABLED and METRICS_OUT:
+        write(METRICS_OUT)
+
+atexit.register(_write_at_exit)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Integer minor-unit money core
+
+Amounts are held as integer minor units (cents for USD/EUR/AUD) and rates as
+integers scaled by 10**RATE_DECIMALS, so pricing and balance updates are
+exact integer arithmetic; the one rounding step (rate × amount back to minor
+units) follows a configurable policy:
+  half_even (default, banker's) | half_up (half away from zero) | down (toward zero) | up (away from zero)
+Set it with AIVA_ROUNDING=<policy> or set_rounding().
+
+Floats only appear at the edges (JSON balances/logs): to_minor() snaps a
+float to minor units and from_minor() returns the nearest float of the exact
+decimal, so stored values never accumulate float drift.
+
+convert_many() / replay_many() are the int64 NumPy batch paths for bulk replays.
+
+Usage (benchmark: float path vs integer path vs int64 batch):
+  python3 ai/money.py bench [N]
+"""
+
+import os
+import sys
+import time
+from decimal import ROUND_DOWN, ROUND_HALF_EVEN, ROUND_HALF_UP, ROUND_UP, Decimal
+
+RATE_DECIMALS = 8
+RATE_SCALE = 10 ** RATE_DECIMALS
+DEFAULT_MINOR_DIGITS = 2
+MINOR_DIGITS = {"USD": 2, "EUR": 2, "AUD": 2, "JPY": 0}
+
+POLICIES = {"half_even": ROUND_HALF_EVEN, "half_up": ROUND_HALF_UP, "down": ROUND_DOWN, "up": ROUND_UP}
+ROUNDING = os.environ.get("AIVA_ROUNDING", "half_even")
+if ROUNDING not in POLICIES:
+    raise ValueError(f"Unknown AIVA_ROUNDING {ROUNDING!r}. Use one of {sorted(POLICIES)}.")
+
+
+def set_rounding(policy: str):
+    global ROUNDING
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown rounding policy {policy!r}. Use one of {sorted(POLICIES)}.")
+    ROUNDING = policy
+
+def digits(ccy: str | None) -> int:
+    return MINOR_DIGITS.get(ccy, DEFAULT_MINOR_DIGITS)
+
+
+# ---------- Integer rounding ----------
+def div_round(num: int, den: int, policy: str | None = None) -> int:
+    """num / den rounded to an integer under `policy` (den > 0), exactly."""
+    policy = policy or ROUNDING
+    q, r = divmod(num, den)        # floor division, 0 <= r < den
+    if not r:
+        return q
+    if policy == "half_even":
+        twice = 2 * r
+        return q + 1 if twice > den or (twice == den and q & 1) else q
+    if policy == "half_up":
+        twice = 2 * r
+        return q + 1 if twice > den or (twice == den and num > 0) else q
+    if policy == "down":
+        return q + 1 if num < 0 else q
+    if policy == "up":
+        return q + 1 if num > 0 else q
+    raise ValueError(f"Unknown rounding policy {policy!r}.")
+
+
+# ---------- Float edges ----------
+def to_minor(amount: float, ccy: str | None = None, policy: str | None = None) -> int:
+    """
+    Float amount → integer minor units. Values that are already whole minor
+    units (anything parsed from JSON or a 2 dp input) take the fast path;
+    sub-minor inputs are rounded exactly from their decimal repr under `policy`.
+    """
+    scale = 10 ** digits(ccy)
+    scaled = amount * scale
+    n = round(scaled)
+    if abs(scaled - n) < 1e-6:
+        return int(n)
+    q = Decimal(repr(amount)).scaleb(digits(ccy)).quantize(Decimal(1), rounding=POLICIES[policy or ROUNDING])
+    return int(q)
+
+def from_minor(n: int, ccy: str | None = None) -> float:
+    """Nearest float to the exact decimal amount (what round(x, 2) would print)."""
+    d = digits(ccy)
+    return n / (10 ** d) if d else float(n)
+
+def quantize(amount: float, ccy: str | None = None) -> float:
+    """Round a float amount to the currency's minor units under the rounding policy."""
+    return from_minor(to_minor(amount, ccy), ccy)
+
+def rate_units(rate: float) -> int:
+    """Rate as an integer scaled by RATE_SCALE."""
+    return int(round(rate * RATE_SCALE))
+
+
+# ---------- Pricing ----------
+def convert_minor(amount_minor: int, rate: float | int, src: str | None = None, dst: str | None = None,
+                  policy: str | None = None) -> int:
+    """
+    Exact dst minor units for `amount_minor` src minor units at `rate`
+    (a float, or already-scaled integer rate units), rounded once.
+    """
+    units = rate if isinstance(rate, int) else rate_units(rate)
+    shift = digits(dst) - digits(src)
+    num = amount_minor * units * (10 ** shift if shift > 0 else 1)
+    den = RATE_SCALE * (10 ** -shift if shift < 0 else 1)
+    return div_round(num, den, policy)
+
+
+# ---------- int64 batch path (NumPy) ----------
+def _np():
+    import numpy as np
+    return np
+
+def div_round_many(num, den: int, policy: str | None = None):
+    """Vectorized div_round over an int64 array (den > 0)."""
+    np = _np()
+    policy = policy or ROUNDING
+    q, r = np.divmod(num, den)
+    twice = 2 * r
+    if policy == "half_even":
+        bump = (twice > den) | ((twice == den) & (q & 1 == 1))
+    elif policy == "half_up":
+        bump = (twice > den) | ((twice == den) & (num > 0))
+    elif policy == "down":
+        bump = (r != 0) & (num < 0)
+    elif policy == "up":
+        bump = (r != 0) & (num > 0)
+    else:
+        raise ValueError(f"Unknown rounding policy {policy!r}.")
+    return q + bump
+
+def convert_many(amount_minor, rates, policy: str | None = None):
+    """
+    int64 dst minor units for arrays of src minor units and integer rate units
+    (same minor digits on both sides, as for USD/EUR/AUD). Raises OverflowError
+    if a product would not fit in int64 (use convert_minor for those).
+    """
+    np = _np()
+    amount_minor = np.asarray(amount_minor, dtype=np.int64)
+    rates = np.asarray(rates, dtype=np.int64)
+    limit = np.iinfo(np.int64).max // np.maximum(np.abs(rates), 1)
+    if np.any(np.abs(amount_minor) > limit):
+        raise OverflowError("amount × rate exceeds int64; use convert_minor() for these rows.")
+    return div_round_many(amount_minor * rates, RATE_SCALE, policy)
+
+def replay_many(balances_minor, src_idx, dst_idx, amount_minor, rates, settled=None,
+                policy: str | None = None):
+    """
+    Bulk replay: apply conversions (currency indexes into balances_minor) and
+    return (final balances int64, received minor units per row). Rows with
+    settled=False (blocked) leave balances unchanged.
+    """
+    np = _np()
+    received = convert_many(amount_minor, rates, policy)
+    out = np.array(balances_minor, dtype=np.int64, copy=True)
+    debit = np.asarray(amount_minor, dtype=np.int64)
+    credit = received
+    if settled is not None:
+        settled = np.asarray(settled, dtype=bool)
+        debit, credit = np.where(settled, debit, 0), np.where(settled, received, 0)
+    np.subtract.at(out, np.asarray(src_idx), debit)
+    np.add.at(out, np.asarray(dst_idx), credit)
+    return out, received
+
+
+# ---------- Benchmark ----------
+def bench(n: int = 200_000):
+    """Float path vs integer path vs int64 batch over the same n conversions."""
+    import random
+    rng = random.Random(42)
+    amounts = [round(rng.uniform(1, 5000), 2) for _ in range(n)]
+    rates = [rng.choice((1.52, 1.66, 0.657895, 1.092105, 0.915663, 0.60241)) * rng.uniform(0.99, 1.01)
+             for _ in range(n)]
+
+    t0 = time.perf_counter()
+    bal_src = bal_dst = 1e9
+    for a, r in zip(amounts, rates):
+        received = round(a * r, 2)
+        bal_src = round(bal_src - a, 2)
+        bal_dst = round(bal_dst + received, 2)
+    t_float = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    m_src = m_dst = to_minor(1e9)
+    for a, r in zip(amounts, rates):
+        a_minor = to_minor(a)
+        received = convert_minor(a_minor, r)
+        m_src -= a_minor
+        m_dst += received
+    t_int = time.perf_counter() - t0
+
+    np = _np()
+    a_arr = np.array([to_minor(a) for a in amounts], dtype=np.int64)
+    r_arr = np.array([rate_units(r) for r in rates], dtype=np.int64)
+    t0 = time.perf_counter()
+    final, _ = replay_many(np.full(2, to_minor(1e9), dtype=np.int64), np.zeros(n, dtype=np.intp),
+                           np.ones(n, dtype=np.intp), a_arr, r_arr)
+    t_batch = time.perf_counter() - t0
+
+    print(f"[Money bench] {n:,} conversions | rounding {ROUNDING}")
+    for name, t in (("float round()", t_float), ("integer minor units", t_int), ("int64 batch", t_batch)):
+        print(f"  {name:22s} {t * 1e3:9.1f} ms   {n / max(t, 1e-9):>14,.0f} conv/s")
+    print(f"  float drift vs exact: src {bal_src - from_minor(m_src):+.6f} | dst {bal_dst - from_minor(m_dst):+.6f}")
+    assert int(final[0]) == m_src and int(final[1]) == m_dst, "batch replay disagrees with scalar path"
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] != "bench":
+        print(__doc__.split("Usage")[1].split(":", 1)[1].rstrip())
+        sys.exit(1)
+    bench(int(args[1]) if len(args) > 1 else 200_000)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Cross-rate engine for one FX day.
+
+Given the quoted pairs for a date (e.g. {"USD_AUD": 1.52, "EUR_AUD": 1.66}),
+build once a dense N×N matrix of rates between every currency reachable
+through the quotes:
+- direct quotes are used as-is, their inverses derived
+- anything else is triangulated along the shortest path (fewest hops),
+  through whichever pivot currencies connect the two sides (AUD today)
+
+Lookups are then O(1), and matrices are memoized per fx date.
+"""
+
+from array import array
+from collections import OrderedDict, deque
+
+MAX_CACHED_DATES = 64
+
+
+def parse_quotes(day_rates: dict) -> dict:
+    """Keep only usable "BASE_QUOTE": rate entries (skips e.g. a "date" column)."""
+    quotes = {}
+    for key, val in day_rates.items():
+        parts = key.split("_")
+        if len(parts) != 2 or not all(parts) or parts[0] == parts[1]:
+            continue
+        try:
+            rate = float(val)
+        except (TypeError, ValueError):
+            continue
+        if rate > 0:
+            quotes[(parts[0], parts[1])] = rate
+    return quotes
+
+
+class RateMatrix:
+    """Dense rate matrix for one day; rates[i * n + j] = units of j per 1 unit of i (NaN = unreachable)."""
+
+    def __init__(self, day_rates: dict):
+        self.source = dict(day_rates)
+        quotes = parse_quotes(day_rates)
+
+        self.currencies = sorted({c for pair in quotes for c in pair})
+        self.index = {c: i for i, c in enumerate(self.currencies)}
+        n = self.n = len(self.currencies)
+
+        # Edges: (neighbour, quoted rate, inverted?). Inverted edges divide by the
+        # quote rather than multiply by its reciprocal, matching the old AUD crosses.
+        edges = [dict() for _ in range(n)]
+        for (base, quote), rate in quotes.items():
+            b, q = self.index[base], self.index[quote]
+            edges[b][q] = (rate, False)             # direct quote always wins
+            edges[q].setdefault(b, (rate, True))
+
+        self.rates = array("d", [float("nan")]) * (n * n)
+        for src in range(n):
+            self._fill_row(src, edges)
+
+    def _fill_row(self, src: int, edges: list):
+        """BFS from src: first visit is a shortest path; accumulate the rate along it."""
+        row = src * self.n
+        self.rates[row + src] = 1.0
+        seen = {src}
+        todo = deque([src])
+        while todo:
+            cur = todo.popleft()
+            acc = self.rates[row + cur]
+            for nxt in sorted(edges[cur]):
+                if nxt in seen:
+                    continue
+                rate, inverted = edges[cur][nxt]
+                self.rates[row + nxt] = acc / rate if inverted else acc * rate
+                seen.add(nxt)
+                todo.append(nxt)
+
+    def rate(self, src: str, dst: str) -> float | None:
+        i = self.index.get(src)
+        j = self.index.get(dst)
+        if i is None or j is None:
+            return None
+        r = self.rates[i * self.n + j]
+        return None if r != r else r  # NaN → unreachable
+
+    def pairs(self) -> dict:
+        """All reachable "SRC_DST" rates (handy for debugging / exports)."""
+        out = {}
+        for a in self.currencies:
+            for b in self.currencies:
+                r = self.rate(a, b)
+                if a != b and r is not None:
+                    out[f"{a}_{b}"] = r
+        return out
+
+
+_MATRICES: OrderedDict = OrderedDict()
+
+def matrix_for(day_rates: dict, fx_date: str | None = None) -> RateMatrix:
+    """
+    Memoized RateMatrix per fx date (LRU, MAX_CACHED_DATES entries).
+    Without a date, the quotes themselves are the key. A cached matrix is
+    rebuilt if the quotes for its date have changed since it was built.
+    """
+    key = fx_date if fx_date is not None else tuple(sorted(day_rates.items()))
+    m = _MATRICES.get(key)
+    if m is not None and m.source == day_rates:
+        _MATRICES.move_to_end(key)
+        return m
+    m = _MATRICES[key] = RateMatrix(day_rates)
+    if len(_MATRICES) > MAX_CACHED_DATES:
+        _MATRICES.popitem(last=False)
+    return m
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Time-indexed FX rate store + ingestion
+
+Rates are kept as ticks (timestamp, pair, rate) in append-only per-pair
+arrays, so the rate of a pair "as of T" is one binary search, and the whole
+day_rates dict the rate engine needs is O(pairs × log ticks):
+- fx_data/fxrates.json   {"2025-08-01": {"USD_AUD": 1.52, ...}, ...}   (daily, via adapter)
+- mockdata/fxrates.json  [{"date": "2025-08-01", "AUD_USD": 0.68, ...}] (list of rows, via adapter)
+- fx_data/rate_ticks.jsonl  intraday ticks appended by the ingesters below, one per line:
+    {"ts": "2025-08-07T09:30:00Z", "pair": "USD_AUD", "rate": 1.5112}
+
+A day's quotes are stamped at midnight UTC, so pricing "as of 2025-08-03"
+uses that day's rates and any ticks after midnight are only seen by later
+as-of times. The fx date label of a lookup is the newest tick it used
+("2025-08-07" for daily data, an ISO timestamp for intraday ticks);
+conversions log its date part as fx_date_used and an intraday label as
+fx_time_used. A pair whose quote is older than MAX_QUOTE_AGE allows,
+relative to that newest tick, is stale and left out of the rate set.
+
+Ingestion accepts tick lines or whole rows ({"date"|"ts": ..., "USD_AUD": 1.52, ...})
+from files (optionally followed like tail -f) or a local TCP/Unix socket.
+
+Usage:
+  python3 ai/rate_store.py show [--as-of 2025-08-03T12:00]
+  python3 ai/rate_store.py ingest <file.json|file.jsonl> [--follow]
+  python3 ai/rate_store.py serve [--host 127.0.0.1] [--port 8766] [--unix /tmp/aiva-rates.sock]
+  python3 ai/rate_store.py tick USD_AUD 1.5112 [--ts 2025-08-07T09:30:00Z]
+"""
+
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timezone
+from pathlib import Path
+
+from data_cache import cached
+from log_store import get_log, iter_jsonl
+from velocity_index import to_epoch
+
+FX_RATES_PATH = Path("fx_data/fxrates.json")
+RATE_TICKS_PATH = Path("fx_data/rate_ticks.jsonl")
+# How far (seconds) a pair's quote may lag the newest quote in a rate set before it is
+# dropped as stale: per pair, "default" for the others, None for no limit
+MAX_QUOTE_AGE = {"default": 4 * 86400}    # daily quotes across a long weekend
+
+
+def format_ts(t: float) -> str:
+    """Epoch seconds → "YYYY-MM-DD" at midnight, else an ISO UTC timestamp."""
+    dt = datetime.fromtimestamp(t, tz=timezone.utc)
+    if t % 86400 == 0:
+        return dt.strftime("%Y-%m-%d")
+    return dt.isoformat(timespec="microseconds" if t % 1 else "seconds").replace("+00:00", "Z")
+
+
+def parse_as_of(value) -> float | None:
+    """None / "latest" → None (newest rates); else an ISO date or timestamp → epoch seconds."""
+    if value is None or value == "latest":
+        return None
+    t = to_epoch(value)
+    if t is None:
+        raise ValueError(f"Unrecognised as-of time {value!r}; use an ISO date/timestamp or 'latest'.")
+    return t
+
+
+# ---------- Store ----------
+class PairSeries:
+    """Ascending tick times and their rates for one pair."""
+
+    __slots__ = ("times", "rates")
+
+    def __init__(self):
+        self.times = array("d")
+        self.rates = array("d")
+
+    def add(self, t: float, rate: float):
+        if not self.times or t > self.times[-1]:     # in-order tick: plain append
+            self.times.append(t)
+            self.rates.append(rate)
+            return
+        i = bisect_right(self.times, t)
+        if i and self.times[i - 1] == t:              # same timestamp: latest write wins
+            self.rates[i - 1] = rate
+        else:
+            self.times.insert(i, t)
+            self.rates.insert(i, rate)
+
+    def at(self, t: float | None) -> int:
+        """Index of the last tick at or before t (-1 if none)."""
+        if t is None:
+            return len(self.times) - 1
+        return bisect_right(self.times, t) - 1
+
+
+class RateStore:
+    def __init__(self):
+        self.series: dict[str, PairSeries] = {}
+
+    def add(self, t: float, pair: str, rate: float):
+        series = self.series.get(pair)
+        if series is None:
+            series = self.series[pair] = PairSeries()
+        series.add(t, rate)
+
+    def add_many(self, ticks):
+        for t, pair, rate in ticks:
+            self.add(t, pair, rate)
+
+    def __len__(self) -> int:
+        return sum(len(s.times) for s in self.series.values())
+
+    def at(self, pair: str, as_of: float | None = None) -> tuple[float, float] | None:
+        """(tick time, rate) of `pair` as of `as_of` (None = latest)."""
+        series = self.series.get(pair)
+        if series is None:
+            return None
+        i = series.at(as_of)
+        return (series.times[i], series.rates[i]) if i >= 0 else None
+
+    def day_rates(self, as_of: float | None = None, max_age: dict | None = None) -> tuple[str, dict]:
+        """
+        (fx date label, {pair: rate}) with every pair's latest rate at or
+        before `as_of`, leaving out pairs whose quote is older than the newest
+        one by more than max_age allows (default MAX_QUOTE_AGE). The label is
+        the newest tick used, so it identifies the rate set (the rate engine
+        caches one matrix per label).
+        """
+        quotes = {}
+        for pair, series in self.series.items():
+            i = series.at(as_of)
+            if i >= 0:
+                quotes[pair] = (series.times[i], series.rates[i])
+        if not quotes:
+            when = "" if as_of is None else f" as of {format_ts(as_of)}"
+            raise ValueError(f"No FX rates available{when}.")
+        newest = max(t for t, _ in quotes.values())
+        limits = MAX_QUOTE_AGE if max_age is None else max_age
+        rates = {}
+        for pair, (t, rate) in quotes.items():
+            limit = limits.get(pair, limits.get("default"))
+            if limit is None or newest - t <= limit:
+                rates[pair] = rate
+        return format_ts(newest), rates
+
+    def span(self) -> tuple[float, float] | None:
+        times = [s.times for s in self.series.values() if s.times]
+        if not times:
+            return None
+        return min(t[0] for t in times), max(t[-1] for t in times)
+
+
+# ---------- Adapters (source shapes → (epoch, pair, rate) ticks) ----------
+def _pair_items(row: dict):
+    for key, val in row.items():
+        if "_" not in key or isinstance(val, bool):
+            continue
+        try:
+            rate = float(val)
+        except (TypeError, ValueError):
+            continue
+        if rate > 0:
+            yield key, rate
+
+def ticks_from_daily(doc: dict):
+    """fx_data/fxrates.json: {"2025-08-01": {"USD_AUD": 1.52, ...}, ...}"""
+    for date, day in doc.items():
+        t = to_epoch(date)
+        if t is None or not isinstance(day, dict):
+            continue
+        for pair, rate in _pair_items(day):
+            yield t, pair, rate
+
+def ticks_from_record(rec: dict, default_ts: float | None = None):
+    """
+    One tick {"ts", "pair", "rate"} or one row {"date"|"ts": ..., "AUD_USD": 0.68, ...}
+    (mockdata/fxrates.json rows, socket lines). Missing ts → default_ts.
+    """
+    if not isinstance(rec, dict):
+        return
+    stamp = rec.get("ts", rec.get("date"))
+    t = to_epoch(stamp) if stamp is not None else default_ts
+    if t is None:
+        return
+    if "pair" in rec and "rate" in rec:
+        for pair, rate in _pair_items({rec["pair"]: rec["rate"]}):
+            yield t, pair, rate
+        return
+    for pair, rate in _pair_items(rec):
+        yield t, pair, rate
+
+def ticks_from_rows(rows: list):
+    """mockdata/fxrates.json: [{"date": "2025-08-01", "AUD_USD": 0.68, ...}, ...]"""
+    for row in rows:
+        yield from ticks_from_record(row)
+
+def ticks_from_file(path: Path):
+    """Any supported file: a .jsonl of ticks/rows, or a .json dict-of-days / list-of-rows."""
+    path = Path(path)
+    if path.suffix == ".jsonl":
+        for rec in iter_jsonl(path):
+            yield from ticks_from_record(rec)
+        return
+    with open(path, "r") as f:
+        doc = json.load(f)
+    yield from (ticks_from_daily(doc) if isinstance(doc, dict) else ticks_from_rows(doc))
+
+
+def tick_record(t: float, pair: str, rate: float) -> dict:
+    return {"ts": format_ts(t), "pair": pair, "rate": rate}
+
+
+# ---------- Hot store: base file + tick log ----------
+class RateFeed:
+    """
+    The store for one rates file plus the tick log. store() re-reads the base
+    file only when its mtime/size changes, and otherwise only the tick-log
+    lines appended since the last call. `version` goes up whenever either
+    changed what the store holds.
+    """
+
+    def __init__(self, rates_path: Path = FX_RATES_PATH, ticks_path: Path = RATE_TICKS_PATH):
+        self.rates_path = Path(rates_path)
+        self.ticks_path = Path(ticks_path)
+        self._store = None
+        self._stamp = None
+        self._offset = 0
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def store(self) -> RateStore:
+        with self._lock:
+            st = os.stat(self.rates_path)            # missing rates file: FileNotFoundError, as before
+            stamp = (st.st_mtime_ns, st.st_size)
+            if self._store is None or stamp != self._stamp or self._ticks_size() < self._offset:
+                # (tick log truncated/replaced also rebuilds; base file parse is pickle-cached)
+                store = cached(self.rates_path, _base_store, "rate_store")
+                self._store, self._stamp, self._offset = store, stamp, 0
+                self.version += 1
+            self._read_ticks()
+            return self._store
+
+    def _ticks_size(self) -> int:
+        try:
+            return os.path.getsize(self.ticks_path)
+        except OSError:
+            return 0
+
+    def _read_ticks(self):
+        size = self._ticks_size()
+        if size <= self._offset:
+            return
+        with open(self.ticks_path, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read(size - self._offset)
+        end = chunk.rfind(b"\n") + 1                 # complete lines only
+        for line in chunk[:end].splitlines():
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            self._store.add_many(ticks_from_record(rec))
+        if end:
+            self._offset += end
+            self.version += 1
+
+
+def _base_store(path: Path) -> RateStore:
+    store = RateStore()
+    store.add_many(ticks_from_file(path))
+    return store
+
+
+_FEEDS: dict = {}
+
+def get_feed(rates_path: Path = FX_RATES_PATH, ticks_path: Path = RATE_TICKS_PATH) -> RateFeed:
+    """One shared feed per (rates file, tick log)."""
+    key = (str(rates_path), str(ticks_path))
+    feed = _FEEDS.get(key)
+    if feed is None:
+        feed = _FEEDS[key] = RateFeed(rates_path, ticks_path)
+    return feed
+
+
+# ---------- Ingestion ----------
+class Ingester:
+    """Appends ticks to the tick log (and to a live store, if given)."""
+
+    def __init__(self, ticks_path: Path = RATE_TICKS_PATH, store: RateStore | None = None):
+        self.log = get_log(Path(ticks_path))
+        self.store = store
+        self._lock = threading.Lock()
+
+    def ingest(self, records) -> int:
+        """records: ticks or rows (see ticks_from_record); returns the number of ticks stored."""
+        now = time.time()
+        ticks = [tick for rec in records for tick in ticks_from_record(rec, default_ts=now)]
+        if not ticks:
+            return 0
+        with self._lock:
+            self.log.append_many([tick_record(*tick) for tick in ticks])
+            self.log.flush()
+            if self.store is not None:
+                self.store.add_many(ticks)
+        return len(ticks)
+
+    def ingest_file(self, path: Path, follow: bool = False, poll: float = 0.5, batch: int = 1000) -> int:
+        """Load a whole source file; with follow, keep reading lines appended to a .jsonl."""
+        path = Path(path)
+        if path.suffix != ".jsonl":
+            return self.ingest(tick_record(*t) for t in ticks_from_file(path))
+        total, pending = 0, []
+        with open(path, "rb") as f:
+            while True:
+                pos = f.tell()
+                line = f.readline()
+                if line.endswith(b"\n") or (line and not follow):
+                    try:
+                        pending.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        pass
+                    if len(pending) >= batch:
+                        total += self.ingest(pending)
+                        pending = []
+                    continue
+                if line:                                # partial line: wait for the rest
+                    f.seek(pos)
+                total += self.ingest(pending)
+                pending = []
+                if not follow:
+                    return total
+                time.sleep(poll)
+
+
+class _TickHandler(socketserver.StreamRequestHandler):
+    """One JSON tick or row per line; replies "ok <n>" or "error <msg>" per line."""
+
+    def handle(self):
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+                n = self.server.ingester.ingest(rec if isinstance(rec, list) else [rec])
+                reply = f"ok {n}\n"
+            except (json.JSONDecodeError, TypeError, ValueError) as e:
+                reply = f"error {e}\n"
+            self.wfile.write(reply.encode())
+
+
+class _TCPTickServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _UnixTickServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(ingester: Ingester, host: str = "127.0.0.1", port: int = 8766, unix_path: str | None = None):
+    if unix_path:
+        Path(unix_path).unlink(missing_ok=True)
+        server = _UnixTickServer(unix_path, _TickHandler)
+    else:
+        server = _TCPTickServer((host, port), _TickHandler)
+    server.ingester = ingester
+    return server
+
+
+# ---------- CLI ----------
+def main():
+    ap = argparse.ArgumentParser(description="Time-indexed FX rate store and ingestion")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("show")
+    p.add_argument("--as-of", default=None)
+    p = sub.add_parser("ingest")
+    p.add_argument("file")
+    p.add_argument("--follow", action="store_true")
+    p = sub.add_parser("serve")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8766)
+    p.add_argument("--unix")
+    p = sub.add_parser("tick")
+    p.add_argument("pair")
+    p.add_argument("rate", type=float)
+    p.add_argument("--ts", default=None)
+    for p in sub.choices.values():
+        p.add_argument("--rates", default=str(FX_RATES_PATH))
+        p.add_argument("--ticks", default=str(RATE_TICKS_PATH))
+    args = ap.parse_args()
+
+    if args.cmd == "show":
+        try:
+            store = get_feed(Path(args.rates), Path(args.ticks)).store()
+            label, rates = store.day_rates(parse_as_of(args.as_of))
+        except ValueError as e:
+            sys.exit(str(e))
+        lo, hi = store.span()
+        print(f"[Rate store] {len(store):,} ticks × {len(store.series)} pairs ({format_ts(lo)} → {format_ts(hi)})")
+        print(f"As of {args.as_of or 'latest'}: fx date {label}")
+        for pair in sorted(rates):
+            t, _ = store.at(pair, parse_as_of(args.as_of))
+            print(f"- {pair}: {rates[pair]} (tick {format_ts(t)})")
+        return
+
+    ingester = Ingester(Path(args.ticks))
+    if args.cmd == "tick":
+        ts = args.ts or format_ts(time.time())
+        n = ingester.ingest([{"ts": ts, "pair": args.pair.upper(), "rate": args.rate}])
+        print(f"Stored {n} tick → {args.ticks}")
+    elif args.cmd == "ingest":
+        try:
+            n = ingester.ingest_file(Path(args.file), follow=args.follow)
+        except KeyboardInterrupt:
+            n = 0
+        print(f"Stored {n:,} ticks from {args.file} → {args.ticks}")
+    else:
+        server = make_server(ingester, args.host, args.port, args.unix)
+        where = args.unix or f"{args.host}:{args.port}"
+        print(f"[Rate store] Accepting ticks on {where} → {args.ticks}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+if __name__ == "__main__":
+    main()
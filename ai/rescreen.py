@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Bulk rescreening of the transactions log against the current compliance rules
+
+After a change to the sanctions list, thresholds or velocity rules
+(COMPLIANCE_CONFIG / fx_data/compliance_rules.json), re-runs the same
+screen_conversion() that compliance_check uses on every past transaction,
+with velocity reconstructed as of each transaction's own timestamp (the
+transactions logged before it, not the ones before wall-clock now). Only
+the delta is emitted: one "compliance_rescreen" audit event per transaction
+whose status would now differ, carrying its previous status and rules.
+
+The log is streamed once into compact rows (time, pair, amount, wallet,
+status) and cut into time shards screened across a process pool. Each shard
+first replays the transactions of the longest velocity window before it
+(warm-up only, not screened), so its windows are exact at the shard edge.
+Records whose deltas are emitted are read back in a second streaming pass.
+The log is assumed to be in append (time) order, as fx_conversion_sim writes it.
+
+Usage:
+  python3 ai/rescreen.py [--dry-run] [--since 90d|2025-01-01] [--rules fx_data/compliance_rules.example.json]
+                         [--log fx_data/transactions_log.json] [--workers N] [--list N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from audit_query import parse_when
+from compliance_engine import compile_rules
+from fx_conversion_sim import AUDIT_LOG_PATH, COMPLIANCE_CONFIG, RULES, TX_LOG_PATH, build_audit_event
+from log_store import get_log, iter_json_array, iter_jsonl, open_log
+from velocity_index import VelocityIndex, to_epoch
+
+INLINE_BELOW = 20_000      # rows; smaller logs are screened in-process (pool start-up dominates)
+SHARDS_PER_WORKER = 4
+
+
+# ---------- Log rows ----------
+def iter_log(path: Path):
+    path = Path(path)
+    return iter_jsonl(path) if path.suffix == ".jsonl" else iter_json_array(path)
+
+def logged_status(tx: dict) -> tuple[str, list]:
+    """(status, rules) as recorded; old records hold a bare string ("Clear"), unscreened ones nothing."""
+    comp = tx.get("compliance")
+    if isinstance(comp, dict):
+        return (comp.get("status") or "clear").lower(), list(comp.get("rules_triggered") or [])
+    if isinstance(comp, str):
+        return comp.lower(), []
+    return "clear", []
+
+def load_rows(path: Path) -> tuple[list, int]:
+    """
+    One pass over the log → ([(seq, t, pair, amount_src, wallet_id, status), ...], skipped),
+    seq being the record's position in the log. Repeated strings are shared.
+    """
+    rows, skipped, seen = [], 0, {}
+    intern = lambda s: seen.setdefault(s, s)
+    for seq, tx in enumerate(iter_log(path)):
+        if not isinstance(tx, dict):
+            skipped += 1
+            continue
+        t, pair = to_epoch(tx.get("timestamp")), tx.get("pair")
+        if t is None or not pair:
+            skipped += 1          # the velocity index skips these too
+            continue
+        wallet = tx.get("wallet_id")
+        rows.append((seq, t, intern(pair), float(tx.get("amount_src") or 0.0),
+                     intern(wallet) if wallet else None, intern(logged_status(tx)[0])))
+    return rows, skipped
+
+
+# ---------- Shards ----------
+def make_shards(rows: list, start: int, shards: int, warmup_seconds: float) -> list[tuple[int, int, int]]:
+    """
+    Split rows[start:] into `shards` contiguous (warm, lo, hi) ranges:
+    rows[warm:lo] only rebuild velocity, rows[lo:hi] are screened.
+    """
+    n = len(rows) - start
+    if n <= 0:
+        return []
+    size = -(-n // max(1, shards))
+    out = []
+    for lo in range(start, len(rows), size):
+        cutoff = rows[lo][1] - warmup_seconds
+        warm = lo
+        while warm > 0 and rows[warm - 1][1] >= cutoff:
+            warm -= 1
+        out.append((warm, lo, min(lo + size, len(rows))))
+    return out
+
+
+# ---------- Workers ----------
+_W: dict = {}
+
+def _init_worker(rows: list, rules):
+    """Rows and compiled rules once per process (inherited, not pickled, where the pool forks)."""
+    _W.update(rows=rows, rules=rules)
+
+def _screen_shard(shard: tuple[int, int, int]) -> list[tuple]:
+    """[(seq, status, reason, rules_triggered), ...] for the shard's rows whose status changed."""
+    warm, lo, hi = shard
+    rows, rules = _W["rows"], _W["rules"]
+    index = VelocityIndex(rules.velocity_windows)
+    for _, t, pair, amount, wallet, _ in rows[warm:lo]:
+        index.record(t, pair, amount, wallet)
+
+    screen = rules.screen_conversion
+    changed = []
+    for seq, t, pair, amount, wallet, old in rows[lo:hi]:
+        src, _, dst = pair.partition("_")
+        snapshot = None
+
+        def velocity_stats(window_seconds: int, scope: str) -> tuple[int, float]:
+            nonlocal snapshot
+            if snapshot is None:      # as compliance_check: all windows at once, at the tx's own time
+                snapshot = index.window_stats(src, dst, t, wallet)
+            return snapshot[scope, window_seconds]
+
+        comp = screen(amount, src, dst, velocity_stats)
+        if comp["status"] != old:
+            changed.append((seq, comp["status"], comp["reason"], comp["rules_triggered"]))
+        index.record(t, pair, amount, wallet)
+    return changed
+
+
+def rescreen(log_path: Path, rules, since: float | None = None, workers: int | None = None) -> dict:
+    """
+    Screen every transaction (at or after `since`) against `rules`;
+    returns {"changed": {seq: (status, reason, rules)}, "screened", "skipped", "shards"}.
+    """
+    rows, skipped = load_rows(log_path)
+    start = 0
+    if since is not None:
+        start = next((i for i, row in enumerate(rows) if row[1] >= since), len(rows))
+    warmup = max((w for ws in rules.velocity_windows.values() for w in ws), default=0)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(rows) - start < INLINE_BELOW:
+        shards = make_shards(rows, start, 1, warmup)
+        _init_worker(rows, rules)
+        results = [_screen_shard(s) for s in shards]
+    else:
+        shards = make_shards(rows, start, workers * SHARDS_PER_WORKER, warmup)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(rows, rules)) as pool:
+            results = list(pool.map(_screen_shard, shards))
+    changed = {seq: rest for chunk in results for seq, *rest in chunk}
+    return {"changed": changed, "screened": len(rows) - start, "skipped": skipped, "shards": len(shards)}
+
+
+# ---------- Audit delta ----------
+def delta_events(log_path: Path, changed: dict) -> list[dict]:
+    """Second pass: a "compliance_rescreen" audit event for each changed record, in log order."""
+    events = []
+    if not changed:
+        return events
+    for seq, tx in enumerate(iter_log(log_path)):
+        if seq not in changed:
+            continue
+        status, reason, rules = changed[seq]
+        old_status, old_rules = logged_status(tx)
+        ev = build_audit_event(
+            event="compliance_rescreen",
+            tx_id=tx.get("tx_id") or "",
+            pair=tx["pair"],
+            fx_date_used=tx.get("fx_date_used"),
+            rate=tx.get("rate"),
+            amount_src=float(tx.get("amount_src") or 0.0),
+            amount_dst=tx.get("amount_dst"),
+            status=status,
+            reason=reason,
+            rules=rules,
+        )
+        ev["rescreen"] = {"tx_timestamp": tx.get("timestamp"),
+                          "previous_status": old_status, "previous_rules": old_rules}
+        events.append(ev)
+        if len(events) == len(changed):
+            break
+    return events
+
+
+# ---------- CLI ----------
+def main():
+    ap = argparse.ArgumentParser(description="Rescreen the transactions log against the current compliance rules")
+    ap.add_argument("--log", type=Path, help="transactions log (default: fx_data/transactions_log.json[l])")
+    ap.add_argument("--rules", type=Path, help="rule file to screen with (default: the live rule file)")
+    ap.add_argument("--since", type=parse_when, help="only rescreen from here on, e.g. 90d or 2025-01-01 "
+                                                     "(earlier transactions still count towards velocity)")
+    ap.add_argument("--workers", type=int, default=0, help="processes (default: all CPUs)")
+    ap.add_argument("--dry-run", action="store_true", help="report the delta, don't write audit events")
+    ap.add_argument("--list", type=int, default=10, metavar="N", help="print the first N changes")
+    args = ap.parse_args()
+
+    log_path = open_log(args.log).path if args.log else get_log(TX_LOG_PATH).path
+    if args.rules:
+        try:
+            with open(args.rules, "r") as f:
+                rules = compile_rules(json.load(f), COMPLIANCE_CONFIG)
+        except (OSError, json.JSONDecodeError, ValueError) as e:
+            print(f"Cannot use rule file {args.rules}: {e}")
+            sys.exit(1)
+    else:
+        rules = RULES.get()
+
+    t0 = time.perf_counter()
+    res = rescreen(log_path, rules, args.since, args.workers or None)
+    events = delta_events(log_path, res["changed"])
+    elapsed = time.perf_counter() - t0
+
+    print(f"[Rescreen] {res['screened']:,} transactions in {log_path} | {res['shards']} shards | "
+          f"{elapsed:.2f}s ({res['skipped']} records without timestamp/pair skipped)")
+    moves = Counter((ev["rescreen"]["previous_status"], ev["compliance"]["status"]) for ev in events)
+    print(f"Status changes: {len(events):,}")
+    for (old, new), n in sorted(moves.items(), key=lambda kv: -kv[1]):
+        print(f"  {old:8s} → {new:8s} {n:8,d}")
+    for ev in events[:args.list]:
+        print(f"  {ev['rescreen']['tx_timestamp']} {ev['tx_id'][:12]} {ev['pair']:8s} "
+              f"{ev['amount_src']:>12,.2f} {ev['rescreen']['previous_status']} → "
+              f"{ev['compliance']['status']}: {ev['compliance']['reason']}")
+
+    if events and not args.dry_run:
+        log = get_log(AUDIT_LOG_PATH)
+        log.append_many(events)
+        log.flush()
+        print(f"Appended {len(events):,} compliance_rescreen events → {log.path}")
+
+if __name__ == "__main__":
+    main()
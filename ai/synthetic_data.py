@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generators (seeded, reproducible) for benchmarks and load tests
+
+- fxrates   daily (or intraday) random-walk history in the fx_data/fxrates.json shape
+- orders    batch orders for fx_conversion_sim --batch (JSONL)
+- txlog     transaction log records shaped like fx_conversion_sim's tx entries
+- auditlog  audit events matching docs/audit_log_schema.md
+- wallets   wallets in a wallet store (sqlite)
+
+Logs are streamed to disk (JSONL, or a JSON array for .json paths), so
+10^7 records never sit in memory. Their timestamps end at DEFAULT_END unless
+an end is passed (e.g. now, for data that must fall in live velocity windows),
+so the same seed always gives the same records.
+
+Usage:
+  python3 ai/synthetic_data.py fxrates  <DAYS>    --out /tmp/fxrates.json [--seed 7] [--per-day 1]
+  python3 ai/synthetic_data.py orders   <N>       --out /tmp/orders.jsonl [--wallets 0]
+  python3 ai/synthetic_data.py txlog    <N>       --out /tmp/transactions_log.jsonl [--span-seconds 86400]
+                                                  [--end 2025-01-01T00:00:00|now]
+  python3 ai/synthetic_data.py auditlog <N>       --out /tmp/audit_log.jsonl [--end ...]
+  python3 ai/synthetic_data.py wallets  <N>       --out /tmp/wallets.sqlite3
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+PAIRS = ("USD_AUD", "EUR_AUD")
+START_RATES = {"USD_AUD": 1.52, "EUR_AUD": 1.66, "GBP_AUD": 1.95, "JPY_AUD": 0.0102, "NZD_AUD": 0.91}
+CURRENCIES = ("USD", "EUR", "AUD")
+DAILY_VOL = 0.006
+DEFAULT_END = datetime(2025, 1, 1)      # logs end here by default (reproducible)
+
+
+# ---------- FX rates ----------
+def fxrates_history(days: int, pairs=PAIRS, start: str = "2020-01-01", per_day: int = 1,
+                    seed: int = 7, gap_rate: float = 0.0) -> dict:
+    """{date or ISO timestamp: {pair: rate}}: geometric random walk, optional missing quotes."""
+    rng = random.Random(seed)
+    rates = {p: START_RATES.get(p, 1.0) for p in pairs}
+    t0 = datetime.fromisoformat(start)
+    step = timedelta(days=1) / per_day
+    vol = DAILY_VOL / math.sqrt(per_day)
+    out = {}
+    for i in range(days * per_day):
+        when = t0 + step * i
+        key = when.strftime("%Y-%m-%d") if per_day == 1 else when.strftime("%Y-%m-%dT%H:%M:%SZ")
+        day = {}
+        for p in pairs:
+            rates[p] *= math.exp(rng.gauss(0.0, vol))
+            if not gap_rate or rng.random() >= gap_rate:
+                day[p] = round(rates[p], 6)
+        out[key] = day
+    return out
+
+
+# ---------- Orders / logs ----------
+def orders(n: int, seed: int = 7, wallets: int = 0, max_amount: float = 500.0):
+    rng = random.Random(seed)
+    for _ in range(n):
+        src, dst = rng.sample(CURRENCIES, 2)
+        order = {"src": src, "dst": dst, "amount": round(rng.uniform(1.0, max_amount), 2)}
+        if wallets:
+            order["wallet_id"] = f"w{rng.randrange(wallets):07d}"
+        yield order
+
+
+def _timestamps(n: int, rng: random.Random, end: datetime, span_seconds: float):
+    """n ascending ISO timestamps spread over the span ending at `end`."""
+    start = end - timedelta(seconds=span_seconds)
+    step = span_seconds / max(n, 1)
+    for i in range(n):
+        yield (start + timedelta(seconds=i * step + rng.random() * step)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _to_aud(ccy: str) -> float:
+    return 1.0 if ccy == "AUD" else START_RATES.get(f"{ccy}_AUD", 1.0)
+
+
+def _compliance(rng: random.Random, amount: float) -> dict:
+    if amount > 50_000:
+        return {"status": "blocked", "reason": "amount>50,000", "rules_triggered": ["threshold_blocked"]}
+    if amount > 10_000 or rng.random() < 0.05:
+        return {"status": "review", "reason": "amount>10,000" if amount > 10_000 else "velocity >= 3 in 60s",
+                "rules_triggered": ["threshold_review" if amount > 10_000 else "velocity"]}
+    return {"status": "clear", "reason": "OK", "rules_triggered": []}
+
+
+def tx_records(n: int, seed: int = 7, end: datetime | None = None, span_seconds: float = 86_400.0):
+    """Transaction log entries (same fields as fx_conversion_sim writes)."""
+    rng = random.Random(seed)
+    end = end or DEFAULT_END
+    balances = {c: 1e9 for c in CURRENCIES}
+    for ts in _timestamps(n, rng, end, span_seconds):
+        src, dst = rng.sample(CURRENCIES, 2)
+        pair = f"{src}_{dst}"
+        rate = round(_to_aud(src) / _to_aud(dst), 6)
+        amount = round(rng.lognormvariate(5.0, 1.5), 2)
+        comp = _compliance(rng, amount)
+        blocked = comp["status"] == "blocked"
+        before = dict(balances)
+        received = 0.0 if blocked else round(amount * rate, 2)
+        if not blocked:
+            balances[src] = round(balances[src] - amount, 2)
+            balances[dst] = round(balances[dst] + received, 2)
+        kg = round(amount / 1000.0 * 0.5, 3)
+        yield {
+            "tx_id": "%032x" % rng.getrandbits(128),
+            "timestamp": ts,
+            "fx_date_used": ts[:10],
+            "pair": pair,
+            "rate": rate,
+            "amount_src": amount,
+            "amount_dst": received,
+            "balances_before": before,
+            "balances_after": dict(balances),
+            "carbon": {"kg": kg, "badge": "Low" if kg < 0.5 else "Medium" if kg < 2.0 else "High"},
+            "compliance": comp,
+        }
+
+
+def audit_records(n: int, seed: int = 7, end: datetime | None = None, span_seconds: float = 86_400.0):
+    """Audit events (schema 1.0) for synthetic conversions."""
+    sev = {"blocked": "high", "review": "medium", "clear": "low"}
+    for tx in tx_records(n, seed, end, span_seconds):
+        comp = dict(tx["compliance"], severity=sev[tx["compliance"]["status"]])
+        yield {
+            "event_id": "%032x" % (int(tx["tx_id"], 16) ^ 1),
+            "timestamp": tx["timestamp"],
+            "schema": {"name": "aiva.audit", "version": "1.0"},
+            "event": "conversion_attempt",
+            "tx_id": tx["tx_id"],
+            "pair": tx["pair"],
+            "fx_date_used": tx["fx_date_used"],
+            "rate": tx["rate"],
+            "amount_src": tx["amount_src"],
+            "amount_dst": tx["amount_dst"],
+            "compliance": comp,
+            "actor": {"user_id": "synthetic", "session_id": "bench"},
+        }
+
+
+# ---------- Writers ----------
+def write_records(path: Path, records) -> int:
+    """Stream records to `path`: JSONL for .jsonl, else a JSON array. Returns the count."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    n = 0
+    with open(path, "w") as f:
+        if path.suffix == ".jsonl":
+            for r in records:
+                f.write(json.dumps(r, separators=(",", ":")) + "\n")
+                n += 1
+        else:
+            f.write("[")
+            for r in records:
+                f.write((",\n" if n else "\n") + json.dumps(r))
+                n += 1
+            f.write("\n]" if n else "]")
+    return n
+
+
+def write_json(path: Path, data):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def populate_wallets(path: Path, n: int, seed: int = 7, batch: int = 50_000) -> int:
+    """n wallets (w0000000, ...) with random balances, inserted in large transactions."""
+    from wallet_store import WalletStore
+
+    rng = random.Random(seed)
+    store = WalletStore(Path(path))
+    rows = []
+    for i in range(n):
+        for c in CURRENCIES:
+            rows.append((f"w{i:07d}", c, round(rng.uniform(1_000, 100_000), 2)))
+        if len(rows) >= batch * len(CURRENCIES) or i == n - 1:
+            with store.db:
+                store.db.executemany(
+                    "INSERT OR REPLACE INTO balances (wallet_id, currency, amount) VALUES (?, ?, ?)", rows)
+            rows = []
+    store.close()
+    return n
+
+
+# ---------- CLI ----------
+def _end(value: str) -> datetime:
+    return datetime.utcnow() if value == "now" else datetime.fromisoformat(value.rstrip("Z"))
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate synthetic FX data")
+    ap.add_argument("kind", choices=("fxrates", "orders", "txlog", "auditlog", "wallets"))
+    ap.add_argument("n", type=int, help="days (fxrates) or records")
+    ap.add_argument("--out", required=True)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--per-day", type=int, default=1, help="fxrates: quotes per day (intraday)")
+    ap.add_argument("--wallets", type=int, default=0, help="orders: spread over this many wallets")
+    ap.add_argument("--span-seconds", type=float, default=86_400.0, help="logs: time span ending at --end")
+    ap.add_argument("--end", type=_end, default=DEFAULT_END,
+                    help=f"logs: last timestamp, ISO or 'now' (default {DEFAULT_END.isoformat()})")
+    args = ap.parse_args()
+
+    out = Path(args.out)
+    if args.kind == "fxrates":
+        write_json(out, fxrates_history(args.n, per_day=args.per_day, seed=args.seed))
+        n = args.n * args.per_day
+    elif args.kind == "orders":
+        n = write_records(out, orders(args.n, args.seed, args.wallets))
+    elif args.kind == "txlog":
+        n = write_records(out, tx_records(args.n, args.seed, args.end, args.span_seconds))
+    elif args.kind == "auditlog":
+        n = write_records(out, audit_records(args.n, args.seed, args.end, args.span_seconds))
+    else:
+        n = populate_wallets(out, args.n, args.seed)
+    print(f"Wrote {n:,} {args.kind} records → {out}")
+
+if __name__ == "__main__":
+    sys.exit(main())
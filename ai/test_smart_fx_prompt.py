@@ -1,9 +1,7 @@
-import openai
 import json
+import sys
 
-# Load your prompt
-with open("smart_fx_prompt.txt", "r") as f:
-    base_prompt = f.read()
+from fx_advisor import TEMPLATE_PATH, OpenAIBackend, get_template
 
 # Mock FX data (just an example)
 fx_data = {
@@ -12,15 +10,21 @@ fx_data = {
     "dates": ["2025-07-29", "2025-07-30", "2025-07-31", "2025-08-01", "2025-08-02"]
 }
 
-# Insert FX data into prompt
-final_prompt = base_prompt.replace("{{INSERT_JSON_HERE}}", json.dumps(fx_data))
+def build_prompt(data=fx_data, path=TEMPLATE_PATH):
+    # Insert FX data into the (precompiled) prompt template
+    return get_template(path).render(INSERT_JSON_HERE=json.dumps(data))
 
-# Call OpenAI API (replace with your API key)
-openai.api_key = "sk-..."
+def ask_openai(prompt, model="gpt-4"):
+    # Call OpenAI API (set OPENAI_API_KEY); see ai/fx_advisor.py for cached, batched advice
+    return OpenAIBackend(model=model).complete(prompt)
 
-response = openai.ChatCompletion.create(
-    model="gpt-4",
-    messages=[{"role": "user", "content": final_prompt}]
-)
+def main():
+    # --dry-run: print the prompt instead of calling the API
+    final_prompt = build_prompt()
+    if "--dry-run" in sys.argv[1:]:
+        print(final_prompt)
+        return
+    print(ask_openai(final_prompt))
 
-print(response.choices[0].message["content"])
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Multi-window velocity aggregator for compliance checks.
+
+One event series per scope key:
+  "any"  "by_src:USD"  "by_pair:USD_AUD"  "by_wallet:w_123"
+Each series keeps a running count and amount sum for every window the
+rules configure on its scope (e.g. by_pair 60s, by_src 60s + 24h), all
+updated in the same pass when a transaction is recorded. Windows share the
+events (one list per key, sized by the longest window) and expire through
+per-window cursors, so recording is O(windows) and a query is O(1)
+amortized, exact at any volume (no "last 200 records" cap). Sums are kept
+in integer cents, so they never drift.
+
+Persisted as a small sidecar JSON next to the log; the sidecar records the
+log file size and window layout it covers, and is rebuilt by streaming the
+log when stale.
+"""
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+import metrics
+from log_store import iter_json_array, iter_jsonl
+
+SCOPES = ("any", "by_src", "by_pair", "by_wallet")
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch(ts) -> float | None:
+    """ISO string ("...Z" ok) or naive-UTC datetime → epoch seconds; None if unparseable."""
+    if isinstance(ts, str):
+        if ts.endswith("Z"):
+            ts = ts[:-1]
+        try:
+            ts = datetime.fromisoformat(ts)
+        except ValueError:
+            return None
+    if not isinstance(ts, datetime):
+        return None
+    if ts.tzinfo is not None:
+        ts = ts.replace(tzinfo=None) - ts.utcoffset()
+    return (ts - _EPOCH).total_seconds()
+
+
+def scope_key(scope: str, src: str, dst: str, wallet_id: str | None = None) -> str | None:
+    """Series key for a scope; None for by_wallet without a wallet (nothing to count)."""
+    if scope == "any":
+        return "any"
+    if scope == "by_src":
+        return f"by_src:{src}"
+    if scope == "by_pair":
+        return f"by_pair:{src}_{dst}"
+    if scope == "by_wallet":
+        return f"by_wallet:{wallet_id}" if wallet_id else None
+    raise ValueError(f"Unknown velocity scope {scope!r}. Use one of {list(SCOPES)}.")
+
+def normalize_windows(windows) -> dict:
+    """
+    int seconds (one window on any/by_src/by_pair, the original single-rule
+    index) or {scope: [seconds, ...]} → {scope: (ascending seconds, ...)}.
+    """
+    if isinstance(windows, (int, float)):
+        windows = {scope: [windows] for scope in ("any", "by_src", "by_pair")}
+    out = {}
+    for scope, secs in windows.items():
+        scope_key(scope, "", "", "w")        # validates the scope name
+        out[scope] = tuple(sorted({int(w) for w in secs}))
+    return out
+
+
+class _Series:
+    """Events of one scope key, with a cursor + running count/sum (cents) per window."""
+
+    __slots__ = ("windows", "times", "cents", "base", "now", "lo", "count", "total")
+
+    def __init__(self, windows: tuple):
+        self.windows = windows               # ascending: the last window starts earliest
+        self.times: list = []
+        self.cents: list = []
+        self.base = 0                        # absolute index of times[0]
+        self.now = float("-inf")
+        self.lo = [0] * len(windows)         # absolute index of each window's oldest event
+        self.count = [0] * len(windows)
+        self.total = [0] * len(windows)
+
+    def add(self, t: float, cents: int):
+        self.times.append(t)
+        self.cents.append(cents)
+        for i in range(len(self.windows)):
+            self.count[i] += 1
+            self.total[i] += cents
+        self.advance(t)
+
+    def advance(self, now: float):
+        """Expire events older than each window as of `now` (time only moves forward)."""
+        if now <= self.now:
+            return
+        self.now = now
+        times, cents, base = self.times, self.cents, self.base
+        end = base + len(times)
+        for i, window in enumerate(self.windows):
+            cutoff = now - window
+            j, n, total = self.lo[i], self.count[i], self.total[i]
+            while j < end and times[j - base] < cutoff:
+                n -= 1
+                total -= cents[j - base]
+                j += 1
+            self.lo[i], self.count[i], self.total[i] = j, n, total
+        drop = self.lo[-1] - base            # expired for every window
+        if drop and drop * 2 >= len(times):  # compact in amortized O(1)
+            del times[:drop], cents[:drop]
+            self.base += drop
+
+    def live(self) -> tuple[list, list]:
+        """Events still inside the longest window."""
+        start = self.lo[-1] - self.base
+        return self.times[start:], self.cents[start:]
+
+
+class VelocityIndex:
+    def __init__(self, windows):
+        self.windows = normalize_windows(windows)
+        self.window = max((w for ws in self.windows.values() for w in ws), default=0)
+        self.series: dict = {}   # scope key -> _Series
+        self.latest = 0.0
+        self._covered = None
+
+    def covers(self, windows: dict) -> bool:
+        """True if every (scope, window) in {scope: [seconds, ...]} is maintained here."""
+        if windows is self._covered:          # same (compiled rules') layout as last time
+            return True
+        mine = self.windows
+        if all(w in mine.get(scope, ()) for scope, ws in windows.items() for w in ws):
+            self._covered = windows
+            return True
+        return False
+
+    def record(self, ts, pair: str, amount: float = 0.0, wallet_id: str | None = None):
+        """Add one transaction (ts: ISO string / datetime / epoch seconds) to every configured window."""
+        t = ts if isinstance(ts, (int, float)) else to_epoch(ts)
+        if t is None or not pair:
+            return
+        self.latest = max(self.latest, t)
+        src, _, dst = pair.partition("_")
+        cents = round(float(amount or 0.0) * 100)
+        for scope, windows in self.windows.items():
+            key = scope_key(scope, src, dst, wallet_id)
+            if key is None:
+                continue
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = _Series(windows)
+            series.add(t, cents)
+
+    def record_tx(self, tx: dict):
+        """Add a transaction log record."""
+        self.record(tx.get("timestamp"), tx.get("pair", ""), tx.get("amount_src") or 0.0, tx.get("wallet_id"))
+
+    def stats(self, scope: str, src: str, dst: str, window: int, now,
+              wallet_id: str | None = None) -> tuple[int, float]:
+        """(count, amount sum) of transactions within `window` seconds ending at `now` for the scope."""
+        windows = self.windows.get(scope, ())
+        if window not in windows:
+            raise KeyError(f"Velocity window {scope}/{window}s is not maintained by this index.")
+        key = scope_key(scope, src, dst, wallet_id)
+        series = self.series.get(key) if key else None
+        if series is None:
+            return 0, 0.0
+        series.advance(now if isinstance(now, (int, float)) else to_epoch(now))
+        i = windows.index(window)
+        return series.count[i], series.total[i] / 100.0
+
+    def window_stats(self, src: str, dst: str, now: float, wallet_id: str | None = None) -> dict:
+        """
+        {(scope, window): (count, amount sum)} for every maintained window as of `now`
+        (epoch seconds): one expiry pass per scope key, so rules then read it in O(1).
+        """
+        out = {}
+        for scope, windows in self.windows.items():
+            key = scope_key(scope, src, dst, wallet_id)
+            series = self.series.get(key) if key else None
+            if series is None:
+                for w in windows:
+                    out[scope, w] = (0, 0.0)
+                continue
+            series.advance(now)
+            for w, n, cents in zip(windows, series.count, series.total):
+                out[scope, w] = (n, cents / 100.0)
+        return out
+
+    def count(self, scope: str, src: str, dst: str, now, window: int | None = None,
+              wallet_id: str | None = None) -> int:
+        """Transactions within the window ending at `now` (window defaults to the scope's longest)."""
+        if window is None:
+            window = self.windows.get(scope, (0,))[-1]
+        return self.stats(scope, src, dst, window, now, wallet_id)[0]
+
+    def prune(self):
+        """Expire every key against the newest event seen (keeps idle keys from growing the sidecar)."""
+        for key in list(self.series):
+            series = self.series[key]
+            series.advance(self.latest)
+            if not series.count[-1]:
+                del self.series[key]
+
+    # ---------- Persistence ----------
+    @classmethod
+    def rebuild(cls, log_path: Path, windows) -> "VelocityIndex":
+        """Stream the whole tx log once (JSON array or JSONL) and keep only in-window events."""
+        idx = cls(windows)
+        log_path = Path(log_path)
+        metrics.count_file("log_bytes_scanned", log_path)
+        records = iter_jsonl(log_path) if log_path.suffix == ".jsonl" else iter_json_array(log_path)
+        for t in records:
+            if isinstance(t, dict):
+                idx.record_tx(t)
+        return idx
+
+    @classmethod
+    def load_or_rebuild(cls, index_path: Path, log_path: Path, windows) -> "VelocityIndex":
+        """Use the sidecar if it covers exactly the current log file and windows; otherwise rebuild from the log."""
+        index_path, log_path = Path(index_path), Path(log_path)
+        log_size = log_path.stat().st_size if log_path.exists() else 0
+        try:
+            with open(index_path, "r") as f:
+                doc = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            doc = None
+
+        idx = cls(windows)
+        layout = {scope: list(ws) for scope, ws in idx.windows.items()}
+        if (doc and doc.get("windows") == layout
+                and doc.get("log_path") == str(log_path) and doc.get("log_size") == log_size):
+            for key, (times, cents) in doc.get("events", {}).items():
+                series = idx.series[key] = _Series(idx.windows[key.split(":", 1)[0]])
+                for t, c in zip(times, cents):
+                    series.add(t, c)
+            idx.latest = doc.get("latest", 0.0)
+            return idx
+        return cls.rebuild(log_path, windows)
+
+    def save(self, index_path: Path, log_path: Path):
+        """Write the sidecar atomically (temp file + rename), stamped with the log size it covers."""
+        index_path, log_path = Path(index_path), Path(log_path)
+        self.prune()
+        doc = {
+            "windows": {scope: list(ws) for scope, ws in self.windows.items()},
+            "log_path": str(log_path),
+            "log_size": log_path.stat().st_size if log_path.exists() else 0,
+            "latest": self.latest,
+            "events": {k: list(s.live()) for k, s in self.series.items()},
+        }
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = index_path.with_name(index_path.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(doc, f)
+        os.replace(tmp, index_path)
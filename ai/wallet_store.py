@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Multi-wallet balance store (fx_data/wallets.sqlite3)
+
+- One row per (wallet_id, currency) in a WITHOUT ROWID table keyed on both,
+  so reading or updating one wallet is an index lookup, whatever the wallet count
+- In-place updates (UPSERT of the changed currencies only)
+- LRU cache of hot wallets; changed wallets stay pinned in the cache until
+  written back (flush(), or take_dirty() + write_snapshots() once a commit
+  record holding their snapshots is durable), so eviction never writes
+
+Usage:
+  python3 ai/wallet_store.py create <WALLET_ID> [USD=1000 EUR=500 ...]
+  python3 ai/wallet_store.py show <WALLET_ID>
+  python3 ai/wallet_store.py import <WALLET_ID> fx_data/balances.json
+  python3 ai/wallet_store.py count
+"""
+
+import json
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+WALLETS_DB_PATH = Path("fx_data/wallets.sqlite3")
+DEFAULT_CACHE_SIZE = 4096
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS balances (
+    wallet_id TEXT NOT NULL,
+    currency  TEXT NOT NULL,
+    amount    REAL NOT NULL,
+    PRIMARY KEY (wallet_id, currency)
+) WITHOUT ROWID
+"""
+
+
+class WalletStore:
+    def __init__(self, path: Path = WALLETS_DB_PATH, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.path = Path(path)
+        self.cache_size = max(1, cache_size)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(_SCHEMA)
+        self.db.commit()
+        self._cache: OrderedDict = OrderedDict()   # wallet_id -> balances dict (hot wallets)
+        self._clean: dict = {}                      # wallet_id -> balances as last stored
+        self._dirty: set = set()
+        self._writing: dict = {}                    # wallet_id -> snapshots taken, not yet written
+        self._db_lock = threading.Lock()            # writes may run on a flusher thread
+
+    # ---------- Reads ----------
+    def _load(self, wallet_id: str) -> dict | None:
+        with self._db_lock:
+            rows = self.db.execute(
+                "SELECT currency, amount FROM balances WHERE wallet_id = ?", (wallet_id,)
+            ).fetchall()
+        return {c: a for c, a in rows} if rows else None
+
+    def exists(self, wallet_id: str) -> bool:
+        return wallet_id in self._cache or self._load(wallet_id) is not None
+
+    def get(self, wallet_id: str) -> dict:
+        """
+        The cached, mutable balances dict for a wallet (KeyError if unknown).
+        After mutating it, call mark_dirty(wallet_id) so it gets written back.
+        """
+        balances = self._cache.get(wallet_id)
+        if balances is not None:
+            self._cache.move_to_end(wallet_id)
+            return balances
+        balances = self._load(wallet_id)
+        if balances is None:
+            raise KeyError(wallet_id)
+        self._evict(room=1)
+        self._cache[wallet_id] = balances
+        self._clean[wallet_id] = dict(balances)
+        return balances
+
+    def count(self) -> int:
+        self.flush()
+        return self.db.execute("SELECT COUNT(DISTINCT wallet_id) FROM balances").fetchone()[0]
+
+    def iter_wallets(self, batch_size: int = 10_000):
+        """
+        Yield lists of (wallet_id, balances) in wallet_id order, batch_size
+        wallets at a time, streamed off the primary key (not via the cache).
+        """
+        self.flush()
+        batch, wallet_id, balances = [], None, None
+        for wid, ccy, amount in self.db.execute(
+                "SELECT wallet_id, currency, amount FROM balances ORDER BY wallet_id, currency"):
+            if wid != wallet_id:
+                if wallet_id is not None:
+                    batch.append((wallet_id, balances))
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+                wallet_id, balances = wid, {}
+            balances[ccy] = amount
+        if wallet_id is not None:
+            batch.append((wallet_id, balances))
+        if batch:
+            yield batch
+
+    # ---------- Writes ----------
+    def create(self, wallet_id: str, balances: dict):
+        if self.exists(wallet_id):
+            raise ValueError(f"Wallet {wallet_id!r} already exists.")
+        self._evict(room=1)
+        self._cache[wallet_id] = {c: float(a) for c, a in balances.items()}
+        self._clean[wallet_id] = {}
+        self.mark_dirty(wallet_id)
+
+    def put(self, wallet_id: str, balances: dict):
+        """Overwrite a wallet's balances (creating it if needed), e.g. when replaying a journal."""
+        if not self.exists(wallet_id):
+            self.create(wallet_id, balances)
+            return
+        current = self.get(wallet_id)
+        current.clear()
+        current.update({c: float(a) for c, a in balances.items()})
+        self.mark_dirty(wallet_id)
+
+    def mark_dirty(self, wallet_id: str):
+        self._dirty.add(wallet_id)
+
+    def dirty_items(self) -> list:
+        """(wallet_id, balances copy) for every wallet changed since it was last written."""
+        return [(w, dict(self._cache[w])) for w in sorted(self._dirty)]
+
+    def take_dirty(self) -> list:
+        """
+        dirty_items(), handed over for writing: the wallets count as clean for
+        new changes but stay pinned in the cache until write_snapshots() stores them.
+        """
+        items = self.dirty_items()
+        for wallet_id, _ in items:
+            self._writing[wallet_id] = self._writing.get(wallet_id, 0) + 1
+        self._dirty.clear()
+        return items
+
+    def write_snapshots(self, items: list):
+        """UPSERT taken snapshots in one transaction (only the currencies that changed since stored)."""
+        if not items:
+            return
+        rows = []
+        for wallet_id, balances in items:
+            clean = self._clean.get(wallet_id, {})
+            rows += [(wallet_id, c, a) for c, a in balances.items() if clean.get(c) != a]
+        with self._db_lock, self.db:
+            self.db.executemany(
+                "INSERT INTO balances (wallet_id, currency, amount) VALUES (?, ?, ?) "
+                "ON CONFLICT (wallet_id, currency) DO UPDATE SET amount = excluded.amount",
+                rows,
+            )
+        for wallet_id, balances in items:
+            self._clean[wallet_id] = balances
+            n = self._writing.pop(wallet_id, 1) - 1
+            if n > 0:
+                self._writing[wallet_id] = n
+
+    def _evict(self, room: int = 0):
+        """Drop least recently used clean wallets (leaving `room` free); dirty or unwritten ones are pinned."""
+        excess = len(self._cache) + room - self.cache_size
+        if excess <= 0:
+            return
+        victims = []
+        for wallet_id in self._cache:
+            if wallet_id not in self._dirty and wallet_id not in self._writing:
+                victims.append(wallet_id)
+                if len(victims) == excess:
+                    break
+        for wallet_id in victims:
+            self._cache.pop(wallet_id)
+            self._clean.pop(wallet_id, None)
+
+    def flush(self):
+        """Write back every changed wallet in one transaction."""
+        if self._dirty:
+            self.write_snapshots(self.take_dirty())
+        self._evict()
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+
+# ---------- CLI ----------
+def _fmt(balances: dict) -> str:
+    return " | ".join(f"{c} {a:,.2f}" for c, a in sorted(balances.items()))
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] not in ("create", "show", "import", "count"):
+        print(__doc__.split("Usage:")[1].rstrip())
+        sys.exit(1)
+
+    store = WalletStore()
+    cmd = args[0]
+    try:
+        if cmd == "count":
+            print(f"{store.count()} wallets in {store.path}")
+        elif cmd == "show" and len(args) == 2:
+            print(f"{args[1]}: {_fmt(store.get(args[1]))}")
+        elif cmd == "create" and len(args) >= 2:
+            balances = {}
+            for kv in args[2:]:
+                ccy, _, amt = kv.partition("=")
+                balances[ccy.upper()] = float(amt)
+            store.create(args[1], balances or {"USD": 0.0, "EUR": 0.0, "AUD": 0.0})
+            print(f"Created {args[1]}: {_fmt(store.get(args[1]))}")
+        elif cmd == "import" and len(args) == 3:
+            with open(args[2], "r") as f:
+                store.create(args[1], json.load(f))
+            print(f"Imported {args[2]} → {args[1]}: {_fmt(store.get(args[1]))}")
+        else:
+            print(__doc__.split("Usage:")[1].rstrip())
+            sys.exit(1)
+    except KeyError as e:
+        print(f"Unknown wallet {e}")
+        sys.exit(1)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Shared fixtures. The ai/ tools are flat scripts that use repo-relative
+fx_data/ paths, so each test runs in a scratch directory holding a copy of
+the source data files, and the process-wide log/ledger/commit-log caches are
+dropped afterwards.
+"""
+
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "ai"))
+
+# source data only: derived caches (velocity index, journals, wallets db) are rebuilt
+DATA_FILES = ("fxrates.json", "balances.json", "carbon_factors.json", "compliance_rules.json",
+              "transactions_log.json", "audit_log.json")
+
+
+def _reset_caches():
+    import group_commit
+    import ledger
+    import log_store
+
+    log_store.reset_logs()
+    for cache in (ledger._LEDGERS, group_commit._LOGS):
+        for obj in cache.values():
+            obj.close()
+        cache.clear()
+
+
+@pytest.fixture
+def fx_data(tmp_path, monkeypatch):
+    """A scratch copy of fx_data/ as the working directory; yields its path."""
+    data = tmp_path / "fx_data"
+    data.mkdir()
+    for name in DATA_FILES:
+        shutil.copy(ROOT / "fx_data" / name, data / name)
+    monkeypatch.chdir(tmp_path)
+    _reset_caches()
+    yield data
+    _reset_caches()
@@ -0,0 +1,74 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+import binlog
+import fx_conversion_sim as sim
+from log_store import get_log, reset_logs
+
+ORDERS = [
+    {"src": "USD", "dst": "AUD", "amount": 120.0},
+    {"src": "AUD", "dst": "EUR", "amount": 80.5},
+    {"src": "USD", "dst": "AUD", "amount": 60_000.0},     # blocked: still logged
+]
+
+
+@pytest.fixture
+def mirror(fx_data, monkeypatch):
+    monkeypatch.setattr(sim, "BINLOG_MIRROR", True)
+    binlog._BINLOGS.clear()
+    yield
+    binlog._BINLOGS.clear()
+
+
+def _level(log_path) -> bool:
+    """The mirror holds exactly the log's records, in order."""
+    kind = binlog.kind_for(log_path)
+    key = binlog.ID_FIELDS[kind]
+    mirrored = [bytes(i).hex() for i in binlog.get_binlog(log_path).columns()[key]]
+    return mirrored == [r[key] for r in get_log(log_path).iter_records()]
+
+
+def test_first_flush_mirrors_the_whole_log(mirror):
+    sim.simulate_many(ORDERS)
+    assert _level(sim.TX_LOG_PATH) and _level(sim.AUDIT_LOG_PATH)
+    tx = binlog.get_binlog(sim.TX_LOG_PATH).tail(1)[0]
+    assert tx["amount_src"] == 60_000.0 and tx["compliance"]["status"] == "blocked"
+
+
+def test_mirror_catches_up_after_runs_without_it(mirror, monkeypatch):
+    sim.simulate_many(ORDERS[:1])
+    monkeypatch.setattr(sim, "BINLOG_MIRROR", False)
+    sim.simulate_many(ORDERS[1:2])
+    assert not _level(sim.TX_LOG_PATH)
+
+    monkeypatch.setattr(sim, "BINLOG_MIRROR", True)
+    sim.simulate_many(ORDERS[2:])
+    assert _level(sim.TX_LOG_PATH) and _level(sim.AUDIT_LOG_PATH)
+
+
+def test_mirror_errors_do_not_fail_the_flush(mirror, monkeypatch, capsys):
+    real_encode = binlog.encode_tx
+
+    def overflow(tx, interner):
+        raise OverflowError("cannot convert float infinity to integer")
+
+    monkeypatch.setattr(binlog, "encode_tx", overflow)
+    summary = sim.simulate_many(ORDERS[:2])
+    assert summary["settled"] == 2
+    assert "mirror is behind the logs" in capsys.readouterr().err
+    assert sim.BINLOG_MIRROR                                  # not switched off for the process
+
+    monkeypatch.setattr(binlog, "encode_tx", real_encode)
+    sim.simulate_many(ORDERS[2:])
+    assert _level(sim.TX_LOG_PATH)
+
+
+def test_mirror_is_rebuilt_when_its_mark_left_the_log(mirror, fx_data):
+    shipped = (fx_data / "transactions_log.json").read_text()
+    sim.simulate_many(ORDERS)
+    (fx_data / "transactions_log.json").write_text(shipped)  # the mirrored records are gone
+    reset_logs()
+
+    assert binlog.sync_mirror(sim.TX_LOG_PATH) == len(list(get_log(sim.TX_LOG_PATH).iter_records()))
+    assert _level(sim.TX_LOG_PATH)
@@ -0,0 +1,66 @@
+import json
+
+import fx_conversion_sim as sim
+from group_commit import get_commit_log
+from log_store import get_log
+from wallet_store import WALLETS_DB_PATH, WalletStore
+
+
+def _commit(state: dict):
+    """flush_state() up to the durable commit record: the crash happens before apply_effects()."""
+    sim.take_wallet_snapshots(state)
+    get_commit_log(sim.COMMIT_LOG_PATH).commit(sim.commit_record(state))
+
+
+def _tx_ids() -> list:
+    return [tx.get("tx_id") for tx in get_log(sim.TX_LOG_PATH).iter_records()]
+
+
+def test_replay_after_crash_before_apply(fx_data):
+    balances_before = json.loads((fx_data / "balances.json").read_text())
+    logged_before = _tx_ids()
+
+    state = sim.load_state()
+    res = sim.settle(state, "USD", "AUD", 100.0)
+    _commit(state)
+
+    # nothing applied yet
+    assert json.loads((fx_data / "balances.json").read_text()) == balances_before
+    assert _tx_ids() == logged_before
+
+    assert sim.recover_commits() == 1
+    assert json.loads((fx_data / "balances.json").read_text()) == state["balances"]
+    assert _tx_ids() == logged_before + [res["tx_entry"]["tx_id"]]
+    assert get_log(sim.AUDIT_LOG_PATH).tail(1)[0]["tx_id"] == res["tx_entry"]["tx_id"]
+    assert (fx_data / "commit_log.jsonl").stat().st_size == 0
+
+    assert sim.recover_commits() == 0
+    assert _tx_ids() == logged_before + [res["tx_entry"]["tx_id"]]
+
+
+def test_replay_after_crash_mid_apply_is_idempotent(fx_data):
+    state = sim.load_state()
+    res = sim.settle(state, "EUR", "AUD", 50.0)
+    _commit(state)
+    sim.apply_effects(state)     # crash before the checkpoint: the record is replayed over applied effects
+
+    assert sim.recover_commits() == 1
+    assert _tx_ids().count(res["tx_entry"]["tx_id"]) == 1
+    assert json.loads((fx_data / "balances.json").read_text()) == state["balances"]
+
+
+def test_wallet_balances_are_replayed(fx_data):
+    store = WalletStore(WALLETS_DB_PATH)
+    store.create("w_1", {"USD": 500.0})
+    store.flush()
+    store.close()
+
+    state = sim.load_state()
+    sim.settle(state, "USD", "AUD", 200.0, wallet_id="w_1")
+    after = dict(state["wallets"].get("w_1"))
+    _commit(state)
+    state["wallets"].close()
+
+    assert WalletStore(WALLETS_DB_PATH).get("w_1") == {"USD": 500.0}
+    assert sim.recover_commits() == 1
+    assert WalletStore(WALLETS_DB_PATH).get("w_1") == after
@@ -0,0 +1,139 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+import fx_conversion_sim as sim
+from compliance_engine import CompiledRules, RuleBook
+from log_store import get_log
+
+_clock = [1_700_000_000 * 10**9]
+
+
+def _write(path, text: str):
+    """Write the rule file with a fresh mtime, so the RuleBook sees a new version."""
+    path.write_text(text)
+    _clock[0] += 10**9
+    os.utime(path, ns=(_clock[0], _clock[0]))
+
+
+def _rules(review: float, blocked: float) -> str:
+    return json.dumps({"conversion": {"amount_thresholds": {"review": review, "blocked": blocked}}})
+
+
+def test_hot_reload_picks_up_edits(tmp_path):
+    path = tmp_path / "rules.json"
+    _write(path, _rules(100, 500))
+    book = RuleBook(path)
+    first = book.get()
+    assert first.prescreen(200, "USD", "AUD") == "threshold_review"
+    assert book.get() is first                          # unchanged file: no recompile
+
+    _write(path, _rules(100, 150))
+    assert book.get().prescreen(200, "USD", "AUD") == "threshold_blocked"
+
+
+def test_broken_file_at_first_load_fails_closed(tmp_path):
+    path = tmp_path / "rules.json"
+    _write(path, '{"conversion": {"amount_thresholds": ')
+    with pytest.raises(ValueError):
+        RuleBook(path).get()
+
+
+def test_broken_edit_keeps_the_previous_rules(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "rules.json"
+    _write(path, _rules(100, 500))
+    book = RuleBook(path)
+    good = book.get()
+
+    _write(path, _rules(100, 500)[:-3])
+    assert book.get() is good
+    assert "keeping the previous rules" in capsys.readouterr().err
+
+    parses = []
+    real_load = json.load
+    monkeypatch.setattr(json, "load", lambda f: parses.append(f) or real_load(f))
+    assert book.get() is good                           # the broken version is not re-parsed
+    assert parses == []
+
+    _write(path, _rules(100, 150))
+    assert book.get().blocked_above == 150.0
+
+
+def test_simulate_many_rescreens_after_a_mid_chunk_reload(fx_data, monkeypatch):
+    rules_path = fx_data / "compliance_rules.json"
+    doc = json.loads(rules_path.read_text())
+    _write(rules_path, json.dumps(doc))
+    real_settle = sim.settle
+    seen = []
+
+    def settle(*args, **kwargs):
+        res = real_settle(*args, **kwargs)
+        if not seen:                                    # tighten the thresholds after the first order
+            doc["conversion"]["amount_thresholds"] = {"review": 10.0, "blocked": 50.0}
+            _write(rules_path, json.dumps(doc))
+        seen.append(res["compliance"]["status"])
+        return res
+
+    monkeypatch.setattr(sim, "settle", settle)
+    summary = sim.simulate_many([{"src": "USD", "dst": "AUD", "amount": 100.0}] * 3)
+    assert seen == ["clear", "blocked", "blocked"]
+    assert (summary["settled"], summary["blocked"]) == (1, 2)
+
+
+# ---------- Tiered velocity rules ----------
+TIERED = {"conversion": {
+    "amount_thresholds": {"review": 10_000.0, "blocked": 50_000.0},
+    "velocity": {"window_seconds": 60, "min_count": 100, "scope": "by_src"},
+    "velocity_rules": [
+        {"name": "pair_burst_60s", "scope": "by_pair", "window_seconds": 60, "min_count": 3},
+        {"name": "src_sum_24h", "scope": "by_src", "window_seconds": 86400, "sum_above": 9500},
+        {"name": "wallet_hourly", "scope": "by_wallet", "window_seconds": 3600, "min_count": 30,
+         "action": "blocked"},
+    ],
+}}
+
+
+def _screen(amount: float, stats: dict) -> dict:
+    rules = CompiledRules(TIERED)
+    return rules.screen_conversion(amount, "USD", "AUD", lambda window, scope: stats.get((scope, window), (0, 0.0)))
+
+
+def test_sum_rule_counts_the_screened_amount():
+    assert _screen(500.0, {("by_src", 86400): (4, 9000.0)})["status"] == "clear"
+    res = _screen(501.0, {("by_src", 86400): (4, 9000.0)})
+    assert res["status"] == "review"
+    assert res["rules_triggered"] == ["velocity:src_sum_24h"]
+
+
+def test_tiered_hits_escalate():
+    res = _screen(100.0, {("by_pair", 60): (3, 300.0), ("by_src", 86400): (9, 9450.0)})
+    assert res["status"] == "review"
+    assert res["rules_triggered"] == ["velocity:pair_burst_60s", "velocity:src_sum_24h"]
+
+    res = _screen(12_000.0, {("by_pair", 60): (3, 300.0)})           # threshold review + velocity
+    assert res["status"] == "blocked"
+    assert res["rules_triggered"] == ["threshold_review", "velocity:pair_burst_60s", "velocity:src_sum_24h"]
+
+    res = _screen(10.0, {("by_wallet", 3600): (30, 0.0)})            # "action": "blocked"
+    assert res["status"] == "blocked"
+
+
+@pytest.mark.parametrize("scope", ["by_wallet", "any"])
+def test_sum_rules_need_a_single_currency_scope(scope):
+    doc = {"conversion": {"velocity_rules": [{"scope": scope, "window_seconds": 3600, "sum_above": 9500}]}}
+    with pytest.raises(ValueError):
+        CompiledRules(doc)
+
+
+
+def test_example_rules_screen_a_structured_run(fx_data):
+    example = Path(__file__).resolve().parent.parent / "fx_data" / "compliance_rules.example.json"
+    _write(fx_data / "compliance_rules.json", example.read_text())
+    sim.simulate_many([{"src": "USD", "dst": "AUD", "amount": 2000.0}] * 5)
+
+    txs = list(get_log(sim.TX_LOG_PATH).iter_records())[-5:]
+    assert [tx["compliance"]["status"] for tx in txs] == ["clear"] * 3 + ["review"] * 2
+    assert txs[3]["compliance"]["rules_triggered"] == ["velocity", "velocity:pair_burst_60s"]
+    assert "velocity:src_sum_24h" in txs[4]["compliance"]["rules_triggered"]       # 8,000 + 2,000 > 9,500
@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+import fx_conversion_sim as sim
+from fx_async_pipeline import AsyncConversionPipeline, run_orders
+from log_store import get_log, reset_logs
+
+ORDERS = [
+    {"src": "USD", "dst": "AUD", "amount": 120.0},
+    {"src": "AUD", "dst": "EUR", "amount": 80.5},
+    {"src": "XXX", "dst": "EUR", "amount": 1.0},          # rejected
+    {"src": "EUR", "dst": "USD", "amount": 33.33},
+    {"src": "USD", "dst": "AUD", "amount": 60_000.0},     # blocked
+]
+
+
+def test_matches_simulate_many(fx_data):
+    shipped = {name: (fx_data / name).read_text() for name in ("balances.json", "transactions_log.json")}
+    summary = asyncio.run(run_orders(ORDERS))
+    assert (summary["settled"], summary["blocked"], summary["rejected"]) == (3, 1, 1)
+    piped = json.loads((fx_data / "balances.json").read_text())
+
+    for name, text in shipped.items():
+        (fx_data / name).write_text(text)
+    reset_logs()
+    assert sim.simulate_many(ORDERS)["balances"] == summary["balances"] == piped
+
+
+def test_concurrent_callers_settle_in_submission_order(fx_data):
+    amounts = [float(n) for n in range(1, 21)]
+
+    async def main():
+        pipeline = AsyncConversionPipeline(flush_interval=0)
+        await pipeline.start()
+        results = await asyncio.gather(*(pipeline.convert("USD", "AUD", a) for a in amounts))
+        await pipeline.close()
+        return results
+
+    results = asyncio.run(main())
+    logged = list(get_log(sim.TX_LOG_PATH).iter_records())[-len(amounts):]
+    assert [tx["tx_id"] for tx in logged] == [r["tx_entry"]["tx_id"] for r in results]
+    assert [tx["amount_src"] for tx in logged] == amounts
+
+
+def test_writer_flushes_while_orders_stream(fx_data, monkeypatch):
+    flushed_at = []
+    real_flush = sim.flush_state
+
+    def flush_state(batch):
+        flushed_at.append(len(batch["pending_tx"]))
+        real_flush(batch)
+
+    monkeypatch.setattr(sim, "flush_state", flush_state)
+
+    async def main():
+        pipeline = AsyncConversionPipeline(flush_interval=0)
+        await pipeline.start()
+        for _ in range(5):
+            await pipeline.convert("USD", "EUR", 1.0)
+            for _ in range(3):
+                await asyncio.sleep(0)      # the writer's turn: swap, then flush on its thread
+        await pipeline.close()
+
+    asyncio.run(main())
+    assert len(flushed_at) > 1 and sum(flushed_at) == 5
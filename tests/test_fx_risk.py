@@ -0,0 +1,52 @@
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import fx_risk
+from fx_risk import ReturnModel, exposure_matrix, risk_report, simulate_moves
+
+
+def _model() -> ReturnModel:
+    return ReturnModel("AUD", ["EUR", "USD"], np.array([1.6, 1.5]), np.zeros(2),
+                       np.array([[1e-4, 5e-5], [5e-5, 1e-4]]), 10)
+
+
+def test_unpriced_currencies_are_reported():
+    exposure, value, unpriced = exposure_matrix([{"AUD": 10.0, "USD": 100.0, "JPY": 5000.0}], _model())
+    assert exposure.tolist() == [[0.0, 100.0]]
+    assert value.tolist() == [160.0]
+    assert unpriced == [{"JPY": 5000.0}]
+
+    moves = simulate_moves(_model(), 1000, seed=1)
+    rows = list(risk_report([("w1", {"USD": 100.0, "JPY": 5000.0}), ("w2", {"EUR": 1.0})], _model(), moves))
+    assert rows[0]["unpriced"] == {"JPY": 5000.0}
+    assert "unpriced" not in rows[1]
+
+
+@pytest.mark.parametrize("argv, fit_only", [
+    (["fit"], True),
+    ([], False),
+    (["run", "--paths", "200"], False),
+])
+def test_fit_is_a_subcommand(fx_data, monkeypatch, capsys, argv, fit_only):
+    monkeypatch.setattr(sys, "argv", ["fx_risk.py", *argv])
+    fx_risk.main()
+    out = capsys.readouterr().out
+    assert out.startswith("[FX Risk fit]")
+    assert ("VaR0.95" in out) != fit_only
+
+
+def test_a_value_named_fit_is_not_taken_for_the_subcommand(fx_data, monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["fx_risk.py", "--out", "fit", "--paths", "200"])
+    fx_risk.main()
+    assert "VaR0.95" in capsys.readouterr().out
+    assert (fx_data.parent / "fit").exists()
+
+
+def test_unpriced_balances_warn_on_the_cli(fx_data, monkeypatch, capsys):
+    (fx_data / "balances.json").write_text('{"AUD": 100.0, "USD": 10.0, "JPY": 1000.0}')
+    monkeypatch.setattr(sys, "argv", ["fx_risk.py", "--paths", "200"])
+    fx_risk.main()
+    assert "1,000.00 JPY in 1 wallet(s) has no JPY_AUD price" in capsys.readouterr().err
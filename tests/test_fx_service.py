@@ -0,0 +1,104 @@
+import json
+import time
+
+import pytest
+
+import fx_conversion_sim as sim
+import fx_service
+from fx_service import ConversionService, _flushing_path
+from log_store import get_log
+
+
+@pytest.fixture
+def service(fx_data):
+    svc = ConversionService(fx_data / "service_journal.jsonl", flush_interval=3600)
+    yield svc
+    svc.journal.close()
+
+
+def _tx_ids() -> list:
+    return [tx.get("tx_id") for tx in get_log(sim.TX_LOG_PATH).iter_records()]
+
+
+def _fail(*args, **kwargs):
+    raise OSError(28, "No space left on device")
+
+
+def test_failed_flush_is_retried_from_the_journal(service, fx_data, monkeypatch):
+    real_apply = sim.apply_effects
+    logged = _tx_ids()
+    first = [service.convert("USD", "AUD", 10.0)["tx_id"] for _ in range(3)]
+
+    monkeypatch.setattr(sim, "apply_effects", _fail)
+    with pytest.raises(OSError):
+        service.flush()
+    assert _flushing_path(service.journal_path).exists()
+    assert _tx_ids() == logged
+
+    second = service.convert("EUR", "AUD", 5.0)["tx_id"]
+    with pytest.raises(OSError):
+        service.flush()              # finishes the failed batch from its journal, then fails on the new one
+    assert _tx_ids() == logged + first
+    assert len(list(sim.iter_jsonl(_flushing_path(service.journal_path)))) == 1
+
+    monkeypatch.setattr(sim, "apply_effects", real_apply)
+    service.flush()
+    assert _tx_ids() == logged + first + [second]
+    assert json.loads((fx_data / "balances.json").read_text()) == service.balances()
+    assert not _flushing_path(service.journal_path).exists()
+
+
+def test_flush_failing_after_the_logs_were_written(service, monkeypatch):
+    real_checkpoint = sim.checkpoint_logs
+    logged = _tx_ids()
+    tx_id = service.convert("USD", "EUR", 20.0)["tx_id"]
+    monkeypatch.setattr(sim, "checkpoint_logs", _fail)
+    with pytest.raises(OSError):
+        service.flush()
+    monkeypatch.setattr(sim, "checkpoint_logs", real_checkpoint)
+
+    service.flush()
+    assert _tx_ids() == logged + [tx_id]               # replayed, not appended twice
+
+
+def test_flush_loop_survives_failures(fx_data, monkeypatch, capsys):
+    svc = ConversionService(fx_data / "service_journal.jsonl", flush_interval=0.01)
+    svc.convert("USD", "AUD", 1.0)
+    real_apply = sim.apply_effects
+    monkeypatch.setattr(sim, "apply_effects", _fail)
+    svc.start()
+    time.sleep(0.1)
+    assert svc._flusher.is_alive()
+    assert "write-behind flush failed" in capsys.readouterr().err
+
+    monkeypatch.setattr(sim, "apply_effects", real_apply)
+    deadline = time.time() + 2
+    while _flushing_path(svc.journal_path).exists() and time.time() < deadline:
+        time.sleep(0.01)
+    svc.close()
+    assert svc.pending() == 0
+    assert not _flushing_path(svc.journal_path).exists()
+
+
+def test_rates_are_reloaded_when_the_file_changes(service, fx_data):
+    rates_path = fx_data / "fxrates.json"
+    doc = json.loads(rates_path.read_text())
+    assert not service.refresh_rates()
+
+    doc["2099-01-01"] = {"USD_AUD": 2.0, "EUR_AUD": 2.5}
+    rates_path.write_text(json.dumps(doc, indent=2))
+    assert service.refresh_rates()
+    res = service.convert("USD", "AUD", 10.0)
+    assert res["rate"] == 2.0
+    assert res["amount_dst"] == 20.0
+
+
+def test_flush_endpoint_reports_failures(service, monkeypatch):
+    service.convert("USD", "AUD", 1.0)
+    monkeypatch.setattr(sim, "apply_effects", _fail)
+    sent = []
+    handler = object.__new__(fx_service.Handler)
+    handler.service, handler.path = service, "/flush"
+    handler._send = lambda code, body: sent.append((code, body))
+    handler.do_POST()
+    assert sent[0][0] == 500
@@ -0,0 +1,49 @@
+import json
+import math
+import random
+import statistics
+
+from fx_trend_state import PairTrend, TrendState, load_rates
+
+
+def test_running_sums_stay_exact_over_a_long_history():
+    rng = random.Random(7)
+    pt = PairTrend(window=7)
+    for day in range(20_003):
+        pt.push(f"d{day}", 1.5 + rng.uniform(-0.2, 0.2) + (1e6 if day % 1000 == 0 else 0.0))
+
+    values, returns = list(pt.values), list(pt.returns)
+    assert math.isclose(pt.moving_avg(), math.fsum(values) / len(values), rel_tol=1e-12)
+    assert math.isclose(pt.volatility_pct(), statistics.stdev(returns) * 100.0, rel_tol=1e-9)
+
+
+def test_rows_missing_a_pair_are_skipped(tmp_path):
+    rows = [
+        {"date": "2025-08-01", "AUD_USD": 0.68, "AUD_EUR": 0.61},
+        {"date": "2025-08-02", "AUD_USD": None, "AUD_EUR": 0.62},
+        {"date": "2025-08-03", "AUD_EUR": "n/a"},
+        {"date": "2025-08-04", "AUD_USD": 0.70, "AUD_EUR": 0.0},
+        {"AUD_USD": 0.71},                                          # no date
+    ]
+    path = tmp_path / "fxrates.json"
+    path.write_text(json.dumps(rows))
+
+    state = TrendState(window=3)
+    state.sync(load_rates(path))
+    assert list(state.pairs["AUD_USD"].values) == [0.68, 0.70]
+    assert list(state.pairs["AUD_EUR"].values) == [0.61, 0.62]
+    assert state.last_date == "2025-08-04"
+    assert state.sync(load_rates(path)) == []                      # re-syncing is a no-op
+
+
+def test_dict_of_days_and_rows_give_the_same_state(tmp_path):
+    days = {"2025-08-02": {"USD_AUD": 1.53}, "2025-08-01": {"USD_AUD": 1.52}, "2025-08-03": {"USD_AUD": 1.56}}
+    rows = [{"date": d, **rates} for d, rates in days.items()]
+    (tmp_path / "days.json").write_text(json.dumps(days))
+    (tmp_path / "rows.json").write_text(json.dumps(rows))
+
+    a, b = TrendState(window=3), TrendState(window=3)
+    a.sync(load_rates(tmp_path / "days.json"))
+    b.sync(load_rates(tmp_path / "rows.json"))
+    assert a.pairs["USD_AUD"].to_dict() == b.pairs["USD_AUD"].to_dict()
+    assert a.recommendation("USD_AUD")["signal"] == 1
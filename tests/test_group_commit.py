@@ -0,0 +1,80 @@
+import json
+import os
+import threading
+
+import pytest
+
+import group_commit
+from group_commit import GroupCommitLog
+
+
+def _lines(path) -> list:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_failed_fsync_keeps_records_queued(tmp_path, monkeypatch):
+    log = GroupCommitLog(tmp_path / "commit.jsonl", durability="fsync")
+    t1, t2 = log.append({"n": 1}), log.append({"n": 2})
+    real_fsync = os.fsync
+
+    def broken_fsync(fd):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(group_commit.os, "fsync", broken_fsync)
+    with pytest.raises(OSError):
+        log.wait(t1)
+    assert log._durable == 0
+    assert (tmp_path / "commit.jsonl").read_text() == ""      # the partial group was cut off
+
+    monkeypatch.setattr(group_commit.os, "fsync", real_fsync)
+    log.wait(t2)
+    log.wait(t1)
+    assert _lines(tmp_path / "commit.jsonl") == [{"n": 1}, {"n": 2}]
+    log.close()
+
+
+def test_waiters_of_a_failed_group_retry(tmp_path, monkeypatch):
+    log = GroupCommitLog(tmp_path / "commit.jsonl", durability="fsync")
+    calls = []
+    real_fsync = os.fsync
+
+    def flaky_fsync(fd):
+        calls.append(fd)
+        if len(calls) == 1:
+            raise OSError(5, "I/O error")
+        real_fsync(fd)
+
+    monkeypatch.setattr(group_commit.os, "fsync", flaky_fsync)
+    tickets = [log.append({"n": i}) for i in range(4)]
+    errors, done = [], []
+
+    def committer(ticket):
+        try:
+            log.wait(ticket)
+            done.append(ticket)
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=committer, args=(t,)) for t in tickets]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(errors) == 1                      # only the failing leader sees the error
+    assert len(done) == 3                        # the rest returned after a real write
+    assert _lines(tmp_path / "commit.jsonl") == [{"n": i} for i in range(4)]
+    log.close()
+
+
+@pytest.mark.skipif(group_commit.fcntl is None, reason="no flock on this platform")
+def test_second_writer_is_refused(tmp_path):
+    first = GroupCommitLog(tmp_path / "commit.jsonl")
+    first.commit({"n": 1})
+    second = GroupCommitLog(tmp_path / "commit.jsonl")
+    with pytest.raises(RuntimeError):
+        second.commit({"n": 2})
+    with pytest.raises(RuntimeError):
+        second.checkpoint()                      # must not truncate the first writer's records
+    assert _lines(tmp_path / "commit.jsonl") == [{"n": 1}]
+    first.checkpoint()
+    assert (tmp_path / "commit.jsonl").read_text() == ""
@@ -0,0 +1,69 @@
+import json
+
+import fx_conversion_sim as sim
+import ledger
+from log_store import reset_logs
+
+ORDERS = [
+    {"src": "USD", "dst": "AUD", "amount": 120.0},
+    {"src": "AUD", "dst": "EUR", "amount": 80.5},
+    {"src": "EUR", "dst": "USD", "amount": 33.33},
+    {"src": "USD", "dst": "AUD", "amount": 60_000.0},     # blocked: never journaled
+]
+
+
+def test_verify_matches_settled_conversions(fx_data):
+    summary = sim.simulate_many(ORDERS)
+    assert (summary["settled"], summary["blocked"]) == (3, 1)
+
+    report = ledger.verify()
+    assert report["ok"], report["problems"]
+    assert report["conversions"] == report["matched"] == 3
+    assert report["before_journal"] > 0                 # the shipped log predates the journal
+
+
+def test_verify_reports_tampered_amount(fx_data):
+    sim.simulate_many(ORDERS[:2])
+    log_path = fx_data / "transactions_log.json"
+    txs = json.loads(log_path.read_text())
+    txs[-1]["amount_dst"] += 1.0
+    log_path.write_text(json.dumps(txs, indent=2))
+    reset_logs()
+
+    report = ledger.verify()
+    assert not report["ok"]
+    assert report["amount_mismatch"] == 1
+    assert txs[-1]["tx_id"] in report["problems"][0]
+
+
+def _txs(n: int) -> list:
+    return [{"tx_id": f"{i:032x}", "timestamp": f"2025-01-01T00:{i // 60:02d}:{i % 60:02d}Z", "pair": "USD_AUD",
+             "amount_src": 1.0, "amount_dst": 1.5, "balances_before": {"USD": 500.0 - i, "AUD": 1.5 * i},
+             "compliance": {"status": "clear"}} for i in range(n)]
+
+
+def test_checkpoint_snapshots_once_enough_entries_piled_up(tmp_path):
+    book = ledger.Ledger(tmp_path / "journal.jsonl", tmp_path / "snaps",
+                         snapshot_every=1000, checkpoint_snapshot_after=10)
+    book.record_transactions(_txs(5))
+    book.checkpoint()
+    assert book._snap_seqs == []                              # 6 entries: not yet
+    book.record_transactions(_txs(12)[5:])
+    book.checkpoint()
+    assert book._snap_seqs == [book.seq] == [13]
+
+    reopened = ledger.Ledger(tmp_path / "journal.jsonl", tmp_path / "snaps")
+    assert reopened.balances == book.balances and reopened.seq == 13
+
+
+def test_opening_after_a_long_replay_snapshots(tmp_path):
+    book = ledger.Ledger(tmp_path / "journal.jsonl", tmp_path / "snaps", snapshot_every=1000)
+    book.record_transactions(_txs(30))
+    book.flush()
+    assert book._snap_seqs == []
+
+    reopened = ledger.Ledger(tmp_path / "journal.jsonl", tmp_path / "snaps",
+                             snapshot_every=1000, checkpoint_snapshot_after=20)
+    assert reopened._snap_seqs == [31]
+    assert ledger.Ledger(tmp_path / "journal.jsonl", tmp_path / "snaps").balances == book.balances
+    assert reopened.balances_at(seq=5) == book.balances_at(seq=5)
@@ -0,0 +1,53 @@
+import pytest
+
+import money
+from money import to_minor
+
+
+@pytest.mark.parametrize("amount, ccy, half_even, half_up", [
+    (0.125, "USD", 12, 13),
+    (0.135, "USD", 14, 14),
+    (-0.125, "USD", -12, -13),
+    (2.675, "USD", 268, 268),       # float 2.67499.. but its repr is 2.675: rounded from the decimal
+    (2.5, "JPY", 2, 3),
+    (3.5, "JPY", 4, 4),
+])
+def test_sub_minor_rounding(amount, ccy, half_even, half_up):
+    assert to_minor(amount, ccy, "half_even") == half_even
+    assert to_minor(amount, ccy, "half_up") == half_up
+
+
+def test_whole_minor_units_are_snapped():
+    assert to_minor(19.99, "USD") == 1999
+    assert to_minor(0.1 + 0.2, "USD") == 30
+    assert to_minor(1234.0, "JPY") == 1234
+
+
+def test_default_policy(monkeypatch):
+    monkeypatch.setattr(money, "ROUNDING", "half_even")
+    assert to_minor(0.125, "USD") == 12
+    money.set_rounding("half_up")
+    assert to_minor(0.125, "USD") == 13
+    with pytest.raises(ValueError):
+        money.set_rounding("nearest")
+
+
+def test_convert_minor_rounds_once():
+    assert money.convert_minor(10_000, 1.52, "USD", "AUD") == 15_200
+    assert money.convert_minor(1, 0.5, "USD", "AUD", "half_even") == 0          # 0.5 cent, to even
+    assert money.convert_minor(1, 0.5, "USD", "AUD", "half_up") == 1
+    assert money.convert_minor(12_345, 98.76, "USD", "JPY") == 12_192         # 123.45 × 98.76 = 12,191.922
+    assert money.convert_minor(1_000, 0.0068, "JPY", "USD") == 680            # 1,000 yen → 6.80 USD
+
+
+def test_batch_path_matches_the_scalar_path():
+    np = pytest.importorskip("numpy")
+    amounts = [1, 5, 12_345, 99_999_999]
+    rates = [money.rate_units(r) for r in (1.5, 0.659341, 1.52, 0.5)]
+    assert money.convert_many(amounts, rates).tolist() == [money.convert_minor(a, r) for a, r in zip(amounts, rates)]
+    with pytest.raises(OverflowError):
+        money.convert_many([np.iinfo(np.int64).max // 10], [money.rate_units(2.0)])
+
+    balances, received = money.replay_many([100_000, 0], [0, 0], [1, 1], [10_000, 20_000],
+                                           rates[:2], settled=[True, False])
+    assert balances.tolist() == [90_000, received[0]]
@@ -0,0 +1,48 @@
+import json
+
+import fx_conversion_sim as sim
+from log_store import get_log
+from rate_store import RateStore, parse_as_of
+
+DAY = 86400
+
+
+def _store(*ticks) -> RateStore:
+    store = RateStore()
+    store.add_many((parse_as_of(ts), pair, rate) for ts, pair, rate in ticks)
+    return store
+
+
+def test_stale_quotes_are_left_out_of_latest():
+    store = _store(("2025-08-01", "USD_AUD", 1.52), ("2025-08-01", "EUR_AUD", 1.66),
+                   ("2025-08-10", "EUR_AUD", 1.70))
+    assert store.day_rates() == ("2025-08-10", {"EUR_AUD": 1.70})
+    assert store.day_rates(parse_as_of("2025-08-03")) == ("2025-08-01", {"USD_AUD": 1.52, "EUR_AUD": 1.66})
+    assert store.day_rates(max_age={"default": 10 * DAY})[1] == {"USD_AUD": 1.52, "EUR_AUD": 1.70}
+
+
+def test_max_age_per_pair():
+    store = _store(("2025-08-07T09:00:00Z", "USD_AUD", 1.51), ("2025-08-07T09:30:00Z", "EUR_AUD", 1.66))
+    limits = {"USD_AUD": 600, "default": DAY}
+    assert store.day_rates(max_age=limits) == ("2025-08-07T09:30:00Z", {"EUR_AUD": 1.66})
+    assert set(store.day_rates()[1]) == {"USD_AUD", "EUR_AUD"}
+
+
+def test_intraday_rates_keep_fx_date_used_a_date(fx_data):
+    doc = json.loads((fx_data / "fxrates.json").read_text())
+    last_day = max(doc)
+    tick = {"ts": f"{last_day}T09:30:00Z", "pair": "USD_AUD", "rate": 1.6}
+    (fx_data / "rate_ticks.jsonl").write_text(json.dumps(tick) + "\n")
+
+    sim.simulate_many([{"src": "USD", "dst": "AUD", "amount": 10.0}])
+    tx = list(get_log(sim.TX_LOG_PATH).iter_records())[-1]
+    ev = list(get_log(sim.AUDIT_LOG_PATH).iter_records())[-1]
+    assert (tx["fx_date_used"], tx["fx_time_used"], tx["rate"]) == (last_day, tick["ts"], 1.6)
+    assert (ev["fx_date_used"], ev["fx_time_used"]) == (last_day, tick["ts"])
+
+
+def test_daily_rates_have_no_fx_time(fx_data):
+    sim.simulate_many([{"src": "USD", "dst": "AUD", "amount": 10.0}])
+    tx = list(get_log(sim.TX_LOG_PATH).iter_records())[-1]
+    assert tx["fx_date_used"] == max(json.loads((fx_data / "fxrates.json").read_text()))
+    assert "fx_time_used" not in tx
@@ -0,0 +1,73 @@
+import json
+from datetime import datetime, timedelta
+
+import rescreen
+from compliance_engine import compile_rules
+
+T0 = datetime(2025, 3, 1, 12, 0, 0)
+
+
+def _tx(n: int, seconds: int, amount: float, status: str = "clear", pair: str = "USD_AUD") -> dict:
+    return {
+        "tx_id": f"{n:032x}",
+        "timestamp": (T0 + timedelta(seconds=seconds)).isoformat() + "Z",
+        "fx_date_used": "2025-03-01",
+        "pair": pair,
+        "rate": 1.5,
+        "amount_src": amount,
+        "amount_dst": amount * 1.5,
+        "compliance": {"status": status, "reason": "within limits", "rules_triggered": []},
+    }
+
+
+def _log(tmp_path, txs: list):
+    path = tmp_path / "transactions_log.jsonl"
+    path.write_text("".join(json.dumps(tx) + "\n" for tx in txs))
+    return path
+
+
+def _rules(**conversion):
+    base = {"amount_thresholds": {"review": 10_000.0, "blocked": 50_000.0},
+            "velocity": {"window_seconds": 60, "min_count": 100, "scope": "by_src"}}
+    return compile_rules({"conversion": {**base, **conversion}})
+
+
+def test_unchanged_rules_emit_no_delta(tmp_path):
+    path = _log(tmp_path, [_tx(1, 0, 100.0), _tx(2, 3600, 12_000.0, "review"), _tx(3, 7200, 60_000.0, "blocked")])
+    res = rescreen.rescreen(path, _rules(), workers=1)
+    assert res["screened"] == 3 and res["changed"] == {}
+
+
+def test_only_changed_statuses_are_emitted(tmp_path):
+    txs = [_tx(1, 0, 100.0), _tx(2, 3600, 6_000.0), _tx(3, 7200, 12_000.0, "review")]
+    path = _log(tmp_path, txs)
+    res = rescreen.rescreen(path, _rules(amount_thresholds={"review": 5_000.0, "blocked": 10_000.0}), workers=1)
+    assert sorted(res["changed"]) == [1, 2]
+
+    events = rescreen.delta_events(path, res["changed"])
+    assert [ev["tx_id"] for ev in events] == [txs[1]["tx_id"], txs[2]["tx_id"]]
+    assert [ev["compliance"]["status"] for ev in events] == ["review", "blocked"]
+    assert [ev["rescreen"]["previous_status"] for ev in events] == ["clear", "review"]
+    assert all(ev["event"] == "compliance_rescreen" for ev in events)
+
+
+def test_velocity_is_rebuilt_as_of_each_transaction(tmp_path):
+    burst = [_tx(n, n * 10, 100.0) for n in range(4)]                   # four in 30s, long before now
+    later = [_tx(9, 3600, 100.0)]
+    path = _log(tmp_path, burst + later)
+    rules = _rules(velocity_rules=[{"name": "burst", "scope": "by_pair", "window_seconds": 60, "min_count": 3}])
+    res = rescreen.rescreen(path, rules, workers=1)
+    assert sorted(res["changed"]) == [3]
+    assert res["changed"][3][2] == ["velocity:burst"]
+
+
+def test_shards_match_the_inline_screen(tmp_path, monkeypatch):
+    txs = [_tx(n, n * 7, 100.0 + n, pair=("USD_AUD", "EUR_AUD", "AUD_USD")[n % 3]) for n in range(300)]
+    path = _log(tmp_path, txs)
+    rules = _rules(velocity_rules=[{"name": "burst", "scope": "by_pair", "window_seconds": 60, "min_count": 3},
+                                   {"name": "src_sum", "scope": "by_src", "window_seconds": 600, "sum_above": 9500}])
+    inline = rescreen.rescreen(path, rules, workers=1)
+    monkeypatch.setattr(rescreen, "INLINE_BELOW", 0)
+    pooled = rescreen.rescreen(path, rules, workers=2)
+    assert pooled["shards"] > 1
+    assert pooled["changed"] == inline["changed"] and inline["changed"]
@@ -0,0 +1,18 @@
+from datetime import datetime
+
+import synthetic_data as synth
+
+
+def test_logs_are_reproducible_from_the_seed():
+    first = list(synth.tx_records(50, seed=3))
+    assert first == list(synth.tx_records(50, seed=3))
+    assert first != list(synth.tx_records(50, seed=4))
+    assert list(synth.audit_records(20, seed=3)) == list(synth.audit_records(20, seed=3))
+    assert first[-1]["timestamp"] <= synth.DEFAULT_END.isoformat() + "Z"
+
+
+def test_end_is_passed_explicitly():
+    end = datetime(2026, 3, 1, 12, 0, 0)
+    txs = list(synth.tx_records(10, seed=3, end=end, span_seconds=3600))
+    assert all("2026-03-01T11:00:00Z" <= tx["timestamp"] <= "2026-03-01T12:00:00Z" for tx in txs)
+    assert [tx["tx_id"] for tx in txs] == [tx["tx_id"] for tx in synth.tx_records(10, seed=3)]
@@ -0,0 +1,74 @@
+import json
+import random
+
+from velocity_index import VelocityIndex
+
+PAIRS = ("USD_AUD", "USD_EUR", "EUR_AUD")
+
+
+def _matches(scope: str, pair: str, other: str, wallet: str, other_wallet) -> bool:
+    if scope == "by_src":
+        return other.split("_")[0] == pair.split("_")[0]
+    if scope == "by_pair":
+        return other == pair
+    if scope == "by_wallet":
+        return other_wallet == wallet
+    return True
+
+
+def test_events_expire_per_window():
+    index = VelocityIndex({"by_src": [60, 3600]})
+    for t in (0, 30, 50):
+        index.record(t, "USD_AUD", 100.0)
+
+    assert index.stats("by_src", "USD", "AUD", 60, 50) == (3, 300.0)
+    assert index.stats("by_src", "USD", "AUD", 60, 95) == (1, 100.0)      # t=0 and t=30 left the minute
+    assert index.stats("by_src", "USD", "AUD", 3600, 95) == (3, 300.0)
+    assert index.stats("by_src", "USD", "AUD", 60, 110) == (1, 100.0)     # exactly 60s old still counts
+    assert index.stats("by_src", "USD", "AUD", 60, 111) == (0, 0.0)
+    assert index.stats("by_src", "USD", "AUD", 3600, 3650) == (1, 100.0)
+
+
+def test_window_stats_after_expiry_and_new_events():
+    index = VelocityIndex({"by_pair": [60], "by_wallet": [60]})
+    index.record(0, "USD_AUD", 10.0, "w_1")
+    index.record(100, "USD_AUD", 20.0, "w_1")
+
+    stats = index.window_stats("USD", "AUD", 120, "w_1")
+    assert stats["by_pair", 60] == (1, 20.0)
+    assert stats["by_wallet", 60] == (1, 20.0)
+    assert index.window_stats("USD", "AUD", 120, "w_2")["by_wallet", 60] == (0, 0.0)
+    assert index.window_stats("EUR", "AUD", 120)["by_pair", 60] == (0, 0.0)
+
+
+def test_matches_a_log_scan():
+    rng = random.Random(3)
+    events = sorted((rng.uniform(0, 600), rng.choice(PAIRS), round(rng.uniform(1, 500), 2),
+                     rng.choice(["w_1", "w_2", None])) for _ in range(400))
+    index = VelocityIndex({"any": [60], "by_src": [60, 300], "by_pair": [30], "by_wallet": [120]})
+    for t, pair, amount, wallet in events:
+        index.record(t, pair, amount, wallet)
+
+    now = 600.0
+    for scope, window in (("any", 60), ("by_src", 60), ("by_src", 300), ("by_pair", 30), ("by_wallet", 120)):
+        for pair in PAIRS:
+            src, dst = pair.split("_")
+            for wallet in ("w_1", "w_2"):
+                hits = [a for t, p, a, w in events if now - window <= t <= now and _matches(scope, pair, p, wallet, w)]
+                count, total = index.stats(scope, src, dst, window, now, wallet)
+                assert (count, round(total, 2)) == (len(hits), round(sum(hits), 2))
+
+
+def test_sidecar_is_used_only_for_the_log_it_covers(tmp_path):
+    log = tmp_path / "transactions_log.jsonl"
+    log.write_text(json.dumps({"timestamp": "2025-01-01T00:00:00Z", "pair": "USD_AUD", "amount_src": 10.0}) + "\n")
+    windows = {"by_src": [86_400]}
+    index = VelocityIndex.load_or_rebuild(tmp_path / "velocity.json", log, windows)
+    index.save(tmp_path / "velocity.json", log)
+    assert VelocityIndex.load_or_rebuild(tmp_path / "velocity.json", log, windows).stats(
+        "by_src", "USD", "AUD", 86_400, "2025-01-01T01:00:00Z") == (1, 10.0)
+
+    with open(log, "a") as f:                     # the log grew: rebuilt, not served stale
+        f.write(json.dumps({"timestamp": "2025-01-01T00:30:00Z", "pair": "USD_EUR", "amount_src": 5.0}) + "\n")
+    assert VelocityIndex.load_or_rebuild(tmp_path / "velocity.json", log, windows).stats(
+        "by_src", "USD", "AUD", 86_400, "2025-01-01T01:00:00Z") == (2, 15.0)